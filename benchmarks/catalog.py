@@ -0,0 +1,42 @@
+"""Synthetic books and patrons for the benchmarks."""
+from libutils.isbn import check_digit, format_digits
+from libutils.storage import Storage
+
+AUTHORS = 5000
+TIMESTAMP = "2024-04-18 00:00:00"
+
+def synthetic_isbn(index: int) -> str:
+    """Return the index-th synthetic ISBN, with a valid check digit."""
+    digits = f"978{index:09d}"
+    return format_digits(digits + str(check_digit(digits)))
+
+def synthetic_book(index: int) -> dict:
+    """Return a books.csv row for the index-th synthetic book."""
+    return {
+        "title": f"Synthetic Title {index}",
+        "author": f"Author {index % AUTHORS}",
+        "isbn": synthetic_isbn(index),
+        "AvailableInLibrary": "Yes" if index % 7 else "No",
+        "timestamp": TIMESTAMP,
+    }
+
+def synthetic_user(index: int) -> dict:
+    """Return a users.csv row for the index-th synthetic patron."""
+    return {"Name": f"Patron {index}", "UserID": str(1000 + index), "BookInHand": "", "timestamp": TIMESTAMP}
+
+def write_catalog(storage: Storage, books: int, users: int, batch_size: int = 100000) -> None:
+    """
+    Fill a storage folder with synthetic books and patrons.
+
+    Args:
+        storage (Storage): Storage to write to; it should be empty.
+        books (int): Number of books.
+        users (int): Number of patrons.
+        batch_size (int, optional): Rows generated and written at a time. Defaults to 100000.
+    """
+    for filepath, fieldnames, count, row in (
+            (storage.books_filepath, storage._get_books_fieldnames(), books, synthetic_book),
+            (storage.users_filepath, storage._get_users_fieldnames(), users, synthetic_user)):
+        for start in range(0, count, batch_size):
+            storage.append_records(filepath, [row(index) for index in range(start, min(count, start + batch_size))],
+                                   fieldnames)
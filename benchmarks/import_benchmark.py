@@ -0,0 +1,48 @@
+"""
+Measure how long it takes to import the library and start the application.
+
+Each sample runs a fresh interpreter in an empty working directory, so nothing is
+cached between samples, and reports whether the run left files behind there.
+
+Usage: python -m benchmarks.import_benchmark [--repeat N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements timed in the fresh interpreter, by name
+TARGETS = {
+    "import libutils": "import libutils",
+    "import main": "import main",
+    "start application": "import main; main.LibraryManagementSystem()",
+}
+
+TIMER = "import time; started = time.perf_counter(); {statement}; print(time.perf_counter() - started)"
+
+def sample(statement: str) -> tuple:
+    """Return the seconds one fresh interpreter took to run statement, and the files it created."""
+    with tempfile.TemporaryDirectory() as workdir:
+        env = dict(os.environ, PYTHONPATH=REPO_ROOT, PYTHONDONTWRITEBYTECODE="1")
+        output = subprocess.run([sys.executable, "-c", TIMER.format(statement=statement)],
+                                cwd=workdir, env=env, capture_output=True, text=True, check=True).stdout
+        return float(output), sorted(os.listdir(workdir))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=20, help="fresh interpreters per target")
+    args = parser.parse_args()
+
+    for name, statement in TARGETS.items():
+        samples = [sample(statement) for _ in range(args.repeat)]
+        seconds = [elapsed for elapsed, _ in samples]
+        created = samples[-1][1]
+        print(f"{name:18}: median {statistics.median(seconds) * 1000:6.1f} ms, "
+              f"min {min(seconds) * 1000:6.1f} ms, created {created or 'nothing'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Measure the memory held by the in-memory catalog and patron records.
+
+Builds a synthetic ISBN index and user set of the requested sizes, measures them
+with tracemalloc and projects the result to the target catalog size.
+
+Usage: python -m benchmarks.memory_benchmark [--books N] [--users N]
+"""
+import argparse
+import gc
+import tracemalloc
+
+from benchmarks.catalog import synthetic_book
+from libutils.book import Book
+from libutils.user import User
+
+def measure(build) -> int:
+    """Return the number of bytes still allocated by the object build() returns."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--books", type=int, default=200000, help="number of synthetic books")
+    parser.add_argument("--users", type=int, default=100000, help="number of synthetic users")
+    parser.add_argument("--target-books", type=int, default=5000000, help="catalog size to project to")
+    parser.add_argument("--target-users", type=int, default=1000000, help="patron count to project to")
+    args = parser.parse_args()
+
+    dict_bytes = measure(lambda: {row["isbn"]: row for row in map(synthetic_book, range(args.books))})
+    book_bytes = measure(lambda: {row["isbn"]: Book.from_record(row) for row in map(synthetic_book, range(args.books))})
+    user_bytes = measure(lambda: [User(f"Patron {index}", str(index)) for index in range(args.users)])
+    # UserDatabase keeps only the shared ID set for stored patrons
+    id_bytes = measure(lambda: set(range(1000, 1000 + args.users)))
+
+    per_dict, per_book = dict_bytes / args.books, book_bytes / args.books
+    per_user, per_id = user_bytes / args.users, id_bytes / args.users
+    projected = per_book * args.target_books + per_id * args.target_users
+    print(f"dict records : {per_dict:8.1f} bytes/book")
+    print(f"Book records : {per_book:8.1f} bytes/book")
+    print(f"User records : {per_user:8.1f} bytes/user")
+    print(f"User ID set  : {per_id:8.1f} bytes/user")
+    print(f"Projected    : {projected / 2 ** 20:8.1f} MiB for {args.target_books} books and {args.target_users} users")
+
+if __name__ == "__main__":
+    main()
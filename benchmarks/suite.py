@@ -0,0 +1,264 @@
+"""
+Time the core library operations on synthetic catalogs and flag regressions.
+
+For every size a catalog of that many books and patrons is written to a temporary
+database folder. Each operation then runs against a fresh database on that folder,
+once for its time and, unless --no-memory is given, once more under tracemalloc for
+its peak memory. Results are written as JSON and compared against a baseline.
+With --shards the catalog is split into that many shards, see Storage.reshard.
+
+Usage:
+    python -m benchmarks.suite [--sizes 1000,10000,100000] [--shards N] [--output FILE]
+                               [--baseline FILE] [--save-baseline] [--threshold 0.2]
+"""
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks.catalog import synthetic_book, synthetic_isbn, write_catalog
+from libutils.book import BookDatabase
+from libutils.check import CheckoutDatabase
+from libutils.storage import Storage, parse_cache
+from libutils.user import UserDatabase
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(BENCHMARK_DIR, "results.json")
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+
+# Number of calls timed for operations that act on one record at a time
+CALLS = 1000
+
+def book_database(storage: Storage) -> BookDatabase:
+    database = BookDatabase()
+    database._storage = storage
+    return database
+
+def user_database(storage: Storage) -> UserDatabase:
+    database = UserDatabase()
+    database._storage = storage
+    return database
+
+def bench_add_book(storage: Storage, size: int) -> Callable[[], int]:
+    database = book_database(storage)
+    books = [synthetic_book(size + index) for index in range(CALLS)]
+
+    def run() -> int:
+        for book in books:
+            database.add_book(book["title"], book["author"], book["isbn"])
+        return len(books)
+    return run
+
+def bench_list_books(storage: Storage, _size: int) -> Callable[[], int]:
+    database = book_database(storage)
+
+    def run() -> int:
+        database.list_books()
+        return 1
+    return run
+
+def bench_add_user(storage: Storage, size: int) -> Callable[[], int]:
+    database = user_database(storage)
+
+    def run() -> int:
+        for index in range(CALLS):
+            database.add_user(f"New Patron {index}", str(1000 + size + index))
+        return CALLS
+    return run
+
+def bench_get_users(storage: Storage, _size: int) -> Callable[[], int]:
+    database = user_database(storage)
+
+    def run() -> int:
+        database.get_users()
+        return 1
+    return run
+
+def bench_checkout(storage: Storage, size: int) -> Callable[[], int]:
+    database = CheckoutDatabase(storage)
+    # Books whose index is a multiple of 7 start out checked out
+    loans = [(str(1000 + index), synthetic_isbn(index)) for index in range(size) if index % 7][:CALLS]
+
+    def run() -> int:
+        for user_id, isbn in loans:
+            if not database.checkout_book(user_id, isbn).ok:
+                raise RuntimeError(f"Checkout of {isbn} by {user_id} failed")
+        return len(loans)
+    return run
+
+def bench_save(storage: Storage, size: int) -> Callable[[], int]:
+    # The writes of LibraryManagementSystem.save: the books and users added since the last save
+    books = book_database(storage)
+    users = user_database(storage)
+    for index in range(CALLS):
+        book = synthetic_book(size + index)
+        books.create_book(book["title"], book["author"], book["isbn"])
+        users.create_user(f"New Patron {index}", str(1000 + size + index))
+
+    def run() -> int:
+        books.flush()
+        users.flush()
+        storage.flush()
+        return 1
+    return run
+
+# Each entry prepares an operation on a catalog of the given size and returns a
+# function that runs it and returns the number of calls it made
+OPERATIONS: Dict[str, Callable[[Storage, int], Callable[[], int]]] = {
+    "add_book": bench_add_book,
+    "list_books": bench_list_books,
+    "add_user": bench_add_user,
+    "get_users": bench_get_users,
+    "checkout": bench_checkout,
+    "save": bench_save,
+}
+
+def run_operation(folder: str, name: str, size: int, memory: bool) -> Dict[str, object]:
+    """
+    Run one operation against a copy of a synthetic catalog.
+
+    Returns:
+        Dict[str, object]: The operation, catalog size, calls made, seconds taken and
+        peak traced memory in bytes (None without memory tracking).
+    """
+    result = {"operation": name, "size": size}
+    for traced in (False, True) if memory else (False,):
+        with tempfile.TemporaryDirectory() as workdir:
+            storage = Storage(database_folder=shutil.copytree(folder, os.path.join(workdir, "database")))
+            parse_cache.clear()
+            run = OPERATIONS[name](storage, size)
+            gc.collect()
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                if traced:
+                    tracemalloc.start()
+                    run()
+                    result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                else:
+                    started = time.perf_counter()
+                    result["calls"] = run()
+                    result["seconds"] = time.perf_counter() - started
+    result.setdefault("peak_bytes", None)
+    return result
+
+def run_suite(sizes: List[int], operations: List[str], memory: bool = True, shards: int = 1) -> Dict[str, object]:
+    """
+    Run every operation on a synthetic catalog of every size.
+
+    Args:
+        sizes (List[int]): Numbers of books and of patrons in each catalog.
+        operations (List[str]): Names of the operations to run.
+        memory (bool, optional): Whether to measure peak memory. Defaults to True.
+        shards (int, optional): Number of shards the catalogs are split into. Defaults to 1.
+
+    Returns:
+        Dict[str, object]: The environment and one result per operation and size.
+    """
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as folder:
+            storage = Storage(database_folder=folder)
+            write_catalog(storage, books=size, users=size)
+            if shards > 1:
+                storage.reshard(shards)
+            for name in operations:
+                result = run_operation(folder, name, size, memory)
+                results.append(result)
+                peak = result["peak_bytes"]
+                print(f"{name:18} {size:>9} rows  {result['seconds'] * 1000:10.1f} ms"
+                      + (f"  peak {peak / 2 ** 20:8.1f} MiB" if peak is not None else ""), flush=True)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "shards": shards,
+        "results": results,
+    }
+
+def compare(report: Dict[str, object], baseline: Dict[str, object], threshold: float,
+            min_seconds: float = 0.005) -> List[str]:
+    """
+    Find operations that got slower or bigger than in the baseline.
+
+    Args:
+        report (Dict[str, object]): The new results.
+        baseline (Dict[str, object]): The saved results to compare against.
+        threshold (float): Allowed relative increase, for example 0.2 for 20%.
+        min_seconds (float, optional): Slowdowns smaller than this are timer noise. Defaults to 0.005.
+
+    Returns:
+        List[str]: One line per regression.
+    """
+    previous: Dict[Tuple[str, int], dict] = {
+        (result["operation"], result["size"]): result for result in baseline.get("results", [])
+    }
+    regressions = []
+    for result in report["results"]:
+        before = previous.get((result["operation"], result["size"]))
+        if before is None:
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None or (metric == "seconds" and new - old < min_seconds):
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{result['operation']} at {result['size']} rows: "
+                                   f"{metric} {old:.4g} -> {new:.4g} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def load_report(filepath: str) -> Optional[Dict[str, object]]:
+    """Read a results file, or return None if it does not exist."""
+    if not os.path.exists(filepath):
+        return None
+    with open(filepath, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="comma separated catalog sizes, up to 10000000")
+    parser.add_argument("--shards", type=int, default=1, help="split each catalog into this many shards")
+    parser.add_argument("--operations", default=",".join(OPERATIONS),
+                        help="comma separated operations to run")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="where to write the results")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also save the results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slowdown before flagging, 0.2 = 20%%")
+    parser.add_argument("--min-seconds", type=float, default=0.005,
+                        help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--no-memory", action="store_true", help="skip the peak memory runs")
+    args = parser.parse_args()
+
+    operations = args.operations.split(",")
+    unknown = [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown operations: {', '.join(unknown)}")
+    report = run_suite([int(size) for size in args.sizes.split(",")], operations, not args.no_memory, args.shards)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    print(f"\nResults written to {args.output}")
+
+    baseline = load_report(args.baseline)
+    if args.save_baseline:
+        shutil.copyfile(args.output, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+    if baseline is None:
+        return
+    regressions = compare(report, baseline, args.threshold, args.min_seconds)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+    print(f"No regressions against {args.baseline}")
+
+if __name__ == "__main__":
+    main()
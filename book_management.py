@@ -1,13 +1,13 @@
 """Module for managing books in the library."""
 
-from libutils.book import book_database
+from libutils.book import get_book_database
 
 class BookManagement:
     """
     Class for managing books in the library.
     """
     
-    def add_book(self, title: str, author: str, isbn: str) -> None:
+    def add_book(self, title: str, author: str, isbn: str, copies: int = 1) -> None:
         """
         Add a book to the library.
 
@@ -15,8 +15,46 @@ class BookManagement:
             title (str): The title of the book.
             author (str): The author of the book.
             isbn (str): The ISBN of the book.
+            copies (int, optional): Number of copies. Defaults to 1.
         """
-        book_database.add_book(title, author, isbn)
+        get_book_database().add_book(title, author, isbn, copies)
+
+    def create_book(self, title: str, author: str, isbn: str, copies: int = 1):
+        """
+        Add a book to the library without printing anything.
+
+        Args:
+            title (str): The title of the book.
+            author (str): The author of the book.
+            isbn (str): The ISBN of the book.
+            copies (int, optional): Number of copies. Defaults to 1.
+
+        Returns:
+            Book: The new book.
+        """
+        return get_book_database().create_book(title, author, isbn, copies)
+
+    def flush_books(self) -> int:
+        """
+        Write the books added since the last save to storage.
+
+        Returns:
+            int: Number of books written.
+        """
+        return get_book_database().flush()
+
+    def import_books(self, filepath: str, chunk_size: int = 10000) -> dict:
+        """
+        Import books in bulk from a CSV or JSON Lines file.
+
+        Args:
+            filepath (str): Path to the file to import.
+            chunk_size (int, optional): Number of rows validated per batch. Defaults to 10000.
+
+        Returns:
+            dict: Counts of accepted and rejected rows.
+        """
+        return get_book_database().import_books(filepath, chunk_size)
 
     def list_books(self) -> list:
         """
@@ -25,4 +63,52 @@ class BookManagement:
         Returns:
             list: A list of dictionaries containing book information.
         """
-        return book_database.list_books()
+        return get_book_database().list_books()
+
+    def page_books(self, page_size: int = 20, cursor: tuple = None) -> tuple:
+        """
+        Get one page of books in the library.
+
+        Args:
+            page_size (int, optional): Maximum number of books on the page. Defaults to 20.
+            cursor (tuple, optional): Cursor returned with the previous page. Defaults to the start.
+
+        Returns:
+            tuple: The books on the page and the cursor of the next page, or None after the last page.
+        """
+        return get_book_database().page_books(page_size, cursor=cursor)
+
+    def search_books(self, query: str, limit: int = 20) -> list:
+        """
+        Search books in the library by title and author.
+
+        Args:
+            query (str): The words to search for.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+
+        Returns:
+            list: Matching books, best match first.
+        """
+        return get_book_database().search(query, limit)
+
+    def warm_up(self) -> int:
+        """
+        Load and index the books now instead of on first use.
+
+        Returns:
+            int: Number of books.
+        """
+        return get_book_database().warm_up()
+
+    def warm_up_search(self) -> int:
+        """
+        Build the search index now instead of on the first search.
+
+        Returns:
+            int: Number of books indexed.
+        """
+        return get_book_database().warm_up_search()
+
+    def save_search_index(self) -> None:
+        """Save the search index so the next start does not rebuild it."""
+        get_book_database().save_search_index()
@@ -1,18 +1,189 @@
 """Module for managing checkouts in the library."""
 
-from libutils.check import checkout_database
+from libutils.check import get_checkout_database
 
 class CheckoutManagement:
     """
     Class for managing checkouts in the library.
     """
     
-    def checkout_book(self) -> None:
+    def checkout_book(self, user_id: str = None, isbn: str = None):
         """
         Checkout a book for a user.
 
+        Without arguments the user ID and ISBN are prompted for.
+
+        Args:
+            user_id (str, optional): The ID of the user.
+            isbn (str, optional): The ISBN of the book to check out.
+
+        Returns:
+            CheckoutResult: The outcome, or None if the prompt was not shown.
+        """
+        return get_checkout_database().checkout_book(user_id, isbn)
+
+    def checkout_many(self, checkouts: list) -> list:
+        """
+        Checkout many books in one batch.
+
+        Args:
+            checkouts (list): (user ID, ISBN) pairs.
+
+        Returns:
+            list: One CheckoutResult per pair.
+        """
+        return get_checkout_database().checkout_many(checkouts)
+
+    def return_book(self, user_id: str = None, isbn: str = None):
+        """
+        Return a book for a user.
+
+        Without arguments the user ID and ISBN are prompted for.
+
+        Args:
+            user_id (str, optional): The ID of the user.
+            isbn (str, optional): The ISBN of the book to return.
+
+        Returns:
+            CheckoutResult: The outcome, or None if the prompt was not shown.
+        """
+        return get_checkout_database().return_book(user_id, isbn)
+
+    def renew_book(self, user_id: str = None, isbn: str = None):
+        """
+        Renew a user's loan of a book.
+
+        Without arguments the user ID and ISBN are prompted for.
+
+        Args:
+            user_id (str, optional): The ID of the user.
+            isbn (str, optional): The ISBN of the book to renew.
+
+        Returns:
+            CheckoutResult: The outcome, or None if the prompt was not shown.
+        """
+        return get_checkout_database().renew_book(user_id, isbn)
+
+    def place_hold(self, user_id: str = None, isbn: str = None):
+        """
+        Put a user in line for a checked out book.
+
+        Without arguments the user ID and ISBN are prompted for.
+
+        Args:
+            user_id (str, optional): The ID of the user.
+            isbn (str, optional): The ISBN of the book.
+
+        Returns:
+            CheckoutResult: The outcome, or None if the prompt was not shown.
+        """
+        return get_checkout_database().place_hold(user_id, isbn)
+
+    def cancel_hold(self, user_id: str, isbn: str):
+        """
+        Take a user out of the line for a book.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            CheckoutResult: The outcome.
+        """
+        return get_checkout_database().cancel_hold(user_id, isbn)
+
+    def hold_position(self, user_id: str, isbn: str):
+        """
+        Find a user's place in the line for a book.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            int: 0 if the book is set aside for the user, 1 if they are next and so on,
+            or None if the user has no hold on it.
+        """
+        return get_checkout_database().hold_position(user_id, isbn)
+
+    def warm_up(self) -> int:
+        """
+        Load the loans, holds and copies now instead of on first use.
+
+        Returns:
+            int: Number of books on loan.
+        """
+        return get_checkout_database().warm_up()
+
+    def add_copies(self, isbn: str, count: int = 1) -> int:
+        """
+        Add copies of a book the library already has.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            count (int, optional): Number of copies to add. Defaults to 1.
+
+        Returns:
+            int: Number of copies the library now owns.
+        """
+        return get_checkout_database().add_copies(isbn, count)
+
+    def copies_of(self, isbn: str) -> tuple:
+        """
+        Count the copies of a book.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            tuple: Copies on the shelf and copies owned.
+        """
+        return get_checkout_database().copies_of(isbn)
+
+    def overdue_loans(self, now=None) -> list:
+        """
+        List the overdue loans.
+
+        Args:
+            now (datetime, optional): The time to check against. Defaults to now.
+
+        Returns:
+            list: The overdue Loan objects, longest overdue first.
+        """
+        return get_checkout_database().overdue_loans(now)
+
+    def user_name(self, user_id: str):
+        """
+        Find the name of a user.
+
         Args:
             user_id (str): The ID of the user.
-            isbn (str): The ISBN of the book to check out.
+
+        Returns:
+            str: The name, or None if the user is unknown.
+        """
+        return get_checkout_database().user_name(user_id)
+
+    def loans_for(self, user_id: str) -> list:
+        """
+        List the books a user holds.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            list: The user's Loan objects, oldest first.
+        """
+        return get_checkout_database().loans_for(user_id)
+
+    def holder_of(self, isbn: str):
+        """
+        Find who holds a book.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            str: The UserID of the holder, or None if the book is not on loan.
         """
-        checkout_database.checkout_book()
+        return get_checkout_database().holder_of(isbn)
@@ -1,5 +1,12 @@
 from .book import *
 from .check import *
+from .metrics import *
 from .models import *
 from .storage import *
-from .user import *
\ No newline at end of file
+from .user import *
+
+def __getattr__(name: str):
+    # The global databases are created on first use, see get_book_database and friends
+    if name in ("book_database", "checkout_database", "user_database"):
+        return globals()[f"get_{name}"]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
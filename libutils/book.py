@@ -1,12 +1,23 @@
 """Module for managing books in the library."""
-import re
-from typing import List, Dict
+import csv
+import json
+import os
+import sys
+import threading
+from datetime import datetime
+from itertools import islice
+from typing import Iterator, List, Dict, Optional, Tuple
+from .isbn import normalize_isbn, normalize_isbns
+from .metrics import metrics
+from .search import SearchIndex
 from .storage import Storage
 
 class Book:
     """Class representing a book in the library."""
 
-    def __init__(self, title: str, author: str, isbn: str):
+    __slots__ = ("title", "author", "isbn", "AvailableInLibrary", "copies", "available")
+
+    def __init__(self, title: str, author: str, isbn: str, copies: int = 1):
         """
         Initialize a Book object.
 
@@ -14,11 +25,15 @@ class Book:
             title (str): The title of the book.
             author (str): The author of the book.
             isbn (str): The ISBN of the book.
+            copies (int, optional): Number of copies, all on the shelf. Defaults to 1.
         """
         self.title = None
         self.author = None
         self.isbn = None
         self.AvailableInLibrary = "Yes"
+        if copies < 1:
+            raise ValueError("Number of copies must be at least 1")
+        self.copies = self.available = copies
         
         self.validate_and_set_book_info(title, author, isbn)
 
@@ -29,7 +44,7 @@ class Book:
         Args:
             title (str): The title of the book.
             author (str): The author of the book.
-            isbn (str): The ISBN of the book.
+            isbn (str): The ISBN of the book, with or without hyphens; it is stored hyphenated.
         """
         if not title.strip() or not author.strip() or not isbn.strip():
             raise ValueError("Book information is incomplete")
@@ -39,12 +54,12 @@ class Book:
             raise ValueError("Invalid ISBN")
 
         self.title = title
-        self.author = author
-        self.isbn = isbn
+        self.author = sys.intern(author)
+        self.isbn = normalize_isbn(isbn)
 
     def validate_isbn(self, isbn: str) -> bool:
         """
-        Validate the ISBN using a regular expression.
+        Validate the ISBN-13 prefix and check digit, whatever the hyphens.
 
         Args:
             isbn (str): The ISBN to validate.
@@ -52,8 +67,7 @@ class Book:
         Returns:
             bool: True if the ISBN is valid, False otherwise.
         """
-        isbn_pattern = r"^(978|979)-\d{1,5}-\d{1,7}-\d{1,7}-\d$"
-        return bool(re.match(isbn_pattern, isbn))
+        return normalize_isbn(isbn) is not None
 
     def __str__(self) -> str:
         """
@@ -61,6 +75,45 @@ class Book:
         """
         return f"Title: {self.title}, Author: {self.author}, ISBN: {self.isbn}"
 
+    @classmethod
+    def from_record(cls, record: Dict[str, str]) -> "Book":
+        """
+        Create a Book from a stored record without validating it again.
+
+        Repeated strings (author names and availability flags) are interned so that
+        books by the same author share one string.
+
+        Args:
+            record (Dict[str, str]): A row of books.csv, with its copies counted.
+
+        Returns:
+            Book: The book.
+        """
+        book = cls.__new__(cls)
+        book.title = record.get("title")
+        book.author = sys.intern(record.get("author") or "")
+        book.isbn = record["isbn"]
+        book.AvailableInLibrary = sys.intern(record.get("AvailableInLibrary") or "Unknown")
+        book.copies = int(record.get("copies") or 1)
+        book.available = int(record.get("available") or 0)
+        return book
+
+    def to_dict(self) -> Dict[str, str]:
+        """
+        Return the book as a storage record.
+
+        Returns:
+            Dict[str, str]: Dictionary with the same fields as a row of books.csv.
+        """
+        return {
+            "title": self.title,
+            "author": self.author,
+            "isbn": self.isbn,
+            "AvailableInLibrary": self.AvailableInLibrary,
+            "copies": str(self.copies),
+            "available": str(self.available)
+        }
+
 class BookDatabase:
     """Class representing a database of books."""
 
@@ -68,8 +121,69 @@ class BookDatabase:
         """Initialize the BookDatabase."""
         self._books = []
         self._storage = Storage()
+        self._isbn_index = None
+        self._search_index = None
+        # Signature of the catalog the saved search index matches, and the books
+        # added to the search index since it was saved
+        self._search_index_signature = None
+        self._search_index_changes = []
+        # Guards _books, the books not yet written to storage, against autosave
+        self._pending_lock = threading.Lock()
+        # Held while the ISBN and search indexes are built, so callers during a
+        # warm-up wait for the build instead of starting another
+        self._index_lock = threading.Lock()
+        self._search_lock = threading.Lock()
+
+    def warm_up(self) -> int:
+        """
+        Build the ISBN index now instead of on first use.
 
-    def add_book(self, title: str, author: str, isbn: str) -> None:
+        Returns:
+            int: Number of books.
+        """
+        return len(self._index())
+
+    def warm_up_search(self) -> int:
+        """
+        Load or build the search index now instead of on first use.
+
+        Returns:
+            int: Number of books.
+        """
+        self._search()
+        return len(self._index())
+
+    def _index(self) -> Dict[str, Book]:
+        """
+        Return the ISBN index, building it from storage on first use.
+
+        The index maps every known ISBN (stored and added in this session) to its
+        Book, so duplicate checks and lookups do not rescan books.csv. It is keyed by
+        the normalized ISBN, see _isbn_key, so books stored with other hyphens are
+        still found and cannot be added twice.
+
+        Returns:
+            Dict[str, Book]: Mapping of normalized ISBN to book.
+        """
+        if self._isbn_index is None:
+            with self._index_lock:
+                if self._isbn_index is None:
+                    index = {}
+                    if self._storage.books_exist():
+                        for loaded_book in self._storage.load_data(self._storage.books_filepath):
+                            if "isbn" in loaded_book:
+                                index[self._isbn_key(loaded_book["isbn"])] = Book.from_record(loaded_book)
+                    for book in self._books:
+                        index[self._isbn_key(book.isbn)] = book
+                    self._isbn_index = index
+        return self._isbn_index
+
+    @staticmethod
+    def _isbn_key(isbn: str) -> str:
+        """Return the key of an ISBN in the ISBN index: hyphenated, or stripped if it is not a valid ISBN-13."""
+        return normalize_isbn(isbn) or isbn.strip()
+
+    def add_book(self, title: str, author: str, isbn: str, copies: int = 1) -> None:
         """
         Add a book to the database.
 
@@ -77,22 +191,275 @@ class BookDatabase:
             title (str): The title of the book.
             author (str): The author of the book.
             isbn (str): The ISBN of the book.
+            copies (int, optional): Number of copies. Defaults to 1.
         """
-        if isbn in [book.isbn for book in self._books]:
-            raise ValueError("Book with the same ISBN already exists.")
-        if isbn in [entry['isbn'] for entry in self.list_books()]:
-            raise ValueError("Book with the same ISBN already exists.")
-        if not title:
-            raise ValueError("Title cannot be empty")
-        if not author:
-            raise ValueError("Author cannot be empty")
-        if not isbn:
-            raise ValueError("ISBN cannot be empty")
-            
-        book = Book(title, author, isbn)
-        self._books.append(book)
+        self.create_book(title, author, isbn, copies)
         print("\nBook added successfully ✅.")
 
+    def create_book(self, title: str, author: str, isbn: str, copies: int = 1) -> Book:
+        """
+        Add a book to the database without printing anything.
+
+        More copies of a stored book are added through CheckoutDatabase.add_copies.
+
+        Args:
+            title (str): The title of the book.
+            author (str): The author of the book.
+            isbn (str): The ISBN of the book, with or without hyphens.
+            copies (int, optional): Number of copies. Defaults to 1.
+
+        Returns:
+            Book: The new book, with the ISBN hyphenated.
+
+        Raises:
+            ValueError: If the information is incomplete or invalid, the ISBN already
+                exists or copies is not positive.
+        """
+        with metrics.span("add_book"):
+            if isbn and self._isbn_key(isbn) in self._index():
+                raise ValueError("Book with the same ISBN already exists.")
+            if not title:
+                raise ValueError("Title cannot be empty")
+            if not author:
+                raise ValueError("Author cannot be empty")
+            if not isbn:
+                raise ValueError("ISBN cannot be empty")
+            
+            book = Book(title, author, isbn, copies)
+            isbn = book.isbn
+            with self._pending_lock:
+                self._books.append(book)
+            self._index()[isbn] = book
+            with self._search_lock:
+                if self._search_index is not None:
+                    self._search_index.add(isbn, title, author)
+                    self._search_index_changes.append((isbn, title, author))
+            return book
+
+    def flush(self) -> int:
+        """
+        Write the books added since the last save to storage in one append.
+
+        Only these books are written, so the cost depends on what changed rather than
+        on the size of the catalog. They stay in the ISBN and search indexes, so they
+        can be checked out and found straight away by code that reads storage.
+
+        Returns:
+            int: Number of books written.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._pending_lock:
+            records = [dict(book.to_dict(), timestamp=timestamp) for book in self._books]
+            written = self._storage.append_records(
+                self._storage.books_filepath, records, self._storage._get_books_fieldnames()
+            )
+            self._books = []
+        return written
+
+    def import_books(self, filepath: str, chunk_size: int = 10000) -> Dict[str, int]:
+        """
+        Import books in bulk from a CSV or JSON Lines file.
+
+        The file is streamed in chunks of chunk_size rows. Each chunk's ISBNs are
+        normalized together and checked against the ISBN index, and every accepted
+        book is written to storage in one append at the end.
+
+        Args:
+            filepath (str): Path to a .csv or .jsonl file with title, author and isbn fields.
+            chunk_size (int, optional): Number of rows validated per batch. Defaults to 10000.
+
+        Returns:
+            Dict[str, int]: Counts of accepted and rejected rows; duplicates are included in rejected.
+        """
+        index = self._index()
+        report = {"accepted": 0, "rejected": 0, "duplicates": 0}
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        accepted = {}
+        rows = self._read_import_file(filepath)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            isbns = normalize_isbns([str(row.get("isbn") or "") for row in chunk])
+            for row, isbn in zip(chunk, isbns):
+                title = str(row.get("title") or "").strip()
+                author = str(row.get("author") or "").strip()
+                if isbn is None or not title or not author:
+                    report["rejected"] += 1
+                elif isbn in index or isbn in accepted:
+                    report["rejected"] += 1
+                    report["duplicates"] += 1
+                else:
+                    accepted[isbn] = {
+                        "title": title,
+                        "author": author,
+                        "isbn": isbn,
+                        "AvailableInLibrary": "Yes",
+                        "timestamp": timestamp,
+                        "copies": "1",
+                        "available": "1"
+                    }
+        report["accepted"] = self._storage.append_records(
+            self._storage.books_filepath, list(accepted.values()), self._storage._get_books_fieldnames()
+        )
+        for isbn, record in accepted.items():
+            index[isbn] = Book.from_record(record)
+        with self._search_lock:
+            if self._search_index is not None:
+                for isbn, record in accepted.items():
+                    self._search_index.add(isbn, record["title"], record["author"])
+                    self._search_index_changes.append((isbn, record["title"], record["author"]))
+        return report
+
+    def _read_import_file(self, filepath: str) -> Iterator[Dict[str, str]]:
+        """
+        Stream the rows of an import file.
+
+        Args:
+            filepath (str): Path to a .csv or .jsonl file.
+
+        Yields:
+            Dict[str, str]: One row at a time.
+        """
+        with open(filepath, 'r', newline='', encoding='utf-8') as file:
+            if filepath.endswith((".jsonl", ".json")):
+                for line in file:
+                    if line.strip():
+                        yield json.loads(line)
+            else:
+                yield from csv.DictReader(file)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, str]]:
+        """
+        Search the catalog by title and author.
+
+        Every word of the query must match the start of a word in the title or author.
+
+        Args:
+            query (str): The words to search for.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+
+        Returns:
+            List[Dict[str, str]]: Matching book records, best match first.
+        """
+        index = self._index()
+        results = []
+        for isbn, _ in self._search().search(query, limit):
+            book = index.get(self._isbn_key(isbn))
+            if book is not None:
+                results.append(book.to_dict())
+        return results
+
+    def save_search_index(self) -> None:
+        """
+        Save the search index next to the catalog so the next start can reuse it.
+
+        Nothing is written if the saved index already matches the catalog, and only
+        the books added since it was loaded are written if it has changed.
+        """
+        signature = self._storage.signature(self._storage.books_filepath)
+        # Without a catalog on disk there is nothing a saved index could be reused for
+        if self._search_index is None or signature is None:
+            return
+        signature = list(signature)
+        if signature == self._search_index_signature:
+            return
+        if self._search_index_signature is None:
+            self._search_index.save(self._search_index_path(), signature)
+        else:
+            self._search_index.save_changes(self._search_index_path(), self._search_index_changes, signature)
+        self._search_index_signature = signature
+        self._search_index_changes = []
+
+    def _search(self) -> SearchIndex:
+        """
+        Return the search index, loading it from disk or building it on first use.
+
+        A saved index is only reused if the catalog has not changed since it was saved.
+
+        Returns:
+            SearchIndex: The search index.
+        """
+        if self._search_index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    signature = self._storage.signature(self._storage.books_filepath)
+                    search_index = SearchIndex.load(self._search_index_path(), signature)
+                    if search_index is None:
+                        # Books added meanwhile wait for the lock and are added to the result
+                        search_index = SearchIndex.build(
+                            (book.isbn, book.title, book.author) for book in list(self._index().values())
+                        )
+                    else:
+                        self._search_index_signature = list(signature)
+                        for book in self._books:
+                            search_index.add(book.isbn, book.title, book.author)
+                            self._search_index_changes.append((book.isbn, book.title, book.author))
+                    self._search_index = search_index
+        return self._search_index
+
+    def _search_index_path(self) -> str:
+        """Return the path of the saved search index."""
+        return os.path.join(self._storage.database_folder, "search_index.json")
+
+    def has_book(self, isbn: str) -> bool:
+        """
+        Check whether a book with the given ISBN is known.
+
+        Args:
+            isbn (str): The ISBN to look up.
+
+        Returns:
+            bool: True if the ISBN is in the catalog, False otherwise.
+        """
+        return self._isbn_key(isbn) in self._index()
+
+    def get_book(self, isbn: str) -> Optional[Dict[str, str]]:
+        """
+        Look up a book by ISBN.
+
+        Args:
+            isbn (str): The ISBN to look up.
+
+        Returns:
+            Optional[Dict[str, str]]: The book record, or None if the ISBN is unknown.
+        """
+        book = self._index().get(self._isbn_key(isbn))
+        return book.to_dict() if book is not None else None
+
+    def update_availability(self, isbn: str, available: str) -> None:
+        """
+        Update the availability of an indexed book after a checkout.
+
+        Nothing is loaded if the index has not been built yet.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            available (str): New value of AvailableInLibrary ("Yes" or "No").
+        """
+        if self._isbn_index is None:
+            # Not loaded yet; it will read the current availability from storage
+            return
+        book = self._isbn_index.get(self._isbn_key(isbn))
+        if book is not None:
+            book.AvailableInLibrary = sys.intern(available)
+
+    def update_copies(self, isbn: str, copies: int, available: int) -> None:
+        """
+        Update the copy counts of an indexed book after a checkout, return or new copies.
+
+        Nothing is loaded if the index has not been built yet.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copies (int): Number of copies the library owns.
+            available (int): Number of copies on the shelf.
+        """
+        book = self._isbn_index.get(self._isbn_key(isbn)) if self._isbn_index is not None else None
+        if book is not None:
+            book.copies, book.available = copies, available
+            book.AvailableInLibrary = "Yes" if available else "No"
+
     def list_books(self) -> List[Dict[str, str]]:
         """
         Return details of all books in the database.
@@ -105,29 +472,109 @@ class BookDatabase:
         if self._books:
             # Append books from the database
             for book in self._books:
-                books_data.append({
-                    "title": book.title,
-                    "author": book.author,
-                    "isbn": book.isbn,
-                    "AvailableInLibrary": book.AvailableInLibrary
-                })
+                books_data.append(book.to_dict())
         
-        # Append loaded books from storage
+        # Append loaded books from storage, read column by column so that no
+        # intermediate record is built per book
         if self._storage.books_exist():
             books_path = self._storage.books_filepath
-            loaded_books_data = self._storage.load_data(books_path)
-            if loaded_books_data:
-                for loaded_book in loaded_books_data:
-                    # Ensure that the loaded book contains necessary fields
-                    if all(field in loaded_book for field in ["title", "author", "isbn"]):
-                        books_data.append({
-                            "title": loaded_book["title"],
-                            "author": loaded_book["author"],
-                            "isbn": loaded_book["isbn"],
-                            "AvailableInLibrary": loaded_book.get("AvailableInLibrary", "Unknown")
-                        })
+            columns = self._storage.load_columns(
+                books_path, ["title", "author", "isbn", "AvailableInLibrary", "copies", "available"])
+            # Ensure that the loaded books contain necessary fields
+            if all(field in columns for field in ["title", "author", "isbn"]):
+                availability = columns.get("AvailableInLibrary") or ["Unknown"] * len(columns["isbn"])
+                books_data.extend({
+                    "title": title,
+                    "author": author,
+                    "isbn": isbn,
+                    "AvailableInLibrary": available,
+                    "copies": copies,
+                    "available": on_shelf
+                } for title, author, isbn, available, copies, on_shelf in zip(
+                    columns["title"], columns["author"], columns["isbn"], availability, columns["copies"], columns["available"]))
         
         return books_data
             
-# Global instance of BookDatabase
-book_database = BookDatabase()
+    def iter_books(self, offset: int = 0) -> Iterator[Dict[str, str]]:
+        """
+        Stream the books in the database, stored books first.
+
+        Args:
+            offset (int, optional): Number of books to skip. Defaults to 0.
+
+        Yields:
+            Dict[str, str]: One book record at a time.
+        """
+        for record, _ in islice(self._iter_books_from(None), offset, None):
+            yield record
+
+    def page_books(self, page_size: int = 20, offset: int = 0, cursor: Optional[tuple] = None) -> Tuple[List[Dict[str, str]], Optional[tuple]]:
+        """
+        Return one page of books.
+
+        Args:
+            page_size (int, optional): Maximum number of books on the page. Defaults to 20.
+            offset (int, optional): Number of books to skip after the cursor. Defaults to 0.
+            cursor (Optional[tuple], optional): Cursor returned with the previous page. Defaults to the start.
+
+        Returns:
+            Tuple[List[Dict[str, str]], Optional[tuple]]: The books on the page and the cursor
+            of the next page, or None if this is the last page.
+        """
+        page, next_cursor = [], None
+        for record, position in islice(self._iter_books_from(cursor), offset, None):
+            if len(page) == page_size:
+                return page, next_cursor
+            page.append(record)
+            next_cursor = position
+        return page, None
+
+    def _iter_books_from(self, cursor: Optional[tuple]) -> Iterator[Tuple[Dict[str, str], tuple]]:
+        """
+        Stream stored books and then books added in this session, with resume cursors.
+
+        Args:
+            cursor (Optional[tuple]): (storage cursor, session index) to resume from, or None.
+
+        Yields:
+            Tuple[Dict[str, str], tuple]: A book record and the cursor following it.
+        """
+        storage_cursor, memory_index = cursor or (None, 0)
+        if memory_index == 0 and self._storage.books_exist():
+            for loaded_book, position in self._storage.iter_data(self._storage.books_filepath, storage_cursor):
+                if all(field in loaded_book for field in ["title", "author", "isbn"]):
+                    yield {
+                        "title": loaded_book["title"],
+                        "author": loaded_book["author"],
+                        "isbn": loaded_book["isbn"],
+                        "AvailableInLibrary": loaded_book.get("AvailableInLibrary", "Unknown"),
+                        "copies": loaded_book.get("copies"),
+                        "available": loaded_book.get("available")
+                    }, (position, 0)
+        for index in range(memory_index, len(self._books)):
+            yield self._books[index].to_dict(), (None, index + 1)
+
+# Global instance of BookDatabase, created on first use so that importing the module
+# does no I/O
+_book_database = None
+_book_database_lock = threading.Lock()
+
+def get_book_database() -> BookDatabase:
+    """
+    Return the global BookDatabase, creating it on first use.
+
+    Returns:
+        BookDatabase: The shared instance.
+    """
+    global _book_database
+    if _book_database is None:
+        with _book_database_lock:
+            if _book_database is None:
+                _book_database = BookDatabase()
+    return _book_database
+
+def __getattr__(name: str):
+    """Keep `book_database` importable by name while creating it lazily."""
+    if name == "book_database":
+        return get_book_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,5 +1,7 @@
 # import unittest
+import os
 from .book import Book, BookDatabase
+from .storage import Storage
 import pytest
 
 
@@ -8,34 +10,43 @@ def book_database():
     return BookDatabase()
 
 def test_book_creation():
-    book = Book("Title", "Author", "978-0-123456-78-9")
+    book = Book("Title", "Author", "978-0-123456-78-6")
     assert book.title == "Title"
     assert book.author == "Author"
-    assert book.isbn == "978-0-123456-78-9"
+    assert book.isbn == "978-0-123456-78-6"
 
 def test_invalid_isbn():
     with pytest.raises(ValueError):
         Book("Title", "Author", "invalid_isbn")
 
 def test_add_book(book_database):
-    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-9")
+    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-6")
     assert len(book_database._books) == 1
     assert book_database._books[0].title == "Test Title"
     assert book_database._books[0].author == "Test Author"
-    assert book_database._books[0].isbn == "978-0-123456-78-9"
+    assert book_database._books[0].isbn == "978-0-123456-78-6"
 
 def test_add_book_duplicate_isbn(book_database):
-    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-9")
+    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-6")
     with pytest.raises(ValueError):
-        book_database.add_book("Duplicate Title", "Duplicate Author", "978-0-123456-78-9")
+        book_database.add_book("Duplicate Title", "Duplicate Author", "978-0-123456-78-6")
+
+def test_add_book_duplicate_isbn_other_hyphens(book_database):
+    book_database.add_book("Test Title", "Test Author", "9780123456786")
+    assert book_database._books[0].isbn == "978-0-123456-78-6"
+    for isbn in ("978-0-123456-78-6", "978-01234-5678-6", " 9780123456786 "):
+        with pytest.raises(ValueError):
+            book_database.add_book("Duplicate Title", "Duplicate Author", isbn)
+    assert book_database.has_book("978-0123-45678-6")
+    assert book_database.get_book("9780123456786")["title"] == "Test Title"
 
 def test_add_book_empty_title(book_database):
     with pytest.raises(ValueError):
-        book_database.add_book("", "Test Author", "978-0-123456-78-9")
+        book_database.add_book("", "Test Author", "978-0-123456-78-6")
 
 def test_add_book_empty_author(book_database):
     with pytest.raises(ValueError):
-        book_database.add_book("Test Title", "", "978-0-123456-78-9")
+        book_database.add_book("Test Title", "", "978-0-123456-78-6")
 
 def test_add_book_empty_isbn(book_database):
     with pytest.raises(ValueError):
@@ -44,8 +55,8 @@ def test_add_book_empty_isbn(book_database):
 # Update the test_list_books test case
 def test_list_books(book_database):
     # Add some books to the database
-    book_database.add_book("Test Title 1", "Test Author 1", "978-0-123456-78-9")
-    book_database.add_book("Test Title 2", "Test Author 2", "978-0-123456-78-0")
+    book_database.add_book("Test Title 1", "Test Author 1", "978-0-123456-78-6")
+    book_database.add_book("Test Title 2", "Test Author 2", "978-0-123456-79-3")
     # Update the expected number of books
     assert len(book_database.list_books()) == 2
 
@@ -61,3 +72,79 @@ def test_list_books_with_storage(book_database, tmp_path):
     assert len(book_database.list_books()) == 1
 
 
+def test_get_book_from_index(book_database):
+    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-6")
+    assert book_database.has_book("978-0-123456-78-6")
+    assert book_database.get_book("978-0-123456-78-6")["title"] == "Test Title"
+    assert book_database.get_book("978-0-000000-00-0") is None
+
+def test_update_availability(book_database):
+    book_database.add_book("Test Title", "Test Author", "978-0-123456-78-6")
+    book_database.update_availability("978-0-123456-78-6", "No")
+    assert book_database.get_book("978-0-123456-78-6")["AvailableInLibrary"] == "No"
+
+def test_import_books(book_database, tmp_path):
+    book_database._storage = Storage(database_folder=str(tmp_path))
+    source = tmp_path / "import.jsonl"
+    source.write_text(
+        '{"title": "One", "author": "A", "isbn": "9780123456786"}\n'
+        '{"title": "Two", "author": "B", "isbn": "978-0-123456-78-6"}\n'
+        '{"title": "Three", "author": "C", "isbn": "12345"}\n'
+    )
+    report = book_database.import_books(str(source), chunk_size=2)
+    assert report == {"accepted": 1, "rejected": 2, "duplicates": 1}
+    assert book_database.has_book("978-0-123456-78-6")
+    assert len(book_database._storage.load_data(book_database._storage.books_filepath)) == 1
+
+def test_page_books(book_database, tmp_path):
+    book_database._storage = Storage(database_folder=str(tmp_path))
+    source = tmp_path / "import.csv"
+    source.write_text("title,author,isbn\nOne,A,978-0-123456-78-6\n\"Two, \"\"quoted\"\"\nline\",B,978-1-786330-89-5\n")
+    book_database.import_books(str(source))
+    book_database.add_book("Three", "C", "978-0-123456-79-3")
+    page, cursor = book_database.page_books(page_size=2)
+    assert [book["title"] for book in page] == ["One", 'Two, "quoted"\nline']
+    page, cursor = book_database.page_books(page_size=2, cursor=cursor)
+    assert [book["title"] for book in page] == ["Three"]
+    assert cursor is None
+    assert [book["title"] for book in book_database.iter_books(offset=2)] == ["Three"]
+
+def test_flush_writes_new_books_once(book_database, tmp_path):
+    book_database._storage = Storage(database_folder=str(tmp_path))
+    book_database.create_book("One", "A", "978-0-123456-78-6")
+    assert book_database.flush() == 1
+    assert book_database.flush() == 0
+    assert [book["title"] for book in book_database.list_books()] == ["One"]
+    assert book_database._storage.find_record(book_database._storage.books_filepath, "isbn", "978-0-123456-78-6")
+
+def test_save_search_index_writes_only_changes(book_database, tmp_path):
+    book_database._storage = Storage(database_folder=str(tmp_path))
+    book_database.create_book("Pearl", "A", "978-0-123456-78-6")
+    book_database.flush()
+    book_database.search("pearl")
+    book_database.save_search_index()
+    os.utime(book_database._search_index_path(), (0, 0))
+    book_database.save_search_index()
+    assert os.path.getmtime(book_database._search_index_path()) == 0
+    book_database.create_book("Pearl Two", "B", "978-0-123456-79-3")
+    book_database.flush()
+    book_database.save_search_index()
+    assert os.path.getmtime(book_database._search_index_path()) == 0
+    assert os.path.exists(book_database._search_index_path() + ".log")
+    reloaded = BookDatabase()
+    reloaded._storage = book_database._storage
+    assert len(reloaded.search("pearl")) == 2
+    assert reloaded._search_index_signature is not None
+
+def test_book_from_record_shares_author_strings():
+    first = Book.from_record({"title": "One", "author": "".join(["Same ", "Author"]), "isbn": "978-0-123456-78-6"})
+    second = Book.from_record({"title": "Two", "author": "".join(["Same ", "Author"]), "isbn": "978-1-786330-89-5"})
+    assert first.author is second.author
+    assert not hasattr(first, "__dict__")
+
+def test_search_updates_on_add_book(book_database, tmp_path):
+    book_database._storage = Storage(database_folder=str(tmp_path))
+    book_database.add_book("Programming Pearls", "Jon Bentley", "978-0-123456-78-6")
+    assert book_database.search("pearl")[0]["isbn"] == "978-0-123456-78-6"
+    book_database.add_book("Pearl Harbor", "Someone", "978-0-123456-79-3")
+    assert [book["isbn"] for book in book_database.search("pearl")] == ["978-0-123456-79-3", "978-0-123456-78-6"]
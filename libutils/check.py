@@ -2,22 +2,38 @@
 Module for checkout functionalities.
 """
 
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from .book import get_book_database
+from .holds import Hold, HoldQueues
+from .inventory import Inventory, count_copies
+from .isbn import normalize_isbn, normalize_isbns
+from .loans import Loan, LoanIndex, due_after, format_time
+from .metrics import metrics
 from .storage import Storage
-from .user import UserDatabase
+from .user import get_user_database
+
+# Number of days a book may be kept, from checkout or renewal
+LOAN_DAYS = 14
 
 class Checkout:
     """
     Represents a book checkout.
     """
+
+    __slots__ = ("user_id", "isbn", "due")
     
-    def __init__(self, user_id: str, isbn: str):
+    def __init__(self, user_id: str, isbn: str, due: Optional[str] = None):
         """
         Initialize a Checkout object.
 
         Args:
             user_id (str): The ID of the user.
             isbn (str): The ISBN of the book being checked out.
+            due (Optional[str], optional): When the book is due back.
         """
+        self.due = due
         try:
             if not user_id.strip() and not isbn.strip():
                 raise ValueError("User ID and ISBN cannot be empty")
@@ -33,91 +49,863 @@ class Checkout:
             self.user_id = user_id
             self.isbn = isbn
 
+class CheckoutResult(NamedTuple):
+    """Outcome of one programmatic checkout, return or renewal."""
+
+    user_id: str
+    isbn: str
+    ok: bool
+    error: Optional[str] = None
+
 class CheckoutDatabase:
     """
     Database for managing book checkouts.
+
+    Loans are kept in a LoanIndex, so finding who holds a book or what a user holds
+    does not parse the BookInHand column. The index is built from storage once and
+    then kept current from the loan journal and the books and users appended since;
+    it is only rebuilt when books or users are rewritten on disk.
+
+    A book may have several copies. Each ISBN's copies are kept in an Inventory with
+    a free list of the copies on the shelf, so checkouts and returns take and put
+    back a copy in O(1), and the number on the shelf is known without a scan.
+
+    Users may place holds on books with no copy on the shelf. Holds are kept in a
+    FIFO queue per ISBN; when a copy is returned it is set aside for the first user
+    in line, and only that user can check it out.
     """
     
-    def __init__(self):
+    # Checkout errors after which the menu offers to place a hold
+    CHECKED_OUT = "This Book already checkedout."
+    ON_HOLD = "This Book is on hold for another user."
+
+    def __init__(self, storage: Storage = None, max_loans: Optional[int] = None, loan_days: int = LOAN_DAYS):
+        """
+        Initialize the CheckoutDatabase.
+
+        Args:
+            storage (Storage, optional): Storage holding books, users and loans. Defaults to Storage().
+            max_loans (Optional[int], optional): Most books a user may hold at once. Defaults to no limit.
+            loan_days (int, optional): Days until a book checked out or renewed is due. Defaults to LOAN_DAYS.
+        """
         self._checkouts = []
-        self.users_data =  UserDatabase()
-        self._storage = Storage()
+        self.users_data = get_user_database()
+        self.books_data = get_book_database()
+        self._storage = storage if storage is not None else Storage()
         self.books_path = self._storage.books_filepath
         self.users_path = self._storage.users_filepath
+        self.max_loans = max_loans
+        self.loan_days = loan_days
+        self._loans: Optional[LoanIndex] = None
+        self._holds = HoldQueues()
+        self._inventory = Inventory()
+        self._isbns = set()
+        # The ISBNs as books.csv stores them, by normalized ISBN, see _stored_isbn
+        self._stored_isbns: Dict[str, str] = {}
+        # (UserID, Name) by user key, see _user_key
+        self._users: Dict[str, Tuple[str, str]] = {}
+        self._version = None
+        self._journal_cursor = None
+        # Where books and users were read up to, see Storage.read_appended
+        self._books_cursor = None
+        self._users_cursor = None
+        self._state_lock = threading.RLock()
+
+    def warm_up(self) -> int:
+        """
+        Load the loans, holds and copies now instead of on first use.
+
+        Returns:
+            int: Number of books on loan.
+        """
+        with self._state_lock:
+            self._sync()
+            return len(self._loans)
 
-    def checkout_book(self) -> None:
+    def checkout_book(self, user_id: str = None, isbn: str = None) -> Optional[CheckoutResult]:
         """
         Record a book checkout in the database.
 
+        Called without arguments, as the menu does, it prompts for the user ID and ISBN
+        and prints the outcome. Called with both it does neither and returns the result.
+
         Args:
-            user_id (str): The ID of the user checking out the book.
-            isbn (str): The ISBN of the book being checked out.
+            user_id (str, optional): The ID of the user checking out the book.
+            isbn (str, optional): The ISBN of the book being checked out.
+
+        Returns:
+            Optional[CheckoutResult]: The outcome, or None if the prompt was not shown.
+        """
+        if user_id is None and isbn is None:
+            return self._interactive(self._try_checkout, "Book checked out ✅.")
+        return self._try_checkout(user_id or "", isbn or "")
+
+    def return_book(self, user_id: str = None, isbn: str = None) -> Optional[CheckoutResult]:
+        """
+        Record the return of a book.
+
+        Without arguments the user ID and ISBN are prompted for, as for checkout_book.
+
+        Args:
+            user_id (str, optional): The ID of the user returning the book.
+            isbn (str, optional): The ISBN of the book.
+
+        Returns:
+            Optional[CheckoutResult]: The outcome, or None if the prompt was not shown.
+        """
+        if user_id is None and isbn is None:
+            return self._interactive(self._try_return, "Book returned ✅.")
+        return self._try_return(user_id or "", isbn or "")
+
+    def renew_book(self, user_id: str = None, isbn: str = None) -> Optional[CheckoutResult]:
+        """
+        Extend a loan by loan_days from today.
+
+        Without arguments the user ID and ISBN are prompted for, as for checkout_book.
+
+        Args:
+            user_id (str, optional): The ID of the user holding the book.
+            isbn (str, optional): The ISBN of the book.
+
+        Returns:
+            Optional[CheckoutResult]: The outcome, or None if the prompt was not shown.
+        """
+        if user_id is None and isbn is None:
+            return self._interactive(self._try_renew, "Loan renewed ✅.")
+        return self._try_renew(user_id or "", isbn or "")
+
+    def place_hold(self, user_id: str = None, isbn: str = None) -> Optional[CheckoutResult]:
+        """
+        Put a user in line for a book that is checked out.
+
+        Without arguments the user ID and ISBN are prompted for, as for checkout_book.
+
+        Args:
+            user_id (str, optional): The ID of the user.
+            isbn (str, optional): The ISBN of the book.
+
+        Returns:
+            Optional[CheckoutResult]: The outcome, or None if the prompt was not shown.
+        """
+        if user_id is None and isbn is None:
+            return self._interactive(self._try_place_hold, "Hold placed ✅.")
+        return self._try_place_hold(user_id or "", isbn or "")
+
+    def cancel_hold(self, user_id: str, isbn: str) -> CheckoutResult:
+        """
+        Take a user out of the line for a book.
+
+        If a copy was set aside for the user, it is set aside for the next in line.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            CheckoutResult: The outcome.
+        """
+        return self._attempt("cancel_hold", self._cancel_hold, user_id, isbn)
+
+    def hold_position(self, user_id: str, isbn: str) -> Optional[int]:
+        """
+        Return a user's place in the line for a book.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[int]: 0 if the book is set aside for the user, 1 if they are next
+            in line and so on, or None if the user has no hold on it.
+        """
+        with self._state_lock:
+            self._sync()
+            user = self._find_user(user_id)
+            return self._holds.position(user[0], self._stored_isbn(isbn)) if user is not None else None
+
+    def holds_for(self, user_id: str) -> List[Hold]:
+        """
+        Return the holds of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            List[Hold]: The user's holds, oldest first; empty if the user is unknown.
+        """
+        with self._state_lock:
+            self._sync()
+            user = self._find_user(user_id)
+            return self._holds.holds_for(user[0]) if user is not None else []
+
+    def checkout_many(self, checkouts: Iterable[Tuple[str, str]]) -> List[CheckoutResult]:
+        """
+        Record many checkouts with one validate and commit cycle.
+
+        Every checkout is validated against the loans, including the earlier checkouts
+        of the same batch, and all accepted checkouts are committed in one write.
+        Storage is locked for the whole batch.
+
+        Args:
+            checkouts (Iterable[Tuple[str, str]]): (user ID, ISBN) pairs, for example from a barcode scanner feed.
+
+        Returns:
+            List[CheckoutResult]: One result per pair, in the same order.
+        """
+        with metrics.span("checkout_many") as span:
+            results, accepted = [], []
+            timestamp = format_time(datetime.now())
+            due = due_after(timestamp, self.loan_days)
+            checkouts = list(checkouts)
+            # Scanned ISBNs are normalized in one batch; invalid ones are kept to be rejected
+            normalized = normalize_isbns([str(isbn) for _, isbn in checkouts])
+            with self._storage.lock_all(), self._state_lock:
+                self._sync()
+                for (user_id, isbn), canonical in zip(checkouts, normalized):
+                    user_id = str(user_id).strip()
+                    isbn = self._stored_isbns.get(canonical, canonical) if canonical else str(isbn).strip()
+                    try:
+                        self._validate_input(user_id, isbn)
+                        user = self._find_user(user_id)
+                        self._validate(isbn, user)
+                    except ValueError as e:
+                        results.append(CheckoutResult(user_id, isbn, False, str(e)))
+                        continue
+                    copy = self._inventory.take(isbn)
+                    self._loans.add(user[0], isbn, timestamp, due, copy)
+                    self._holds.fulfil(user[0], isbn)
+                    accepted.append((user[0], isbn, copy))
+                    results.append(CheckoutResult(user[0], isbn, True))
+                try:
+                    self._storage.record_checkouts(accepted, due)
+                except BaseException:
+                    # The batch's loans are already in the index; rebuild it from storage
+                    self._loans = None
+                    raise
+                shelf = [(isbn, self._inventory.copies(isbn), self._inventory.available(isbn)) for _, isbn, _ in accepted]
+            for user_id, isbn, _ in accepted:
+                self._checkouts.append(Checkout(user_id, isbn, due))
+            for isbn, copies, available in shelf:
+                self.books_data.update_copies(isbn, copies, available)
+            span.add(rows=len(results), failed=len(results) - len(accepted))
+            return results
+
+    def add_copies(self, isbn: str, count: int = 1) -> int:
+        """
+        Add copies of a book to the shelf.
+
+        The new copies are set aside for users waiting for the book, first in line first.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            count (int, optional): Number of copies to add. Defaults to 1.
+
+        Returns:
+            int: The number of copies the library now owns.
+
+        Raises:
+            ValueError: If the book is unknown or count is not positive.
+        """
+        isbn = self._canonical_isbn(isbn)
+        if count < 1:
+            raise ValueError("Number of copies must be at least 1")
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            if isbn not in self._isbns:
+                raise ValueError("Enter valid ISBN")
+            copies = self._inventory.add(isbn, count)
+            events = []
+            for _ in copies:
+                hold = self._holds.allocate(isbn)
+                if hold is not None:
+                    events.append(("ready", hold.user_id, isbn))
+            try:
+                self._storage.record_copies(isbn, copies, events)
+            except BaseException:
+                self._loans = None
+                raise
+            total, available = self._inventory.copies(isbn), self._inventory.available(isbn)
+        self.books_data.update_copies(isbn, total, available)
+        return total
+
+    def copies_of(self, isbn: str) -> Tuple[int, int]:
+        """
+        Return how many copies of a book are on the shelf and how many the library owns.
+
+        Copies set aside for users with holds count as on the shelf.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Tuple[int, int]: Copies on the shelf and copies owned; (0, 0) if the book is unknown.
+        """
+        with self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            return self._inventory.available(isbn), self._inventory.copies(isbn)
+
+    def loans_for(self, user_id: str) -> List[Loan]:
+        """
+        Return the books a user holds.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            List[Loan]: The user's loans, oldest first; empty if the user is unknown.
+        """
+        with self._state_lock:
+            self._sync()
+            user = self._find_user(user_id)
+            return self._loans.loans_for(user[0]) if user is not None else []
+
+    def overdue_loans(self, now: Optional[datetime] = None) -> List[Loan]:
+        """
+        Return the loans that are overdue.
+
+        Only the overdue loans are visited, through the due date heap. Loans recorded
+        before due dates were kept have none and are never overdue.
+
+        Args:
+            now (Optional[datetime], optional): The time to check against. Defaults to now.
+
+        Returns:
+            List[Loan]: The overdue loans, longest overdue first.
+        """
+        with self._state_lock:
+            self._sync()
+            return self._loans.overdue(format_time(now or datetime.now()))
+
+    def user_name(self, user_id: str) -> Optional[str]:
+        """
+        Return the name of a user.
+
+        Args:
+            user_id (str): The ID of the user.
+
+        Returns:
+            Optional[str]: The name, or None if the user is unknown.
+        """
+        with self._state_lock:
+            self._sync()
+            user = self._find_user(user_id)
+            return user[1] if user is not None else None
+
+    def holder_of(self, isbn: str) -> Optional[str]:
+        """
+        Return who holds a book, the user who has held it longest if several copies are lent.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[str]: The UserID of the user holding the book, or None if nobody does.
+        """
+        with self._state_lock:
+            self._sync()
+            return self._loans.holder(self._stored_isbn(isbn))
+
+    def holders_of(self, isbn: str) -> List[str]:
+        """
+        Return everyone holding a copy of a book.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            List[str]: The UserIDs of the users holding the book, longest held first.
+        """
+        with self._state_lock:
+            self._sync()
+            return self._loans.holders(self._stored_isbn(isbn))
+
+    def _interactive(self, attempt: Callable[[str, str], CheckoutResult], success: str) -> Optional[CheckoutResult]:
+        """
+        Prompt for a user ID and ISBN, attempt an operation on them and print its outcome.
+
+        Args:
+            attempt (Callable[[str, str], CheckoutResult]): The operation, such as _try_checkout.
+            success (str): Message printed if it succeeds.
+
+        Returns:
+            Optional[CheckoutResult]: The outcome, or None if the library has no books or users.
         """
         try:
-            # if not (self._storage.books_exist() and self._storage.users_exist()):
-            #     raise ValueError("Database empty. Add books and users.")
             if not (self._storage.books_exist()):
                 raise ValueError("No books available in Library, add books.")
             if not (self._storage.users_exist()):
                 raise ValueError("No users available in Library, add users.")
         except ValueError as e:
             print(f"\n❌ Error: {e} ❌")
+            return None
+        user_id, isbn = (input(f"Enter {field}: ") for field in ["user ID", "ISBN"])
+        result = attempt(user_id, isbn)
+        if result.ok:
+            print(success)
         else:
-            user_id, isbn = (input(f"Enter {field}: ") for field in ["user ID", "ISBN"])
-            
+            print(f"\n❌ Error: {result.error} ❌")
+            if attempt == self._try_checkout and result.error in (self.CHECKED_OUT, self.ON_HOLD) \
+                    and input("Place a hold on it? (y/n): ").strip().lower() == "y":
+                return self._interactive_hold(user_id, isbn)
+        return result
+
+    def _interactive_hold(self, user_id: str, isbn: str) -> CheckoutResult:
+        """Place a hold for a checkout that failed and print the outcome."""
+        result = self._try_place_hold(user_id, isbn)
+        if result.ok:
+            print(f"Hold placed ✅. Position in line: {self.hold_position(user_id, isbn)}")
+        else:
+            print(f"\n❌ Error: {result.error} ❌")
+        return result
+
+    def _try_checkout(self, user_id: str, isbn: str) -> CheckoutResult:
+        """
+        Record one checkout, reporting failures in the result instead of raising.
+
+        Args:
+            user_id (str): The ID of the user checking out the book.
+            isbn (str): The ISBN of the book being checked out.
+
+        Returns:
+            CheckoutResult: The outcome.
+        """
+        return self._attempt("checkout", self._checkout, user_id, isbn)
+
+    def _try_return(self, user_id: str, isbn: str) -> CheckoutResult:
+        """Record one return, reporting failures in the result instead of raising."""
+        return self._attempt("return", self._return, user_id, isbn)
+
+    def _try_renew(self, user_id: str, isbn: str) -> CheckoutResult:
+        """Renew one loan, reporting failures in the result instead of raising."""
+        return self._attempt("renew", self._renew, user_id, isbn)
+
+    def _try_place_hold(self, user_id: str, isbn: str) -> CheckoutResult:
+        """Place one hold, reporting failures in the result instead of raising."""
+        return self._attempt("place_hold", self._place_hold, user_id, isbn)
+
+    def _attempt(self, name: str, operation: Callable[[str, str], str], user_id: str, isbn: str) -> CheckoutResult:
+        """
+        Run an operation on a user and a book, timed as the named operation.
+
+        Args:
+            name (str): Name of the operation in the metrics.
+            operation (Callable[[str, str], str]): Takes the user ID and the normalized ISBN
+                and returns the stored UserID.
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book, with or without hyphens.
+
+        Returns:
+            CheckoutResult: The outcome.
+        """
+        with metrics.span(name) as span:
             try:
-                if not user_id.strip():
-                    raise ValueError("User ID cannot be empty")
-                if not isbn.strip():
-                    raise ValueError("ISBN cannot be empty")
+                self._validate_input(user_id, isbn)
+                isbn = self._canonical_isbn(isbn)
+                stored_id = operation(user_id, isbn)
             except ValueError as e:
-                print(f"\n❌ Error: {e} ❌")
-            else:
-                checkout = Checkout(user_id, isbn)
-                self._checkouts.append(checkout)
-            existing_books = self._storage.load_data(self.books_path)
-            existing_isbns = [book["isbn"] for book in existing_books]
-            
-            existing_users = self._storage.load_data(self.users_path)
-            existing_ids = [user["UserID"] for user in existing_users]
-            existing_userIDs = [user["UserID"] for user in existing_users]
+                span.add(failed=1)
+                return CheckoutResult(user_id, isbn, False, str(e))
+            return CheckoutResult(stored_id, isbn, True)
+
+    def _checkout(self, user_id: str, isbn: str) -> str:
+        """
+        Validate and record one checkout.
+
+        The ISBN's lock is held from validation until the loan is recorded, so desks in
+        other threads or processes cannot issue the same book at the same time, while
+        checkouts of different books proceed in parallel.
+
+        Args:
+            user_id (str): The ID of the user checking out the book.
+            isbn (str): The ISBN of the book being checked out.
+
+        Returns:
+            str: The UserID of the user who checked out the book, as stored in users.csv.
+
+        Raises:
+            ValueError: If the book or user is unknown, the book is not available, or
+                the user holds max_loans books.
+        """
+        timestamp = format_time(datetime.now())
+        due = due_after(timestamp, self.loan_days)
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            user = self._find_user(user_id)
+            self._validate(isbn, user)
+            copy = self._inventory.take(isbn)
             try:
-                book_index = existing_isbns.index(isbn)
-                if existing_books[book_index]['AvailableInLibrary'] != 'No':
-                    existing_books[book_index]['AvailableInLibrary'] = 'No'
-                else:
-                    raise ValueError("This Book already checkedout.")
-                self._storage.save_data(data = existing_books, filepath = self.books_path,fieldnames=None, unique_key = None, mode = 'w')
-                
-                for id in existing_userIDs:
-                    if int(id) == int(user_id):
-                        check_id = id
-                        break
-                
-                user_index = existing_ids.index(check_id)
-                inhad_val = existing_users[user_index]['BookInHand']
-                
-        
-                if not inhad_val:
-                    existing_users[user_index]['BookInHand'] = isbn
-                elif isbn in inhad_val:
-                    raise ValueError(f"{existing_users[user_index]['Name']}'s userID: {id} , already has same book.")                    
-                else:
-                    existing_users[user_index]['BookInHand'] = f"{inhad_val}, f{isbn}"
-                
-                check_save_data = self._storage.save_data(data = existing_users, filepath = self.users_path,fieldnames=None, unique_key = None, mode = 'w')
-                if check_save_data:
-                    print("Book checked out ✅.")
-                
-            except ValueError as e:
-                if "is not in list" in str(e).strip():
-                    print(f"\n❌ Error: Enter valid userID or ISBN ❌")
-                else:
-                    print(f"\n❌ Error: {e} ❌")
-                # print(f"isbn {isbn} not found in the library database.")
-        
-        
-        
+                # One small append to the loan journal; the CSV snapshots are compacted on exit
+                self._storage.record_checkout(user[0], isbn, due, copy)
+            except BaseException:
+                self._loans = None
+                raise
+            self._loans.add(user[0], isbn, timestamp, due, copy)
+            # The journal's checkout entry ends the hold for other processes too
+            self._holds.fulfil(user[0], isbn)
+            copies, available = self._inventory.copies(isbn), self._inventory.available(isbn)
+        self._checkouts.append(Checkout(user[0], isbn, due))
+        self.books_data.update_copies(isbn, copies, available)
+        return user[0]
+
+    def _return(self, user_id: str, isbn: str) -> str:
+        """
+        Validate and record one return.
+
+        Args:
+            user_id (str): The ID of the user returning the book.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            str: The UserID of the user who returned the book, as stored in users.csv.
+
+        Raises:
+            ValueError: If the book or user is unknown, or the user does not hold the book.
+        """
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            user = self._holding_user(user_id, isbn)
+            loan = self._loans.remove(user[0], isbn)
+            self._inventory.give_back(isbn, loan.copy)
+            # The copy is set aside for the next in line in the same write as the return
+            hold = self._holds.allocate(isbn)
+            try:
+                self._storage.record_return(user[0], isbn, [("ready", hold.user_id, isbn)] if hold else [], loan.copy)
+            except BaseException:
+                self._loans = None
+                raise
+            copies, available = self._inventory.copies(isbn), self._inventory.available(isbn)
+        self.books_data.update_copies(isbn, copies, available)
+        return user[0]
+
+    def _place_hold(self, user_id: str, isbn: str) -> str:
+        """
+        Validate and record one hold.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            str: The UserID of the user, as stored in users.csv.
+
+        Raises:
+            ValueError: If the book or user is unknown, a copy is on the shelf, the user
+                holds it or already has a hold on it.
+        """
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            user = self._find_user(user_id)
+            if isbn not in self._isbns or user is None:
+                raise ValueError("Enter valid userID or ISBN")
+            if self._loans.has(user[0], isbn):
+                raise ValueError(f"{user[1]}'s userID: {user[0]} , already has same book.")
+            if self._holds.is_ready(user[0], isbn):
+                raise ValueError("This Book is set aside for you, check it out.")
+            if self._on_shelf(isbn):
+                raise ValueError("This Book is available, check it out.")
+            self._holds.place(user[0], isbn, format_time(datetime.now()))
+            try:
+                self._storage.record_hold_events([("hold", user[0], isbn)])
+            except BaseException:
+                self._loans = None
+                raise
+        return user[0]
+
+    def _cancel_hold(self, user_id: str, isbn: str) -> str:
+        """
+        Validate and record the cancellation of one hold.
+
+        Args:
+            user_id (str): The ID of the user.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            str: The UserID of the user, as stored in users.csv.
+
+        Raises:
+            ValueError: If the user is unknown or has no hold on the book.
+        """
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            user = self._find_user(user_id)
+            if user is None:
+                raise ValueError("Enter valid userID or ISBN")
+            was_ready = self._holds.is_ready(user[0], isbn)
+            hold = self._holds.cancel(user[0], isbn)
+            if hold is None:
+                raise ValueError(f"{user[1]}'s userID: {user[0]} , has no hold on this book.")
+            events = [("cancel_hold", user[0], isbn)]
+            if was_ready:
+                # A copy set aside for the user goes to the next in line
+                following = self._holds.allocate(isbn)
+                if following is not None:
+                    events.append(("ready", following.user_id, isbn))
+            try:
+                self._storage.record_hold_events(events)
+            except BaseException:
+                self._loans = None
+                raise
+        return user[0]
+
+    def _renew(self, user_id: str, isbn: str) -> str:
+        """
+        Validate and record one renewal.
+
+        Args:
+            user_id (str): The ID of the user holding the book.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            str: The UserID of the user, as stored in users.csv.
+
+        Raises:
+            ValueError: If the book or user is unknown, or the user does not hold the book.
+        """
+        due = due_after(format_time(datetime.now()), self.loan_days)
+        with self._storage.lock_key(isbn), self._state_lock:
+            self._sync()
+            isbn = self._stored_isbn(isbn)
+            user = self._holding_user(user_id, isbn)
+            self._storage.record_renewal(user[0], isbn, due)
+            self._loans.renew(user[0], isbn, due)
+        return user[0]
+
+    def _holding_user(self, user_id: str, isbn: str) -> Tuple[str, str]:
+        """
+        Look up a user and check that they hold a book.
+
+        Returns:
+            Tuple[str, str]: The user's UserID and Name.
+
+        Raises:
+            ValueError: If the book or user is unknown, or the user does not hold the book.
+        """
+        user = self._find_user(user_id)
+        if isbn not in self._isbns or user is None:
+            raise ValueError("Enter valid userID or ISBN")
+        if not self._loans.has(user[0], isbn):
+            raise ValueError(f"{user[1]}'s userID: {user[0]} , does not have this book.")
+        return user
+
+    def _sync(self) -> None:
+        """
+        Bring the loans up to date with storage.
+
+        Books and users appended since the last call are added, and the journal
+        entries appended since are applied. The index is only rebuilt if books or
+        users were rewritten, for example by compact_journal.
+        """
+        version = self._storage.version()
+        if self._loans is None or (version != self._version and not self._apply_appended()):
+            self._rebuild()
+        self._version = version
+        entries, self._journal_cursor = self._storage.read_journal(self._journal_cursor)
+        for entry in entries:
+            op, user_id, isbn = entry["op"], entry["UserID"], entry["isbn"]
+            self._holds.apply(entry)
+            # Journals written before copies were counted lent the only copy
+            copy = int(entry.get("copy") or 1)
+            if op == "checkout":
+                # Journals written before due dates were kept have none
+                self._lend(user_id, isbn, entry["timestamp"], entry["due"] or due_after(entry["timestamp"], self.loan_days), copy)
+            elif op == "return" and self._loans.has(user_id, isbn):
+                self._inventory.give_back(isbn, self._loans.remove(user_id, isbn).copy)
+            elif op == "renew":
+                self._loans.renew(user_id, isbn, entry["due"])
+            elif op == "add_copy":
+                self._inventory.add_copy(isbn, copy)
+
+    def _apply_appended(self) -> bool:
+        """
+        Add the books and users appended to storage since they were last read.
+
+        Returns:
+            bool: False if books or users were rewritten instead, so the index must be rebuilt.
+        """
+        books, self._books_cursor = self._storage.read_appended(self.books_path, self._books_cursor)
+        users, self._users_cursor = self._storage.read_appended(self.users_path, self._users_cursor)
+        if books is None or users is None:
+            return False
+        for book in books:
+            isbn = book.get("isbn")
+            # Rows appended while the index was built are already in it
+            if not isbn or isbn in self._isbns:
+                continue
+            if not book.get("copies") or not book.get("available"):
+                count_copies(book)
+            self._isbns.add(isbn)
+            self._stored_isbns[self._canonical_isbn(isbn)] = isbn
+            self._inventory.add_copy(isbn, int(book["copies"]))
+            for copy in (book.get("lent") or "").split():
+                self._inventory.take(isbn, int(copy))
+        for user in users:
+            user_id = user.get("UserID")
+            if not user_id or self._user_key(user_id) in self._users:
+                continue
+            self._users[self._user_key(user_id)] = (user_id, user.get("Name"))
+            for isbn in (user.get("BookInHand") or "").split(","):
+                if isbn.strip():
+                    self._lend(user_id, isbn.strip())
+        return True
+
+    def _rebuild(self) -> None:
+        """Build the loans, copies, holds, ISBNs and users from storage."""
+        # Taken first, so rows appended while loading are read again rather than missed
+        self._books_cursor = self._storage.append_cursor(self.books_path)
+        self._users_cursor = self._storage.append_cursor(self.users_path)
+        books = self._storage.load_columns(self.books_path, ["isbn", "copies", "lent"])
+        users = self._storage.load_columns(self.users_path, ["UserID", "Name", "BookInHand"])
+        isbns = books.get("isbn", [])
+        self._isbns = set(isbns)
+        self._stored_isbns = {self._canonical_isbn(isbn): isbn for isbn in isbns}
+        self._inventory = Inventory()
+        # Copies books.csv marks as lent, by ISBN, not yet matched to a loan
+        unclaimed: Dict[str, List[int]] = {}
+        for isbn, copies, lent in zip(isbns, books.get("copies", []), books.get("lent", [])):
+            self._inventory.add_copy(isbn, int(copies))
+            if lent:
+                unclaimed[isbn] = [int(copy) for copy in lent.split()]
+        users = list(zip(users.get("UserID", []), users.get("Name", []), users.get("BookInHand", [])))
+        self._users = {}
+        for user_id, name, _ in users:
+            self._users.setdefault(self._user_key(user_id), (user_id, name))
+        self._loans = LoanIndex()
+        loans = [(loan["UserID"], loan["isbn"], loan["timestamp"], loan["due"], loan.get("copy"))
+                 for loan in self._storage.load_loans()]
+        for user_id, _, in_hand in users:
+            for isbn in (in_hand or "").split(","):
+                isbn = isbn.strip()
+                # Older releases wrote a stray "f" before every ISBN but the first
+                if isbn[:1] == "f" and isbn not in self._isbns and isbn[1:] in self._isbns:
+                    isbn = isbn[1:]
+                if isbn:
+                    loans.append((user_id, isbn, None, None, None))
+        # Loans with dates and copy IDs come first; BookInHand may list the same loans without them
+        for user_id, isbn, timestamp, due, copy in loans:
+            copy = int(copy) if copy else None
+            if not self._loans.has(user_id, isbn):
+                lent = unclaimed.get(isbn, [])
+                if copy in lent:
+                    lent.remove(copy)
+                elif copy is None and lent:
+                    copy = lent.pop(0)
+            self._lend(user_id, isbn, timestamp, due, copy)
+        # Copies marked lent to nobody known stay off the shelf
+        for isbn, lent in unclaimed.items():
+            for copy in lent:
+                self._inventory.take(isbn, copy)
+        # The hold events in the journal are applied by _sync
+        self._holds = HoldQueues.from_rows(self._storage.load_holds(replay_journal=False))
+        # The journal was replayed into the records above; reading it again is harmless
+        self._journal_cursor = None
+
+    def _lend(self, user_id: str, isbn: str, timestamp: Optional[str] = None, due: Optional[str] = None,
+              copy: Optional[int] = None) -> None:
+        """
+        Add a loan read from storage, taking a copy off the shelf.
+
+        The loan is left out if no copy is on the shelf, so the first holders win if
+        records disagree. It may already be known from the users' BookInHand, which
+        has no dates; those are then filled in.
+        """
+        loan = self._loans.get(user_id, isbn)
+        if loan is None:
+            copy = self._inventory.take(isbn, copy)
+            if copy is None:
+                return
+            loan = self._loans.add(user_id, isbn, timestamp, due, copy)
+        if loan.due is None and due:
+            loan.timestamp = timestamp
+            self._loans.renew(user_id, isbn, due)
+
+    @staticmethod
+    def _canonical_isbn(isbn: str) -> str:
+        """Return an ISBN in the hyphenated catalog form, or stripped if it is not a valid ISBN-13."""
+        return normalize_isbn(isbn) or isbn.strip()
+
+    def _stored_isbn(self, isbn: str) -> str:
+        """
+        Return an ISBN as books.csv stores it.
+
+        Books added before ISBNs were normalized may be stored with other hyphens.
+
+        Args:
+            isbn (str): The ISBN, with or without hyphens.
+
+        Returns:
+            str: The stored ISBN, or the normalized one if no book has it.
+        """
+        isbn = self._canonical_isbn(isbn)
+        return self._stored_isbns.get(isbn, isbn)
+
+    @staticmethod
+    def _validate_input(user_id: str, isbn: str) -> None:
+        """
+        Check that a user ID and ISBN were entered.
+
+        Raises:
+            ValueError: If either is empty.
+        """
+        if not user_id.strip():
+            raise ValueError("User ID cannot be empty")
+        if not isbn.strip():
+            raise ValueError("ISBN cannot be empty")
+
+    def _validate(self, isbn: str, user: Optional[Tuple[str, str]]) -> None:
+        """
+        Check that a book can be checked out by a user.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            user (Optional[Tuple[str, str]]): The user's UserID and Name, or None if the ID is unknown.
+
+        Raises:
+            ValueError: If the book or user is unknown, every copy is checked out or
+                set aside for other users, the user already has it, or the user holds
+                max_loans books.
+        """
+        if isbn not in self._isbns:
+            raise ValueError("Enter valid userID or ISBN")
+        if user is not None and self._loans.has(user[0], isbn):
+            raise ValueError(f"{user[1]}'s userID: {user[0]} , already has same book.")
+        if user is not None and self._holds.is_ready(user[0], isbn):
+            if not self._inventory.available(isbn):
+                raise ValueError(self.CHECKED_OUT)
+        elif not self._on_shelf(isbn):
+            raise ValueError(self.ON_HOLD if self._holds.ready(isbn) else self.CHECKED_OUT)
+        if user is None:
+            raise ValueError("Enter valid userID or ISBN")
+        stored_id, name = user
+        if self.max_loans is not None and self._loans.count_for(stored_id) >= self.max_loans:
+            raise ValueError(f"{name}'s userID: {stored_id} , already has {self.max_loans} books.")
+
+    def _on_shelf(self, isbn: str) -> int:
+        """Return the number of copies of a book on the shelf and not set aside for a hold."""
+        return self._inventory.available(isbn) - self._holds.ready(isbn)
+
+    @staticmethod
+    def _user_key(user_id: str) -> str:
+        """Return a user ID with leading zeros removed from numeric IDs."""
+        user_id = (user_id or "").strip()
+        return str(int(user_id)) if user_id.isdigit() else user_id
+
+    def _find_user(self, user_id: str) -> Optional[Tuple[str, str]]:
+        """
+        Look up a user by ID, treating IDs that differ only in leading zeros as equal.
+
+        Args:
+            user_id (str): The ID entered for the user.
+
+        Returns:
+            Optional[Tuple[str, str]]: The user's UserID and Name, or None if no user matches.
+        """
+        return self._users.get(self._user_key(user_id))
 
     def get_checkouts(self) -> list:
         """
@@ -128,5 +916,27 @@ class CheckoutDatabase:
         """
         return self._checkouts
 
-# Global instance of CheckoutDatabase
-checkout_database = CheckoutDatabase()
+# Global instance of CheckoutDatabase, created on first use so that importing the module
+# does no I/O
+_checkout_database = None
+_checkout_database_lock = threading.Lock()
+
+def get_checkout_database() -> CheckoutDatabase:
+    """
+    Return the global CheckoutDatabase, creating it on first use.
+
+    Returns:
+        CheckoutDatabase: The shared instance.
+    """
+    global _checkout_database
+    if _checkout_database is None:
+        with _checkout_database_lock:
+            if _checkout_database is None:
+                _checkout_database = CheckoutDatabase()
+    return _checkout_database
+
+def __getattr__(name: str):
+    """Keep `checkout_database` importable by name while creating it lazily."""
+    if name == "checkout_database":
+        return get_checkout_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,194 @@
+import multiprocessing
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from .check import CheckoutDatabase, CheckoutResult
+from .isbn import check_digit, format_digits
+from .storage import Storage
+
+def make_isbn(number):
+    digits = f"978{number:09d}"
+    return format_digits(f"{digits}{check_digit(digits)}")
+
+ISBNS = [make_isbn(number) for number in range(200)]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = Storage(database_folder=str(tmp_path))
+    storage.save_data([{"title": f"Title {index}", "author": "Author", "isbn": isbn} for index, isbn in enumerate(ISBNS)],
+                      storage.books_filepath, storage._get_books_fieldnames(), "isbn")
+    storage.save_data([{"Name": f"User {user_id}", "UserID": str(user_id)} for user_id in range(1, 9)],
+                      storage.users_filepath, storage._get_users_fieldnames(), "UserID")
+    return storage
+
+def checkout_all(args):
+    database_folder, user_id = args
+    checkout_database = CheckoutDatabase(Storage(database_folder=database_folder))
+    isbns = list(ISBNS)
+    random.shuffle(isbns)
+    issued = 0
+    for isbn in isbns:
+        issued += checkout_database.checkout_book(str(user_id), isbn).ok
+    return issued
+
+def test_checkout_book(storage):
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.checkout_book("01", ISBNS[0]) == CheckoutResult("1", ISBNS[0], True)
+    assert checkout_database.checkout_book("2", ISBNS[0]).error == "This Book already checkedout."
+    assert checkout_database.checkout_book("99", ISBNS[1]).error == "Enter valid userID or ISBN"
+    assert checkout_database.checkout_book("", ISBNS[1]).error == "User ID cannot be empty"
+
+def test_isbn_without_hyphens(storage):
+    checkout_database = CheckoutDatabase(storage)
+    bare = ISBNS[0].replace("-", "")
+    assert checkout_database.checkout_book("1", bare) == CheckoutResult("1", ISBNS[0], True)
+    assert checkout_database.holder_of(f" {bare} ") == "1"
+    assert checkout_database.copies_of(bare) == (0, 1)
+    results = checkout_database.checkout_many([("2", ISBNS[1].replace("-", "")), ("2", "9780000000000")])
+    assert [(result.isbn, result.ok) for result in results] == [(ISBNS[1], True), ("9780000000000", False)]
+    assert checkout_database.return_book("1", bare).ok
+
+def test_checkout_many(storage):
+    checkout_database = CheckoutDatabase(storage)
+    results = checkout_database.checkout_many([("1", ISBNS[0]), ("2", ISBNS[0]), ("2", ISBNS[1]), ("99", ISBNS[2])])
+    assert [result.ok for result in results] == [True, False, True, False]
+    assert results[1].error == "This Book already checkedout."
+    journal = storage.load_data(storage.journal_filepath)
+    assert [(entry["UserID"], entry["isbn"]) for entry in journal] == [("1", ISBNS[0]), ("2", ISBNS[1])]
+
+def test_loans_and_holders(storage):
+    checkout_database = CheckoutDatabase(storage)
+    checkout_database.checkout_many([("1", ISBNS[0]), ("1", ISBNS[1])])
+    assert checkout_database.checkout_book("1", ISBNS[0]).error == "User 1's userID: 1 , already has same book."
+    # Checkouts by another process are picked up from the journal
+    CheckoutDatabase(Storage(database_folder=storage.database_folder)).checkout_book("2", ISBNS[2])
+    assert checkout_database.holder_of(ISBNS[2]) == "2"
+    assert [loan.isbn for loan in checkout_database.loans_for("01")] == [ISBNS[0], ISBNS[1]]
+    assert checkout_database.holder_of(ISBNS[3]) is None
+    assert storage.compact_journal()
+    assert [loan.isbn for loan in CheckoutDatabase(storage).loans_for("1")] == [ISBNS[0], ISBNS[1]]
+
+def test_loan_limit(storage):
+    checkout_database = CheckoutDatabase(storage, max_loans=2)
+    results = checkout_database.checkout_many([("1", ISBNS[0]), ("1", ISBNS[1]), ("1", ISBNS[2]), ("2", ISBNS[2])])
+    assert [result.ok for result in results] == [True, True, False, True]
+    assert results[2].error == "User 1's userID: 1 , already has 2 books."
+    assert not checkout_database.checkout_book("1", ISBNS[3]).ok
+
+def test_return_and_renew(storage):
+    checkout_database = CheckoutDatabase(storage, loan_days=14)
+    checkout_database.checkout_many([("1", ISBNS[0]), ("1", ISBNS[1])])
+    assert checkout_database.return_book("2", ISBNS[0]).error == "User 2's userID: 2 , does not have this book."
+    assert checkout_database.return_book("1", ISBNS[0]).ok
+    assert checkout_database.checkout_book("2", ISBNS[0]).ok
+    assert checkout_database.renew_book("1", ISBNS[1]).ok
+    later = datetime.now() + timedelta(days=15)
+    assert sorted((loan.user_id, loan.isbn) for loan in checkout_database.overdue_loans(later)) == [("1", ISBNS[1]), ("2", ISBNS[0])]
+    # Another process sees the same loans, and so does the next start after compaction
+    for _ in range(2):
+        other = CheckoutDatabase(Storage(database_folder=storage.database_folder))
+        assert other.holder_of(ISBNS[0]) == "2"
+        assert sorted(loan.isbn for loan in other.overdue_loans(later)) == [ISBNS[0], ISBNS[1]]
+        assert other.overdue_loans() == []
+        storage.compact_journal()
+    books = {book["isbn"]: book for book in storage.load_data(storage.books_filepath)}
+    assert books[ISBNS[0]]["AvailableInLibrary"] == "No"
+    assert other.return_book("2", ISBNS[0]).ok
+    assert CheckoutDatabase(storage).holder_of(ISBNS[0]) is None
+    assert storage.find_record(storage.books_filepath, "isbn", ISBNS[0])["AvailableInLibrary"] == "Yes"
+
+def test_holds(storage):
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.place_hold("2", ISBNS[0]).error == "This Book is available, check it out."
+    assert checkout_database.checkout_book("1", ISBNS[0]).ok
+    assert checkout_database.place_hold("2", ISBNS[0]).ok
+    assert checkout_database.place_hold("3", ISBNS[0]).ok
+    assert checkout_database.place_hold("4", ISBNS[0]).ok
+    assert not checkout_database.place_hold("3", ISBNS[0]).ok
+    assert checkout_database.cancel_hold("3", ISBNS[0]).ok
+    assert checkout_database.hold_position("4", ISBNS[0]) == 2
+    assert checkout_database.return_book("1", ISBNS[0]).ok
+    # The returned book is set aside for the first user in line, in every process
+    for database in (checkout_database, CheckoutDatabase(Storage(database_folder=storage.database_folder))):
+        assert database.hold_position("2", ISBNS[0]) == 0
+        assert database.hold_position("4", ISBNS[0]) == 1
+        assert database.checkout_book("4", ISBNS[0]).error == "This Book is on hold for another user."
+    storage.compact_journal()
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.cancel_hold("2", ISBNS[0]).ok
+    assert checkout_database.hold_position("4", ISBNS[0]) == 0
+    assert checkout_database.checkout_book("4", ISBNS[0]).ok
+    assert checkout_database.holds_for("4") == []
+    storage.compact_journal()
+    assert storage.load_holds() == []
+
+def test_copies(storage):
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.add_copies(ISBNS[0], 2) == 3
+    assert checkout_database.checkout_book("1", ISBNS[0]).ok
+    assert checkout_database.checkout_book("2", ISBNS[0]).ok
+    assert checkout_database.copies_of(ISBNS[0]) == (1, 3)
+    assert checkout_database.place_hold("4", ISBNS[0]).error == "This Book is available, check it out."
+    assert checkout_database.checkout_book("3", ISBNS[0]).ok
+    assert checkout_database.checkout_book("4", ISBNS[0]).error == "This Book already checkedout."
+    assert checkout_database.place_hold("4", ISBNS[0]).ok
+    assert checkout_database.place_hold("5", ISBNS[0]).ok
+    # Each copy returned or added is set aside for the next user in line
+    assert checkout_database.return_book("2", ISBNS[0]).ok
+    assert checkout_database.add_copies(ISBNS[0]) == 4
+    for database in (checkout_database, CheckoutDatabase(Storage(database_folder=storage.database_folder))):
+        assert database.copies_of(ISBNS[0]) == (2, 4)
+        assert database.hold_position("4", ISBNS[0]) == database.hold_position("5", ISBNS[0]) == 0
+        assert database.checkout_book("6", ISBNS[0]).error == "This Book is on hold for another user."
+    storage.compact_journal()
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.checkout_book("5", ISBNS[0]).ok
+    assert sorted(checkout_database.holders_of(ISBNS[0])) == ["1", "3", "5"]
+    storage.compact_journal()
+    book = next(book for book in storage.load_data(storage.books_filepath) if book["isbn"] == ISBNS[0])
+    assert (book["copies"], book["available"], book["AvailableInLibrary"]) == ("4", "1", "Yes")
+
+def test_books_and_users_added_without_rebuild(storage, monkeypatch):
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.checkout_book("1", ISBNS[0]).ok
+    rebuilds = []
+    rebuild = checkout_database._rebuild
+    monkeypatch.setattr(checkout_database, "_rebuild", lambda: rebuilds.append(1) or rebuild())
+    # Added through another Storage, as BookDatabase and UserDatabase do
+    other = Storage(database_folder=storage.database_folder)
+    other.save_data([{"title": "New", "author": "Author", "isbn": make_isbn(500)}],
+                    other.books_filepath, other._get_books_fieldnames(), "isbn")
+    other.save_data([{"Name": "New", "UserID": "9"}], other.users_filepath, other._get_users_fieldnames(), "UserID")
+    assert checkout_database.checkout_book("09", make_isbn(500)).ok
+    assert checkout_database.copies_of(make_isbn(500)) == (0, 1)
+    assert checkout_database.holder_of(ISBNS[0]) == "1"
+    assert rebuilds == []
+    # Rewritten books and users are loaded again
+    assert storage.compact_journal()
+    assert checkout_database.holder_of(make_isbn(500)) == "9"
+    assert rebuilds == [1]
+
+def test_books_stored_without_copies(storage):
+    with open(storage.books_filepath, "w") as file:
+        file.write(f"title,author,isbn,AvailableInLibrary\nTitle,Author,{ISBNS[0]},No\nTitle,Author,{ISBNS[1]},Yes\n")
+    checkout_database = CheckoutDatabase(storage)
+    assert checkout_database.copies_of(ISBNS[0]) == (0, 1)
+    assert checkout_database.checkout_book("1", ISBNS[1]).ok
+    assert checkout_database.add_copies(ISBNS[1]) == 2
+    assert CheckoutDatabase(storage).copies_of(ISBNS[1]) == (1, 2)
+    assert storage.compact_journal()
+    assert "copies" in open(storage.books_filepath).readline()
+    assert CheckoutDatabase(storage).copies_of(ISBNS[1]) == (1, 2)
+
+def test_concurrent_processes_never_issue_a_book_twice(storage):
+    with multiprocessing.Pool(processes=8) as pool:
+        issued = pool.map(checkout_all, [(storage.database_folder, user_id) for user_id in range(1, 9)])
+    journal = storage.load_data(storage.journal_filepath)
+    checked_out = [entry["isbn"] for entry in journal if entry["op"] == "checkout"]
+    assert sum(issued) == len(ISBNS)
+    assert sorted(checked_out) == sorted(ISBNS)
+    assert storage.compact_journal()
+    assert all(book["AvailableInLibrary"] == "No" for book in storage.load_data(storage.books_filepath))
@@ -0,0 +1,266 @@
+"""Module for coalescing storage writes into batches."""
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .metrics import metrics
+
+# Appends records to a file and returns the bytes written to each file it touched
+Writer = Callable[[List[Dict[str, str]]], Dict[str, int]]
+
+class _Batch:
+    """The records buffered for one file."""
+
+    __slots__ = ("writer", "records", "adds")
+
+    def __init__(self, writer: Writer) -> None:
+        self.writer = writer
+        self.records: List[Dict[str, str]] = []
+        # Number of add calls the records came from
+        self.adds = 0
+
+class GroupCommit:
+    """
+    Buffer the appends to the files of a database folder and write them in batches.
+
+    Records added for the same file are written together, with one write per file,
+    however many calls added them. With fsync=True each batch is also made durable
+    with one fsync per file. A batch is written once it holds max_records records,
+    max_delay seconds after its first record was added, or on flush.
+
+    The defaults write every add at once, as before batching. Even then, threads that
+    add while another thread is writing share its next batch, and so its fsync.
+    Larger batches are only visible to other processes once written, so they suit a
+    database folder served by one process, such as the service. Records that must be
+    visible before a lock is released, such as loan journal entries, are added and
+    then flushed by the caller.
+    """
+
+    def __init__(self, max_records: int = 1, max_delay: float = 0.0, fsync: bool = False) -> None:
+        """
+        Initialize the GroupCommit.
+
+        Args:
+            max_records (int, optional): Write once this many records are buffered. Defaults to 1.
+            max_delay (float, optional): Most seconds a record waits to be written; 0
+                waits for max_records or flush only. Defaults to 0.0.
+            fsync (bool, optional): fsync the files of each batch. Defaults to False.
+        """
+        self.max_records = max_records
+        self.max_delay = max_delay
+        self.fsync = fsync
+        # Records to write, the writer for them and the number of adds, by (file, field names)
+        self._pending: Dict[Tuple[str, Tuple[str, ...]], _Batch] = {}
+        self._count = 0
+        self._lock = threading.Lock()
+        # Held while a batch is written; reentrant, since writers may read and so flush
+        self._flush_lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+        self._stats = {"batches": 0, "records": 0, "writes": 0, "seconds": 0.0, "max_seconds": 0.0}
+
+    def configure(self, max_records: Optional[int] = None, max_delay: Optional[float] = None,
+                  fsync: Optional[bool] = None) -> None:
+        """
+        Change the thresholds or the durability, writing what is buffered first.
+
+        Args:
+            max_records (Optional[int], optional): See __init__. Defaults to unchanged.
+            max_delay (Optional[float], optional): See __init__. Defaults to unchanged.
+            fsync (Optional[bool], optional): See __init__. Defaults to unchanged.
+        """
+        if max_records is not None and max_records < 1:
+            raise ValueError("A batch holds at least 1 record")
+        if max_delay is not None and max_delay < 0:
+            raise ValueError("The delay of a batch cannot be negative")
+        self.flush()
+        if max_records is not None:
+            self.max_records = max_records
+        if max_delay is not None:
+            self.max_delay = max_delay
+        if fsync is not None:
+            self.fsync = fsync
+
+    def add(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str], writer: Writer) -> None:
+        """
+        Buffer records to append to a file, writing the batch if it is full.
+
+        Args:
+            filepath (str): Path of the file, or of the dataset for sharded ones.
+            records (List[Dict[str, str]]): Records to append.
+            fieldnames (List[str]): Field names of the file.
+            writer (Writer): Appends a list of records to the file; called with every
+                record buffered for the file and field names at once.
+        """
+        if not records:
+            return
+        with self._lock:
+            key = (os.path.abspath(filepath), tuple(fieldnames))
+            batch = self._pending.get(key)
+            if batch is None:
+                batch = self._pending[key] = _Batch(writer)
+            batch.records.extend(records)
+            batch.adds += 1
+            self._count += len(records)
+            full = self._count >= self.max_records
+            if not full and self.max_delay > 0 and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, self._flush_later)
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self, filepaths: Optional[Iterable[str]] = None) -> int:
+        """
+        Write the buffered records now, as one batch.
+
+        If writing fails, the records not yet written stay buffered for the next
+        flush and the error is raised.
+
+        Args:
+            filepaths (Optional[Iterable[str]], optional): Only write the records of
+                these files. Defaults to every file.
+
+        Returns:
+            int: Number of records written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                if filepaths is None:
+                    keys = list(self._pending)
+                else:
+                    wanted = {os.path.abspath(filepath) for filepath in filepaths}
+                    keys = [key for key in self._pending if key[0] in wanted]
+                batches = [(key, self._pending.pop(key)) for key in keys]
+                count = sum(len(batch.records) for _, batch in batches)
+                adds = sum(batch.adds for _, batch in batches)
+                self._count -= count
+                if not self._pending and self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if not batches:
+                return 0
+            started = time.perf_counter()
+            with metrics.span("storage.group_commit") as span:
+                written: Dict[str, int] = {}
+                try:
+                    while batches:
+                        for path, size in batches[0][1].writer(batches[0][1].records).items():
+                            written[path] = written.get(path, 0) + size
+                        batches.pop(0)
+                    if self.fsync:
+                        # A new file is only durable once its folder is
+                        fsync_paths([*written, *{os.path.dirname(os.path.abspath(path)) for path in written}])
+                except BaseException:
+                    self._put_back(batches)
+                    raise
+                span.add(rows=count, bytes_written=sum(written.values()))
+            seconds = time.perf_counter() - started
+            with self._lock:
+                self._stats["batches"] += 1
+                self._stats["records"] += count
+                self._stats["writes"] += adds
+                self._stats["seconds"] += seconds
+                self._stats["max_seconds"] = max(self._stats["max_seconds"], seconds)
+            return count
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """Write the buffered records, then keep batches from being written, while files are rewritten."""
+        with self._flush_lock:
+            self.flush()
+            yield
+
+    def pending(self) -> int:
+        """Return the number of records buffered."""
+        with self._lock:
+            return self._count
+
+    def stats(self) -> Dict[str, float]:
+        """
+        Return the counters of the batches written.
+
+        Returns:
+            Dict[str, float]: Batches written, records in them, add calls they
+            coalesced, total and longest seconds spent writing a batch, and records
+            still buffered.
+        """
+        with self._lock:
+            return dict(self._stats, pending=self._count)
+
+    def _put_back(self, batches: List[Tuple[Tuple[str, Tuple[str, ...]], "_Batch"]]) -> None:
+        """Buffer batches that failed to be written again, ahead of the records added meanwhile."""
+        with self._lock:
+            pending = dict(batches)
+            for key, batch in self._pending.items():
+                if key in pending:
+                    pending[key].records.extend(batch.records)
+                    pending[key].adds += batch.adds
+                else:
+                    pending[key] = batch
+            self._pending = pending
+            self._count = sum(len(batch.records) for batch in pending.values())
+
+    def _flush_later(self) -> None:
+        """Write the buffered records once max_delay has passed, see add."""
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        except OSError:
+            # The records stay buffered and the next flush raises the error
+            pass
+
+def fsync_paths(paths: Iterable[str]) -> None:
+    """
+    Flush files, or folders' entries, to disk.
+
+    Args:
+        paths (Iterable[str]): Paths of files and folders. Folders are skipped on
+            Windows, which cannot open them.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            if not hasattr(os, "O_DIRECTORY"):
+                continue
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        else:
+            fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+# One GroupCommit per database folder, so every Storage in this process shares it
+_commits: Dict[str, GroupCommit] = {}
+_commits_lock = threading.Lock()
+
+def group_commit_for(database_folder: str) -> GroupCommit:
+    """
+    Return the GroupCommit for a database folder, creating it on first use.
+
+    Args:
+        database_folder (str): The database folder.
+
+    Returns:
+        GroupCommit: The shared GroupCommit.
+    """
+    key = os.path.abspath(database_folder)
+    with _commits_lock:
+        commit = _commits.get(key)
+        if commit is None:
+            commit = _commits[key] = GroupCommit()
+        return commit
+
+@atexit.register
+def _flush_all() -> None:
+    """Write what is still buffered when the process exits."""
+    with _commits_lock:
+        commits = list(_commits.values())
+    for commit in commits:
+        try:
+            commit.flush()
+        except OSError:
+            pass
@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from .commit import GroupCommit
+
+
+class FileWriter:
+    """Writer that records each batch it is given."""
+
+    def __init__(self, fail=0):
+        self.batches = []
+        self.fail = fail
+
+    def __call__(self, records):
+        if self.fail:
+            self.fail -= 1
+            raise OSError("disk full")
+        self.batches.append(list(records))
+        return {"file.csv": len(records)}
+
+def test_writes_at_once_by_default():
+    writer = FileWriter()
+    commit = GroupCommit()
+    commit.add("file.csv", [{"k": "1"}], ["k"], writer)
+    commit.add("file.csv", [{"k": "2"}], ["k"], writer)
+    assert writer.batches == [[{"k": "1"}], [{"k": "2"}]]
+    assert commit.stats()["batches"] == 2
+
+def test_batch_is_written_when_full():
+    writer = FileWriter()
+    commit = GroupCommit(max_records=3)
+    commit.add("file.csv", [{"k": "1"}], ["k"], writer)
+    commit.add("file.csv", [{"k": "2"}], ["k"], writer)
+    assert writer.batches == []
+    assert commit.pending() == 2
+    commit.add("file.csv", [{"k": "3"}], ["k"], writer)
+    assert writer.batches == [[{"k": "1"}, {"k": "2"}, {"k": "3"}]]
+    stats = commit.stats()
+    assert (stats["batches"], stats["records"], stats["writes"], stats["pending"]) == (1, 3, 3, 0)
+
+def test_batch_is_written_after_max_delay():
+    writer = FileWriter()
+    commit = GroupCommit(max_records=100, max_delay=0.01)
+    commit.add("file.csv", [{"k": "1"}], ["k"], writer)
+    deadline = time.monotonic() + 5
+    while not writer.batches and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert writer.batches == [[{"k": "1"}]]
+
+def test_flush_only_some_files():
+    books, journal = FileWriter(), FileWriter()
+    commit = GroupCommit(max_records=100)
+    commit.add("books.csv", [{"k": "1"}], ["k"], books)
+    commit.add("journal.csv", [{"k": "2"}], ["k"], journal)
+    assert commit.flush(["books.csv"]) == 1
+    assert (books.batches, journal.batches) == ([[{"k": "1"}]], [])
+    assert commit.flush() == 1
+    assert journal.batches == [[{"k": "2"}]]
+
+def test_failed_batch_stays_buffered():
+    writer = FileWriter(fail=1)
+    commit = GroupCommit(max_records=100)
+    commit.add("file.csv", [{"k": "1"}], ["k"], writer)
+    with pytest.raises(OSError):
+        commit.flush()
+    commit.add("file.csv", [{"k": "2"}], ["k"], writer)
+    assert commit.flush() == 2
+    assert writer.batches == [[{"k": "1"}, {"k": "2"}]]
+
+def test_concurrent_adds_share_a_batch():
+    release = threading.Event()
+    batches = []
+
+    def slow_writer(records):
+        batches.append(len(records))
+        release.wait(5)
+        return {"file.csv": len(records)}
+
+    commit = GroupCommit()
+    first = threading.Thread(target=commit.add, args=("file.csv", [{"k": "0"}], ["k"], slow_writer))
+    first.start()
+    while not batches:
+        time.sleep(0.001)
+    # These wait for the first batch, then go out together
+    others = [threading.Thread(target=commit.add, args=("file.csv", [{"k": str(i)}], ["k"], slow_writer))
+              for i in range(1, 5)]
+    for thread in others:
+        thread.start()
+    while commit.pending() < 4:
+        time.sleep(0.001)
+    release.set()
+    for thread in [first, *others]:
+        thread.join()
+    assert batches == [1, 4]
+
+def test_configure_rejects_empty_batches():
+    with pytest.raises(ValueError):
+        GroupCommit().configure(max_records=0)
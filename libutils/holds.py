@@ -0,0 +1,273 @@
+"""Module for the queues of patrons waiting for a book."""
+
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+class Hold:
+    """A patron waiting for a book, or a book set aside for a patron."""
+
+    __slots__ = ("user_id", "isbn", "ticket", "timestamp")
+
+    def __init__(self, user_id: str, isbn: str, ticket: int, timestamp: Optional[str] = None):
+        """
+        Initialize a Hold object.
+
+        Args:
+            user_id (str): The UserID of the patron, as stored in users.csv.
+            isbn (str): The ISBN of the book.
+            ticket (int): Place of the hold in the order holds on the book were placed.
+            timestamp (Optional[str], optional): When the hold was placed, if known.
+        """
+        self.user_id = user_id
+        self.isbn = isbn
+        self.ticket = ticket
+        self.timestamp = timestamp
+
+    def __repr__(self) -> str:
+        return f"Hold({self.user_id!r}, {self.isbn!r}, {self.ticket!r}, {self.timestamp!r})"
+
+class _Queue:
+    """The holds on one book: patrons waiting in order, and the patrons copies are set aside for."""
+
+    __slots__ = ("waiting", "ready", "cancelled", "next_ticket")
+
+    def __init__(self) -> None:
+        self.waiting: "OrderedDict[str, Hold]" = OrderedDict()
+        self.ready: Dict[str, Hold] = {}
+        # Tickets cancelled behind the head of the queue, sorted, for position lookups
+        self.cancelled: List[int] = []
+        self.next_ticket = 0
+
+class HoldQueues:
+    """
+    A FIFO queue of holds per ISBN.
+
+    Placing a hold, cancelling one and setting a returned copy aside for the next
+    patron in line are O(1). A patron's place in a queue is found in O(log n) from the tickets
+    handed out in order and the tickets cancelled since.
+    """
+
+    # Journal operations, see apply
+    OPERATIONS = ("hold", "cancel_hold", "ready", "checkout")
+
+    def __init__(self) -> None:
+        """Initialize empty HoldQueues."""
+        self._queues: Dict[str, _Queue] = {}
+        # Holds per patron keyed by ISBN
+        self._by_user: Dict[str, Dict[str, Hold]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of holds, waiting or set aside."""
+        return sum(len(holds) for holds in self._by_user.values())
+
+    def place(self, user_id: str, isbn: str, timestamp: Optional[str] = None) -> Hold:
+        """
+        Put a patron at the end of the queue for a book.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+            timestamp (Optional[str], optional): When the hold was placed.
+
+        Returns:
+            Hold: The new hold.
+
+        Raises:
+            ValueError: If the patron already has a hold on the book.
+        """
+        if isbn in self._by_user.get(user_id, ()):
+            raise ValueError("You already have a hold on this book.")
+        queue = self._queues.setdefault(isbn, _Queue())
+        hold = Hold(user_id, isbn, queue.next_ticket, timestamp)
+        queue.next_ticket += 1
+        queue.waiting[user_id] = hold
+        self._by_user.setdefault(user_id, {})[isbn] = hold
+        return hold
+
+    def cancel(self, user_id: str, isbn: str) -> Optional[Hold]:
+        """
+        Remove a patron's hold on a book, whether waiting or set aside.
+
+        A copy set aside for the patron is not passed on; call allocate for that.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[Hold]: The cancelled hold, or None if the patron had none.
+        """
+        hold = self._by_user.get(user_id, {}).get(isbn)
+        if hold is None:
+            return None
+        queue = self._queues[isbn]
+        if queue.ready.get(user_id) is hold:
+            del queue.ready[user_id]
+        else:
+            head = next(iter(queue.waiting.values()))
+            del queue.waiting[user_id]
+            if hold is not head:
+                insort(queue.cancelled, hold.ticket)
+            self._prune(queue)
+        self._forget(hold)
+        return hold
+
+    def allocate(self, isbn: str) -> Optional[Hold]:
+        """
+        Set a copy of a book aside for the next patron in line.
+
+        Args:
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[Hold]: The hold now ready for pickup, or None if nobody is waiting.
+        """
+        queue = self._queues.get(isbn)
+        if queue is None or not queue.waiting:
+            return None
+        user_id, hold = queue.waiting.popitem(last=False)
+        queue.ready[user_id] = hold
+        self._prune(queue)
+        return hold
+
+    def fulfil(self, user_id: str, isbn: str) -> Optional[Hold]:
+        """
+        End the hold of a patron who checked out the copy set aside for them.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[Hold]: The fulfilled hold, or None if no copy was set aside for the patron.
+        """
+        queue = self._queues.get(isbn)
+        hold = queue.ready.pop(user_id, None) if queue is not None else None
+        if hold is not None:
+            self._forget(hold)
+        return hold
+
+    def is_ready(self, user_id: str, isbn: str) -> bool:
+        """Return whether a copy of a book is set aside for a patron."""
+        queue = self._queues.get(isbn)
+        return queue is not None and user_id in queue.ready
+
+    def ready(self, isbn: str) -> int:
+        """Return the number of copies of a book set aside."""
+        queue = self._queues.get(isbn)
+        return len(queue.ready) if queue is not None else 0
+
+    def waiting(self, isbn: str) -> int:
+        """Return the number of patrons waiting for a book, not counting those a copy is set aside for."""
+        queue = self._queues.get(isbn)
+        return len(queue.waiting) if queue is not None else 0
+
+    def position(self, user_id: str, isbn: str) -> Optional[int]:
+        """
+        Return a patron's place in the queue for a book.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[int]: 0 if a copy is set aside for the patron, 1 for the head of
+            the queue and so on, or None if the patron has no hold on it.
+        """
+        hold = self._by_user.get(user_id, {}).get(isbn)
+        if hold is None:
+            return None
+        queue = self._queues[isbn]
+        if queue.ready.get(user_id) is hold:
+            return 0
+        first = next(iter(queue.waiting.values())).ticket
+        # Every ticket between the head and this hold is waiting unless it was cancelled
+        return hold.ticket - first - bisect_left(queue.cancelled, hold.ticket) + 1
+
+    def holds_for(self, user_id: str) -> List[Hold]:
+        """Return a patron's holds, in the order they were placed."""
+        return list(self._by_user.get(user_id, {}).values())
+
+    def apply(self, entry: Dict[str, str]) -> None:
+        """
+        Apply a loan journal entry.
+
+        Entries that do not fit the current state, such as a second hold by the same
+        patron, are ignored.
+
+        Args:
+            entry (Dict[str, str]): The entry, with op, UserID, isbn and timestamp.
+        """
+        op, user_id, isbn = entry.get("op"), entry.get("UserID"), entry.get("isbn")
+        if op == "hold":
+            if isbn not in self._by_user.get(user_id, ()):
+                self.place(user_id, isbn, entry.get("timestamp"))
+        elif op == "cancel_hold":
+            self.cancel(user_id, isbn)
+        elif op == "ready":
+            queue = self._queues.get(isbn)
+            if queue is not None and queue.waiting and next(iter(queue.waiting)) == user_id:
+                self.allocate(isbn)
+        elif op == "checkout":
+            self.fulfil(user_id, isbn)
+
+    def rows(self, isbns: Optional[Iterable[str]] = None) -> List[Dict[str, str]]:
+        """
+        Return the holds as records, each queue's ready holds first and then those in line.
+
+        Args:
+            isbns (Optional[Iterable[str]], optional): Only the holds on these books. Defaults to all.
+
+        Returns:
+            List[Dict[str, str]]: One record (UserID, isbn, timestamp, status) per hold.
+        """
+        records = []
+        for isbn in (self._queues if isbns is None else isbns):
+            queue = self._queues.get(isbn)
+            if queue is None:
+                continue
+            records.extend(self._record(hold, "ready") for hold in queue.ready.values())
+            records.extend(self._record(hold, "waiting") for hold in queue.waiting.values())
+        return records
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]]) -> "HoldQueues":
+        """
+        Build HoldQueues from records returned by rows.
+
+        Args:
+            rows (Iterable[Dict[str, str]]): The records, in queue order.
+
+        Returns:
+            HoldQueues: The queues.
+        """
+        queues = cls()
+        for row in rows:
+            hold = queues.place(row["UserID"], row["isbn"], row.get("timestamp"))
+            if row.get("status") == "ready":
+                queue = queues._queues[row["isbn"]]
+                del queue.waiting[row["UserID"]]
+                queue.ready[row["UserID"]] = hold
+        return queues
+
+    @staticmethod
+    def _record(hold: Hold, status: str) -> Dict[str, str]:
+        return {"UserID": hold.user_id, "isbn": hold.isbn, "timestamp": hold.timestamp, "status": status}
+
+    def _prune(self, queue: _Queue) -> None:
+        """Forget cancelled tickets that are no longer behind the head of the queue."""
+        if not queue.waiting:
+            queue.cancelled.clear()
+        elif queue.cancelled:
+            del queue.cancelled[:bisect_left(queue.cancelled, next(iter(queue.waiting.values())).ticket)]
+
+    def _forget(self, hold: Hold) -> None:
+        """Remove a hold from its patron's holds."""
+        holds = self._by_user[hold.user_id]
+        del holds[hold.isbn]
+        if not holds:
+            del self._by_user[hold.user_id]
+        queue = self._queues[hold.isbn]
+        if not queue.ready and not queue.waiting:
+            del self._queues[hold.isbn]
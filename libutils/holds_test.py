@@ -0,0 +1,49 @@
+import pytest
+
+from .holds import HoldQueues
+
+def test_place_and_allocate_in_order():
+    holds = HoldQueues()
+    for user_id in ("1", "2", "3"):
+        holds.place(user_id, "isbn")
+    with pytest.raises(ValueError):
+        holds.place("2", "isbn")
+    assert [holds.position(user_id, "isbn") for user_id in ("1", "2", "3", "4")] == [1, 2, 3, None]
+    assert holds.allocate("isbn").user_id == "1"
+    assert [holds.position(user_id, "isbn") for user_id in ("1", "2", "3")] == [0, 1, 2]
+    assert holds.fulfil("2", "isbn") is None
+    assert holds.fulfil("1", "isbn").user_id == "1"
+    # Two returned copies are set aside for the next two in line
+    assert holds.allocate("isbn").user_id == "2"
+    assert holds.allocate("isbn").user_id == "3"
+    assert holds.allocate("isbn") is None
+    assert holds.ready("isbn") == 2 and holds.is_ready("3", "isbn")
+    assert holds.waiting("isbn") == 0
+    assert len(holds) == 2
+
+def test_cancel_keeps_positions():
+    holds = HoldQueues()
+    for user_id in range(10):
+        holds.place(str(user_id), "isbn")
+    for user_id in (0, 3, 4, 8):
+        assert holds.cancel(str(user_id), "isbn") is not None
+    assert holds.cancel("3", "isbn") is None
+    waiting = ["1", "2", "5", "6", "7", "9"]
+    assert [holds.position(user_id, "isbn") for user_id in waiting] == [1, 2, 3, 4, 5, 6]
+    assert holds.allocate("isbn").user_id == "1"
+    assert [holds.position(user_id, "isbn") for user_id in waiting[1:]] == [1, 2, 3, 4, 5]
+    assert [hold.isbn for hold in holds.holds_for("9")] == ["isbn"]
+
+def test_rows_and_journal_round_trip():
+    holds = HoldQueues()
+    for entry in [{"op": "hold", "UserID": "1", "isbn": "a"}, {"op": "hold", "UserID": "2", "isbn": "a"},
+                  {"op": "hold", "UserID": "3", "isbn": "b"}, {"op": "hold", "UserID": "3", "isbn": "a"},
+                  {"op": "ready", "UserID": "2", "isbn": "a"}, {"op": "ready", "UserID": "1", "isbn": "a"},
+                  {"op": "cancel_hold", "UserID": "3", "isbn": "b"}]:
+        holds.apply(entry)
+    # Only the head of the queue can be set aside
+    assert [(row["UserID"], row["status"]) for row in holds.rows()] == [("1", "ready"), ("2", "waiting"), ("3", "waiting")]
+    copy = HoldQueues.from_rows(holds.rows())
+    assert copy.rows() == holds.rows()
+    copy.apply({"op": "checkout", "UserID": "1", "isbn": "a"})
+    assert copy.ready("a") == 0 and copy.position("2", "a") == 1
@@ -0,0 +1,171 @@
+"""Module for counting the copies of each book on the shelf."""
+
+from typing import Dict, List, Optional
+
+class _Stock:
+    """The copies of one book: how many there are and which are on the shelf."""
+
+    __slots__ = ("copies", "free", "slots")
+
+    def __init__(self) -> None:
+        self.copies = 0
+        # Copy IDs on the shelf, and the position of each in free for O(1) removal
+        self.free: List[int] = []
+        self.slots: Dict[int, int] = {}
+
+class Inventory:
+    """
+    The copies of every book, by ISBN.
+
+    Copies of a book are numbered from 1. Each ISBN has a copy count and a free list
+    of the copies on the shelf, so taking a copy off the shelf, putting one back and
+    counting the copies available are O(1).
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty Inventory."""
+        self._stock: Dict[str, _Stock] = {}
+
+    def __contains__(self, isbn: str) -> bool:
+        """Return whether a book is in the inventory."""
+        return isbn in self._stock
+
+    def add(self, isbn: str, copies: int = 1) -> List[int]:
+        """
+        Add copies of a book, all on the shelf.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copies (int, optional): Number of copies to add. Defaults to 1.
+
+        Returns:
+            List[int]: The IDs of the new copies.
+        """
+        first = self.copies(isbn) + 1
+        self.add_copy(isbn, first + copies - 1)
+        return list(range(first, first + copies))
+
+    def add_copy(self, isbn: str, copy: int) -> bool:
+        """
+        Make sure a book has copies numbered up to a given ID, adding any that are missing.
+
+        Adding a copy that exists changes nothing, so replaying a journal entry twice
+        is harmless.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copy (int): ID of the copy.
+
+        Returns:
+            bool: True if copies were added.
+        """
+        stock = self._stock.get(isbn)
+        if stock is None:
+            stock = self._stock[isbn] = _Stock()
+        if copy <= stock.copies:
+            return False
+        for new in range(stock.copies + 1, copy + 1):
+            stock.slots[new] = len(stock.free)
+            stock.free.append(new)
+        stock.copies = copy
+        return True
+
+    def take(self, isbn: str, copy: Optional[int] = None) -> Optional[int]:
+        """
+        Take a copy of a book off the shelf.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copy (Optional[int], optional): The copy to take, if it is on the shelf.
+                Defaults to any copy.
+
+        Returns:
+            Optional[int]: The ID of the copy taken, or None if no copy is on the shelf.
+        """
+        stock = self._stock.get(isbn)
+        if stock is None or not stock.free:
+            return None
+        if copy not in stock.slots:
+            copy = stock.free[-1]
+        # Move the last free copy into the place of the one taken
+        position = stock.slots.pop(copy)
+        last = stock.free.pop()
+        if last != copy:
+            stock.free[position] = last
+            stock.slots[last] = position
+        return copy
+
+    def give_back(self, isbn: str, copy: int) -> bool:
+        """
+        Put a copy of a book back on the shelf.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copy (int): ID of the copy.
+
+        Returns:
+            bool: False if there is no such copy or it is already on the shelf.
+        """
+        stock = self._stock.get(isbn)
+        if stock is None or not 1 <= copy <= stock.copies or copy in stock.slots:
+            return False
+        stock.slots[copy] = len(stock.free)
+        stock.free.append(copy)
+        return True
+
+    def available(self, isbn: str) -> int:
+        """Return the number of copies of a book on the shelf."""
+        stock = self._stock.get(isbn)
+        return len(stock.free) if stock is not None else 0
+
+    def copies(self, isbn: str) -> int:
+        """Return the number of copies of a book the library owns."""
+        stock = self._stock.get(isbn)
+        return stock.copies if stock is not None else 0
+
+def count_copies(record: Dict[str, str]) -> Dict[str, str]:
+    """
+    Fill in the copies, available and lent fields of a stored book, in place.
+
+    lent lists the IDs of the copies on loan, separated by spaces. Books stored before
+    copies were counted are a single copy, on loan if the book is not available.
+
+    Args:
+        record (Dict[str, str]): A row of books.csv or the books table.
+
+    Returns:
+        Dict[str, str]: The record.
+    """
+    if not record.get("copies"):
+        record["copies"] = "1"
+        record["lent"] = "1" if record.get("AvailableInLibrary") == "No" else ""
+    record["lent"] = record.get("lent") or ""
+    record["available"] = str(int(record["copies"]) - len(record["lent"].split()))
+    return record
+
+def lend_copies(record: Dict[str, str], changes: Dict[int, bool], copies: int = 0) -> Dict[str, str]:
+    """
+    Mark copies of a stored book as lent or returned, in place.
+
+    Marking a copy twice changes nothing, so replaying a journal entry twice is harmless.
+
+    Args:
+        record (Dict[str, str]): A row of books.csv or the books table, see count_copies.
+        changes (Dict[int, bool]): Whether each copy is now on loan, by copy ID.
+        copies (int, optional): Number of copies the book has at least. Defaults to 0.
+
+    Returns:
+        Dict[str, str]: The record, with AvailableInLibrary "No" if every copy is lent.
+    """
+    count_copies(record)
+    copies = max(int(record["copies"]), copies)
+    lent = {int(copy) for copy in record["lent"].split()}
+    for copy, on_loan in changes.items():
+        if on_loan:
+            lent.add(copy)
+        else:
+            lent.discard(copy)
+    lent = sorted(copy for copy in lent if 1 <= copy <= copies)
+    record.update(copies=str(copies), lent=" ".join(map(str, lent)), available=str(copies - len(lent)),
+                  AvailableInLibrary="Yes" if len(lent) < copies else "No")
+    return record
@@ -0,0 +1,32 @@
+from .inventory import Inventory, count_copies, lend_copies
+
+def test_take_and_give_back():
+    inventory = Inventory()
+    assert inventory.add("A", 3) == [1, 2, 3]
+    assert inventory.add("A") == [4]
+    assert inventory.copies("A") == 4 and inventory.available("A") == 4
+    assert inventory.take("A", 2) == 2
+    # A copy that is not on the shelf is replaced by any that is
+    assert inventory.take("A", 2) in (1, 3, 4)
+    assert inventory.available("A") == 2
+    assert inventory.give_back("A", 2)
+    assert not inventory.give_back("A", 2) and not inventory.give_back("A", 9)
+    taken = {inventory.take("A") for _ in range(3)}
+    assert inventory.take("A") is None and len(taken) == 3
+    assert inventory.take("B") is None and inventory.available("B") == 0
+
+def test_add_copy_is_idempotent():
+    inventory = Inventory()
+    assert inventory.add_copy("A", 2)
+    assert not inventory.add_copy("A", 1)
+    assert inventory.copies("A") == 2 and inventory.available("A") == 2
+
+def test_stored_copies():
+    # Books stored before copies were counted are one copy
+    assert count_copies({"AvailableInLibrary": "No"}) == {"AvailableInLibrary": "No", "copies": "1", "lent": "1", "available": "0"}
+    book = count_copies({"AvailableInLibrary": "Yes", "copies": "3", "lent": ""})
+    assert lend_copies(book, {1: True, 2: True})["available"] == "1"
+    assert lend_copies(book, {1: True, 2: True}) == book
+    assert lend_copies(book, {3: True})["AvailableInLibrary"] == "No"
+    assert lend_copies(book, {1: False}, copies=5) == {
+        "AvailableInLibrary": "Yes", "copies": "5", "lent": "2 3", "available": "3"}
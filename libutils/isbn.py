@@ -0,0 +1,110 @@
+"""Module for validating and normalizing ISBN-13 numbers."""
+
+import re
+from typing import List, Optional
+
+# NumPy is optional and slow to import, so it is only imported by the first batch
+_numpy = False
+
+def _import_numpy():
+    """Return the numpy module, or None if it is not installed."""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy
+        except ImportError:  # Batches fall back to pure Python
+            numpy = None
+        _numpy = numpy
+    return _numpy
+
+# Patterns are compiled once at import instead of on every call
+_NON_DIGITS = re.compile(r"\D", re.ASCII)
+_ISBN_PATTERN = re.compile(r"^(978|979)-\d{1,5}-\d{1,7}-\d{1,7}-\d$", re.ASCII)
+_PREFIXES = ("978", "979")
+
+def check_digit(digits: str) -> int:
+    """
+    Compute the ISBN-13 check digit.
+
+    Args:
+        digits (str): The first 12 digits of the ISBN.
+
+    Returns:
+        int: The check digit.
+    """
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits[:12]))
+    return (10 - total % 10) % 10
+
+def format_digits(digits: str) -> str:
+    """
+    Hyphenate 13 ISBN digits the way the catalog stores them.
+
+    Args:
+        digits (str): The 13 digits of the ISBN.
+
+    Returns:
+        str: The hyphenated ISBN, for example 978-0-123456-78-6.
+    """
+    return f"{digits[0:3]}-{digits[3]}-{digits[4:10]}-{digits[10:12]}-{digits[12]}"
+
+def is_valid_isbn(isbn: str) -> bool:
+    """
+    Check that an ISBN is hyphenated, has a 978/979 prefix and a correct check digit.
+
+    Args:
+        isbn (str): The ISBN to validate.
+
+    Returns:
+        bool: True if the ISBN is valid, False otherwise.
+    """
+    if not _ISBN_PATTERN.match(isbn):
+        return False
+    digits = isbn.replace("-", "")
+    return len(digits) == 13 and check_digit(digits) == int(digits[12])
+
+def normalize_isbn(isbn: str) -> Optional[str]:
+    """
+    Normalize an ISBN entered in any format to the hyphenated catalog form.
+
+    Args:
+        isbn (str): The ISBN, with or without separators.
+
+    Returns:
+        Optional[str]: The normalized ISBN, or None if it is not a valid ISBN-13.
+    """
+    digits = _NON_DIGITS.sub("", isbn)
+    if len(digits) != 13 or digits[:3] not in _PREFIXES or check_digit(digits) != int(digits[12]):
+        return None
+    return format_digits(digits)
+
+def normalize_isbns(isbns: List[str]) -> List[Optional[str]]:
+    """
+    Normalize a batch of ISBNs.
+
+    The check digits are verified for the whole batch at once with NumPy when it is
+    installed, and one ISBN at a time otherwise.
+
+    Args:
+        isbns (List[str]): The ISBNs, with or without separators.
+
+    Returns:
+        List[Optional[str]]: The normalized ISBNs, with None for invalid values.
+    """
+    numpy = _import_numpy()
+    if numpy is None:
+        return [normalize_isbn(isbn) for isbn in isbns]
+
+    digits = [_NON_DIGITS.sub("", isbn) for isbn in isbns]
+    candidates = [position for position, value in enumerate(digits)
+                  if len(value) == 13 and value[:3] in _PREFIXES]
+    normalized = [None] * len(isbns)
+    if not candidates:
+        return normalized
+    matrix = numpy.frombuffer("".join(digits[position] for position in candidates).encode("ascii"),
+                              dtype=numpy.uint8).reshape(-1, 13).astype(numpy.int64) - ord("0")
+    weights = numpy.tile(numpy.array([1, 3], dtype=numpy.int64), 6)
+    valid = (10 - matrix[:, :12] @ weights % 10) % 10 == matrix[:, 12]
+    for position, ok in zip(candidates, valid.tolist()):
+        if ok:
+            normalized[position] = format_digits(digits[position])
+    return normalized
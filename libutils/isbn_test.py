@@ -0,0 +1,27 @@
+import pytest
+
+from .isbn import check_digit, is_valid_isbn, normalize_isbn, normalize_isbns
+
+
+def test_check_digit():
+    assert check_digit("978012345678") == 6
+    assert check_digit("978178633089") == 5
+
+@pytest.mark.parametrize("isbn, expected", [
+    ("978-0-123456-78-6", True),
+    ("978-0-123456-78-9", False),
+    ("977-0-123456-78-6", False),
+    ("9780123456786", False),
+])
+def test_is_valid_isbn(isbn, expected):
+    assert is_valid_isbn(isbn) is expected
+
+def test_normalize_isbn():
+    assert normalize_isbn("978 0 12345678 6") == "978-0-123456-78-6"
+    assert normalize_isbn("978-0-123456-78-9") is None
+    assert normalize_isbn("12345") is None
+    assert normalize_isbn("٩٧٨٠١٢٣٤٥٦٧٨٦") is None
+
+def test_normalize_isbns_matches_single_isbn():
+    isbns = ["9780123456786", "978-0-123456-78-9", "", "979-1-786330-89-0", "9781786330895"]
+    assert normalize_isbns(isbns) == [normalize_isbn(isbn) for isbn in isbns]
@@ -0,0 +1,228 @@
+"""Module for tracking which patron holds which book."""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Format of checkout times and due dates; it sorts in time order as plain text
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def format_time(moment: datetime) -> str:
+    """Return a datetime in TIME_FORMAT."""
+    return moment.strftime(TIME_FORMAT)
+
+def due_after(timestamp: str, days: int) -> str:
+    """
+    Return the due date of a loan that starts at a given time.
+
+    Args:
+        timestamp (str): Start of the loan, in TIME_FORMAT.
+        days (int): Length of the loan in days.
+
+    Returns:
+        str: The due date, in TIME_FORMAT.
+    """
+    return format_time(datetime.strptime(timestamp, TIME_FORMAT) + timedelta(days=days))
+
+class Loan:
+    """A copy of a book lent to a patron."""
+
+    __slots__ = ("user_id", "isbn", "timestamp", "due", "copy")
+
+    def __init__(self, user_id: str, isbn: str, timestamp: Optional[str] = None, due: Optional[str] = None,
+                 copy: Optional[int] = None):
+        """
+        Initialize a Loan object.
+
+        Args:
+            user_id (str): The UserID of the patron, as stored in users.csv.
+            isbn (str): The ISBN of the book.
+            timestamp (Optional[str], optional): When the book was checked out, if known.
+            due (Optional[str], optional): When the book is due back, if known.
+            copy (Optional[int], optional): ID of the copy lent, if known.
+        """
+        self.user_id = user_id
+        self.isbn = isbn
+        self.timestamp = timestamp
+        self.due = due
+        self.copy = copy
+
+    def __repr__(self) -> str:
+        return f"Loan({self.user_id!r}, {self.isbn!r}, {self.timestamp!r}, {self.due!r}, {self.copy!r})"
+
+class LoanIndex:
+    """
+    The loans of the library, indexed both by ISBN and by patron.
+
+    A patron holds at most one copy of a book, so a loan is identified by patron and
+    ISBN. Finding who holds a book, what a patron holds and how many books a patron
+    holds are dictionary lookups, and so is lending or returning a book.
+
+    Loans with a due date are also kept in a min-heap by due date, so the overdue
+    loans are found in O(k log n) for k overdue loans, without looking at the others.
+    Returned and renewed loans leave their old heap entries behind; those are skipped
+    and cleared out once they make up half of the heap.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty LoanIndex."""
+        # Loans per ISBN and per patron, each keyed by the other, which keeps
+        # checkout order and O(1) removal
+        self._by_isbn: Dict[str, Dict[str, Loan]] = {}
+        self._by_user: Dict[str, Dict[str, Loan]] = {}
+        self._count = 0
+        # Heap of [due, sequence, isbn, user_id] entries, and the live entry of every loan in it
+        self._due_heap: List[list] = []
+        self._due_entries: Dict[Tuple[str, str], list] = {}
+        self._sequence = 0
+
+    def __len__(self) -> int:
+        """Return the number of copies on loan."""
+        return self._count
+
+    def __contains__(self, isbn: str) -> bool:
+        """Return whether any copy of a book is on loan."""
+        return isbn in self._by_isbn
+
+    def __iter__(self) -> Iterator[Loan]:
+        """Iterate over every loan."""
+        return iter([loan for loans in self._by_isbn.values() for loan in loans.values()])
+
+    def add(self, user_id: str, isbn: str, timestamp: Optional[str] = None, due: Optional[str] = None,
+            copy: Optional[int] = None) -> Loan:
+        """
+        Lend a copy of a book to a patron.
+
+        Adding a loan the patron already has changes nothing, so replaying a journal
+        entry twice is harmless. Whether a copy is free is up to the caller.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+            timestamp (Optional[str], optional): When the book was checked out.
+            due (Optional[str], optional): When the book is due back, in TIME_FORMAT.
+            copy (Optional[int], optional): ID of the copy lent.
+
+        Returns:
+            Loan: The loan.
+        """
+        loans = self._by_isbn.setdefault(isbn, {})
+        loan = loans.get(user_id)
+        if loan is not None:
+            return loan
+        loan = loans[user_id] = Loan(user_id, isbn, timestamp, copy=copy)
+        self._by_user.setdefault(user_id, {})[isbn] = loan
+        self._count += 1
+        self._set_due(loan, due)
+        return loan
+
+    def renew(self, user_id: str, isbn: str, due: str) -> Optional[Loan]:
+        """
+        Change the due date of a loan.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+            due (str): The new due date, in TIME_FORMAT.
+
+        Returns:
+            Optional[Loan]: The loan, or None if the patron does not hold the book.
+        """
+        loan = self.get(user_id, isbn)
+        if loan is not None:
+            self._set_due(loan, due)
+        return loan
+
+    def remove(self, user_id: str, isbn: str) -> Optional[Loan]:
+        """
+        End a patron's loan of a book.
+
+        Args:
+            user_id (str): The UserID of the patron.
+            isbn (str): The ISBN of the book.
+
+        Returns:
+            Optional[Loan]: The loan that ended, or None if the patron did not hold the book.
+        """
+        loan = self.get(user_id, isbn)
+        if loan is not None:
+            for index, first, second in ((self._by_isbn, isbn, user_id), (self._by_user, user_id, isbn)):
+                loans = index[first]
+                del loans[second]
+                if not loans:
+                    del index[first]
+            self._count -= 1
+            self._set_due(loan, None)
+        return loan
+
+    def overdue(self, now: str) -> List[Loan]:
+        """
+        Return the loans due before a given time, earliest due first.
+
+        The heap is walked from its root, visiting only entries due before now and
+        their children, so the cost depends on the number of overdue loans.
+
+        Args:
+            now (str): The time to compare due dates with, in TIME_FORMAT.
+
+        Returns:
+            List[Loan]: The overdue loans.
+        """
+        heap, overdue = self._due_heap, []
+        frontier: List[Tuple[str, int, int]] = [(heap[0][0], heap[0][1], 0)] if heap else []
+        while frontier:
+            due, _, position = heapq.heappop(frontier)
+            if due >= now:
+                break
+            entry = heap[position]
+            if self._due_entries.get((entry[2], entry[3])) is entry:
+                overdue.append(self._by_isbn[entry[2]][entry[3]])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heapq.heappush(frontier, (heap[child][0], heap[child][1], child))
+        return overdue
+
+    def _set_due(self, loan: Loan, due: Optional[str]) -> None:
+        """Set a loan's due date, replacing its entry in the due date heap."""
+        # Storage writes a missing due date as an empty string
+        loan.due = due or None
+        key = (loan.isbn, loan.user_id)
+        self._due_entries.pop(key, None)
+        if loan.due is not None:
+            self._sequence += 1
+            entry = [due, self._sequence, loan.isbn, loan.user_id]
+            self._due_entries[key] = entry
+            heapq.heappush(self._due_heap, entry)
+        if len(self._due_heap) > 64 and len(self._due_heap) > 2 * len(self._due_entries):
+            # Drop the entries of returned and renewed loans
+            self._due_heap = list(self._due_entries.values())
+            heapq.heapify(self._due_heap)
+
+    def get(self, user_id: str, isbn: str) -> Optional[Loan]:
+        """Return a patron's loan of a book, or None if they do not hold it."""
+        return self._by_user.get(user_id, {}).get(isbn)
+
+    def holder(self, isbn: str) -> Optional[str]:
+        """Return the UserID of the patron who has held a book longest, or None if it is not on loan."""
+        loans = self._by_isbn.get(isbn)
+        return next(iter(loans)) if loans else None
+
+    def holders(self, isbn: str) -> List[str]:
+        """Return the UserIDs of the patrons holding a book, in checkout order."""
+        return list(self._by_isbn.get(isbn, ()))
+
+    def count(self, isbn: str) -> int:
+        """Return the number of copies of a book on loan."""
+        return len(self._by_isbn.get(isbn, ()))
+
+    def loans_for(self, user_id: str) -> List[Loan]:
+        """Return the loans of a patron, oldest first."""
+        return list(self._by_user.get(user_id, {}).values())
+
+    def count_for(self, user_id: str) -> int:
+        """Return the number of books a patron holds."""
+        return len(self._by_user.get(user_id, ()))
+
+    def has(self, user_id: str, isbn: str) -> bool:
+        """Return whether a patron holds a book."""
+        return isbn in self._by_user.get(user_id, ())
@@ -0,0 +1,36 @@
+from .loans import LoanIndex
+
+def test_loan_index():
+    loans = LoanIndex()
+    loans.add("1", "A")
+    loans.add("1", "B", "2024-04-18 00:00:00")
+    loans.add("2", "C")
+    assert loans.add("1", "A").user_id == "1"
+    assert len(loans) == 3 and "B" in loans
+    assert loans.holder("C") == "2" and loans.holder("D") is None
+    assert [loan.isbn for loan in loans.loans_for("1")] == ["A", "B"]
+    assert loans.count_for("1") == 2 and loans.count_for("3") == 0
+    assert loans.has("1", "B") and not loans.has("2", "B")
+    # Another copy of a book can be lent to another patron
+    loans.add("2", "A", copy=2)
+    assert loans.holders("A") == ["1", "2"] and loans.count("A") == 2
+    assert loans.get("2", "A").copy == 2 and len(loans) == 4
+
+def test_loan_index_remove():
+    loans = LoanIndex()
+    loans.add("1", "A")
+    assert loans.remove("2", "A") is None
+    assert loans.remove("1", "A").user_id == "1"
+    assert loans.remove("1", "A") is None
+    assert loans.loans_for("1") == [] and len(loans) == 0
+
+def test_overdue_loans():
+    loans = LoanIndex()
+    for day in range(1, 10):
+        loans.add(str(day), f"B{day}", due=f"2024-05-0{day} 00:00:00")
+    loans.add("0", "legacy")
+    loans.remove("2", "B2")
+    loans.renew("1", "B1", "2024-06-01 00:00:00")
+    assert [loan.isbn for loan in loans.overdue("2024-05-05 00:00:00")] == ["B3", "B4"]
+    assert loans.overdue("2024-01-01 00:00:00") == []
+    assert [loan.isbn for loan in loans.overdue("2025-01-01 00:00:00")][-1] == "B1"
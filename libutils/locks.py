@@ -0,0 +1,113 @@
+"""Module for locking library records across threads and processes."""
+
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; locks then only cover threads
+    fcntl = None
+
+class LockManager:
+    """
+    Per-key locks shared by every thread and process using the same lock file.
+
+    Each key hashes to one of SLOTS byte ranges of the lock file, which is locked with
+    fcntl record locks so other processes block on the same key. Threads of this
+    process are serialized per slot with a condition variable, since record locks are
+    held per process. exclusive() locks the whole file and waits for every key lock.
+    """
+
+    SLOTS = 4096
+
+    def __init__(self, lock_filepath: str) -> None:
+        """
+        Initialize the LockManager.
+
+        Args:
+            lock_filepath (str): Path of the lock file; it is created on first use.
+        """
+        self.lock_filepath = lock_filepath
+        self._condition = threading.Condition()
+        self._held_slots = set()
+        self._exclusive = False
+        self._fd = None
+
+    @contextmanager
+    def key(self, key: str) -> Iterator[None]:
+        """
+        Hold the lock for one key, such as an ISBN.
+
+        Args:
+            key (str): The key to lock.
+        """
+        slot = 1 + zlib.crc32(key.encode("utf-8")) % self.SLOTS
+        with self._condition:
+            while self._exclusive or slot in self._held_slots:
+                self._condition.wait()
+            self._held_slots.add(slot)
+            self._open()
+        try:
+            with self._file_lock(slot, 1):
+                yield
+        finally:
+            with self._condition:
+                self._held_slots.discard(slot)
+                self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold every key lock at once, for operations such as journal compaction."""
+        with self._condition:
+            while self._exclusive or self._held_slots:
+                self._condition.wait()
+            self._exclusive = True
+            self._open()
+        try:
+            with self._file_lock(0, 0):
+                yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+    def _open(self) -> None:
+        """Open the lock file once; closing it would drop every lock this process holds."""
+        if fcntl is not None and self._fd is None:
+            self._fd = os.open(self.lock_filepath, os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def _file_lock(self, start: int, length: int) -> Iterator[None]:
+        """Lock a byte range of the lock file; a length of 0 extends to the end of the file."""
+        if fcntl is None:
+            yield
+            return
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+        try:
+            yield
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+# One manager per lock file, so every Storage instance in this process shares it
+_managers = {}
+_managers_lock = threading.Lock()
+
+def lock_manager_for(lock_filepath: str) -> LockManager:
+    """
+    Return the LockManager for a lock file, creating it on first use.
+
+    Args:
+        lock_filepath (str): Path of the lock file.
+
+    Returns:
+        LockManager: The shared manager.
+    """
+    key = os.path.abspath(lock_filepath)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = LockManager(key)
+        return manager
@@ -0,0 +1,137 @@
+"""Module for measuring where the library spends its time."""
+
+import json
+import os
+import threading
+import time
+from typing import Dict
+
+class Span:
+    """A timed operation; the amounts added to it are recorded when it ends."""
+
+    __slots__ = ("_metrics", "name", "amounts", "_started")
+
+    def __init__(self, metrics: "Metrics", name: str) -> None:
+        self._metrics = metrics
+        self.name = name
+        self.amounts = {}
+        self._started = 0.0
+
+    def add(self, **amounts: float) -> None:
+        """Add to counters of this span, such as rows or bytes_read."""
+        for key, value in amounts.items():
+            self.amounts[key] = self.amounts.get(key, 0) + value
+
+    def __enter__(self) -> "Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        self._metrics.add(self.name, calls=1, seconds=time.perf_counter() - self._started, **self.amounts)
+        return False
+
+class _NullSpan:
+    """Stands in for Span while metrics are disabled, so instrumented code costs next to nothing."""
+
+    __slots__ = ()
+
+    def add(self, **amounts: float) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+_NULL_SPAN = _NullSpan()
+
+class Metrics:
+    """
+    Counters and timers per named operation, such as "storage.load_data".
+
+    Each operation accumulates calls, seconds and any other amounts its spans add,
+    such as rows, bytes_read and bytes_written.
+    """
+
+    def __init__(self, enabled: bool = False) -> None:
+        """
+        Initialize the Metrics.
+
+        Args:
+            enabled (bool, optional): Whether to record anything. Defaults to False.
+        """
+        self.enabled = enabled
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str):
+        """
+        Time an operation with a with statement.
+
+        Args:
+            name (str): Name of the operation.
+
+        Returns:
+            Span: The span; a shared no-op span while metrics are disabled.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name)
+
+    def add(self, name: str, **amounts: float) -> None:
+        """
+        Add to the counters of an operation.
+
+        Args:
+            name (str): Name of the operation.
+            **amounts (float): Amounts to add, by counter name.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            counters = self._counters.setdefault(name, {})
+            for key, value in amounts.items():
+                counters[key] = counters.get(key, 0) + value
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Return a copy of every operation's counters."""
+        with self._lock:
+            return {name: dict(counters) for name, counters in self._counters.items()}
+
+    def reset(self) -> None:
+        """Clear every counter."""
+        with self._lock:
+            self._counters.clear()
+
+    def dump(self, filepath: str) -> None:
+        """
+        Write the counters to a JSON file.
+
+        Args:
+            filepath (str): Path of the file.
+        """
+        with open(filepath, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file, indent=2, sort_keys=True)
+
+def format_metrics(snapshot: Dict[str, Dict[str, float]]) -> str:
+    """
+    Format counters as a table, slowest operation first.
+
+    Args:
+        snapshot (Dict[str, Dict[str, float]]): Counters as returned by Metrics.snapshot.
+
+    Returns:
+        str: One line per operation.
+    """
+    lines = [f"{'operation':24} {'calls':>8} {'total ms':>10} {'avg ms':>8}  other"]
+    for name, counters in sorted(snapshot.items(), key=lambda item: -item[1].get("seconds", 0)):
+        calls, seconds = counters.get("calls", 0), counters.get("seconds", 0)
+        other = ", ".join(f"{key} {value:g}" for key, value in sorted(counters.items())
+                          if key not in ("calls", "seconds"))
+        lines.append(f"{name:24} {calls:>8g} {seconds * 1000:>10.1f} "
+                     f"{seconds * 1000 / calls if calls else 0:>8.3f}  {other}")
+    return "\n".join(lines)
+
+# Global instance of Metrics; set LIBRARY_METRICS=1 to record from the start
+metrics = Metrics(enabled=os.environ.get("LIBRARY_METRICS") == "1")
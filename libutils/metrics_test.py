@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from .metrics import Metrics, format_metrics, metrics
+from .storage import Storage, parse_cache
+
+
+@pytest.fixture
+def enabled_metrics():
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+def test_disabled_metrics_record_nothing():
+    recorder = Metrics(enabled=False)
+    with recorder.span("work") as span:
+        span.add(rows=3)
+    recorder.add("work", calls=1)
+    assert recorder.snapshot() == {}
+
+def test_spans_accumulate():
+    recorder = Metrics(enabled=True)
+    for rows in (1, 2):
+        with recorder.span("work") as span:
+            span.add(rows=rows)
+    counters = recorder.snapshot()["work"]
+    assert counters["calls"] == 2
+    assert counters["rows"] == 3
+    assert counters["seconds"] >= 0
+    assert "work" in format_metrics(recorder.snapshot())
+
+def test_storage_io_is_counted(enabled_metrics, tmp_path):
+    parse_cache.clear()
+    storage = Storage(database_folder=str(tmp_path))
+    storage.save_data([{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}],
+                      storage.books_filepath, storage._get_books_fieldnames(), "isbn")
+    storage.load_data(storage.books_filepath)
+    storage.load_data(storage.books_filepath)
+    counters = enabled_metrics.snapshot()
+    assert counters["storage.save_data"]["rows"] == 1
+    # Appends are written, and counted, by the group commit
+    assert counters["storage.group_commit"]["rows"] == 1
+    assert counters["storage.group_commit"]["bytes_written"] == (tmp_path / "books.csv").stat().st_size
+    assert counters["storage.load_data"]["calls"] == 3
+    assert counters["storage.load_data"]["bytes_read"] == (tmp_path / "books.csv").stat().st_size
+
+def test_dump_writes_json(tmp_path):
+    recorder = Metrics(enabled=True)
+    recorder.add("work", calls=1)
+    recorder.dump(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == {"work": {"calls": 1}}
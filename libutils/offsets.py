@@ -0,0 +1,188 @@
+"""Module for finding single rows of a CSV file without reading the whole file."""
+
+import csv
+import json
+import mmap
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+class OffsetIndex:
+    """
+    Byte offsets of the rows of a CSV file by their unique key, such as isbn.
+
+    The offsets are saved next to the CSV file (books.csv.isbn.offsets) together with
+    the file's signature. When the file has changed the index is extended over the
+    appended rows, or rebuilt if the file was rewritten. Rows are read through mmap,
+    so a lookup reads one row instead of the whole file.
+    """
+
+    def __init__(self, filepath: str, key: str) -> None:
+        """
+        Initialize the OffsetIndex.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            key (str): Name of the unique key field.
+        """
+        self.filepath = filepath
+        self.key = key
+        self.index_filepath = f"{filepath}.{key}.offsets"
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._header: List[str] = []
+        self._offsets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def find(self, value: str) -> Optional[Dict[str, str]]:
+        """
+        Read the row with a given key.
+
+        Args:
+            value (str): Value of the key.
+
+        Returns:
+            Optional[Dict[str, str]]: The row as stored in the file, or None if there is no such row.
+        """
+        try:
+            file = open(self.filepath, 'rb')
+        except FileNotFoundError:
+            return None
+        with file:
+            stat = os.fstat(file.fileno())
+            if stat.st_size == 0:
+                return None
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                with self._lock:
+                    self._refresh(data, signature)
+                    record = self._record_at(data, value)
+                    if record is not None and record.get(self.key) != value:
+                        # The file was rewritten within the resolution of its mtime
+                        self._signature = None
+                        self._refresh(data, signature, rebuild=True)
+                        record = self._record_at(data, value)
+                return record
+
+    def _record_at(self, data: mmap.mmap, value: str) -> Optional[Dict[str, str]]:
+        """Read the row the index holds for a key, or return None if it holds none."""
+        offset = self._offsets.get(value)
+        if offset is None:
+            return None
+        return dict(zip(self._header, self._row_at(data, offset)[0]))
+
+    def _refresh(self, data: mmap.mmap, signature: Tuple[int, int, int], rebuild: bool = False) -> None:
+        """
+        Bring the offsets up to date with the file.
+
+        Args:
+            data (mmap.mmap): The mapped file.
+            signature (Tuple[int, int, int]): The file's mtime, size and inode.
+            rebuild (bool, optional): Rescan the whole file. Defaults to False.
+        """
+        if self._signature == signature:
+            return
+        if self._signature is None and not rebuild:
+            self._load()
+            if self._signature == signature:
+                return
+        old = self._signature
+        if old is not None and old[2] == signature[2] and self._appended_to(data, old[1]):
+            # Rows were only appended since the index was saved
+            self._scan(data, old[1])
+        else:
+            self._header, self._offsets = [], {}
+            self._scan(data, 0)
+        self._signature = signature
+        self._save()
+
+    def _appended_to(self, data: mmap.mmap, old_size: int) -> bool:
+        """Return whether the file still starts with the rows the index was built from."""
+        if not self._offsets or len(data) <= old_size or data[old_size - 1:old_size] != b"\n":
+            return False
+        # The last indexed row must still hold the same key at the same place
+        last_value, last_offset = max(self._offsets.items(), key=lambda item: item[1])
+        values, _ = self._row_at(data, last_offset)
+        return dict(zip(self._header, values)).get(self.key) == last_value
+
+    def _scan(self, data: mmap.mmap, start: int) -> None:
+        """
+        Add the offsets of the rows from a byte position to the end of the file.
+
+        Args:
+            data (mmap.mmap): The mapped file.
+            start (int): Offset of the first row to read; 0 reads the header too.
+        """
+        offset = start
+        if offset == 0:
+            self._header, offset = self._row_at(data, 0)
+        if self.key not in self._header:
+            return
+        column = self._header.index(self.key)
+        while offset < len(data):
+            values, end = self._row_at(data, offset)
+            # The first row wins, as it does for a scan of the file
+            if len(values) > column:
+                self._offsets.setdefault(values[column], offset)
+            offset = end
+
+    @staticmethod
+    def _row_at(data: mmap.mmap, offset: int) -> Tuple[List[str], int]:
+        """
+        Parse the CSV row starting at a byte offset, following quoted fields across lines.
+
+        Returns:
+            Tuple[List[str], int]: The row's values and the offset of the next row.
+        """
+        end = offset
+        while True:
+            end = data.find(b"\n", end)
+            end = len(data) if end == -1 else end + 1
+            if end == len(data) or data[offset:end].count(b'"') % 2 == 0:
+                break
+        return next(csv.reader([data[offset:end].decode('utf-8')]), []), end
+
+    def _load(self) -> None:
+        """Read the saved offsets, if there are any."""
+        try:
+            with open(self.index_filepath, 'r', encoding='utf-8') as file:
+                saved = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return
+        if saved.get("key") == self.key:
+            self._signature = tuple(saved["signature"])
+            self._header = saved["header"]
+            self._offsets = saved["offsets"]
+
+    def _save(self) -> None:
+        """Write the offsets next to the CSV file, replacing the old ones in one step."""
+        temporary = f"{self.index_filepath}.{os.getpid()}.tmp"
+        try:
+            with open(temporary, 'w', encoding='utf-8') as file:
+                json.dump({"key": self.key, "signature": list(self._signature),
+                           "header": self._header, "offsets": self._offsets}, file)
+            os.replace(temporary, self.index_filepath)
+        except OSError:
+            # The saved offsets only spare the next process a scan
+            pass
+
+# One OffsetIndex per file and key, shared by every Storage in the process
+_offset_indexes: Dict[Tuple[str, str], OffsetIndex] = {}
+_offset_indexes_lock = threading.Lock()
+
+def offset_index_for(filepath: str, key: str) -> OffsetIndex:
+    """
+    Return the OffsetIndex of a CSV file and key, creating it on first use.
+
+    Args:
+        filepath (str): Path to the CSV file.
+        key (str): Name of the unique key field.
+
+    Returns:
+        OffsetIndex: The shared index.
+    """
+    filepath = os.path.abspath(filepath)
+    with _offset_indexes_lock:
+        index = _offset_indexes.get((filepath, key))
+        if index is None:
+            index = _offset_indexes[(filepath, key)] = OffsetIndex(filepath, key)
+        return index
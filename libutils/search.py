@@ -0,0 +1,208 @@
+"""Module for searching books by title and author."""
+
+import json
+import os
+import re
+import heapq
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional, Tuple
+
+_TOKEN = re.compile(r"\w+")
+
+# A query word found in the title counts for more than one found in the author
+TITLE_WEIGHT = 2
+AUTHOR_WEIGHT = 1
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lower-case search tokens.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        List[str]: The tokens in order of appearance.
+    """
+    return _TOKEN.findall((text or "").lower())
+
+class SearchIndex:
+    """An inverted index from title and author tokens to ISBNs, with prefix lookup."""
+
+    def __init__(self) -> None:
+        """Initialize an empty SearchIndex."""
+        self._postings = {}
+        self._tokens = []
+
+    def __len__(self) -> int:
+        """Return the number of distinct tokens in the index."""
+        return len(self._postings)
+
+    def add(self, isbn: str, title: str, author: str) -> None:
+        """
+        Index a book's title and author.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            title (str): The title of the book.
+            author (str): The author of the book.
+        """
+        for tokens, weight in ((tokenize(title), TITLE_WEIGHT), (tokenize(author), AUTHOR_WEIGHT)):
+            for token in tokens:
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    if self._tokens is not None:
+                        insort(self._tokens, token)
+                postings[isbn] = postings.get(isbn, 0) + weight
+
+    @classmethod
+    def build(cls, books: Iterable[Tuple[str, str, str]]) -> "SearchIndex":
+        """
+        Build an index for many books at once, sorting the vocabulary only at the end.
+
+        Args:
+            books (Iterable[Tuple[str, str, str]]): (isbn, title, author) for every book.
+
+        Returns:
+            SearchIndex: The new index.
+        """
+        index = cls()
+        index._tokens = None
+        for isbn, title, author in books:
+            index.add(isbn, title, author)
+        index._tokens = sorted(index._postings)
+        return index
+
+    def search(self, query: str, limit: int = 20) -> List[Tuple[str, int]]:
+        """
+        Find the books matching every word of a query.
+
+        Each query word matches any indexed token it is a prefix of. Results are ranked
+        by how often and where (title or author) the words matched, with exact word
+        matches ranked above prefix matches.
+
+        Args:
+            query (str): The words to search for.
+            limit (int, optional): Maximum number of results. Defaults to 20.
+
+        Returns:
+            List[Tuple[str, int]]: ISBNs and their scores, best first.
+        """
+        # Start from the word with the fewest matches so later words only re-score
+        # books that are still candidates
+        matches = sorted((self._matching_tokens(word) for word in set(tokenize(query))),
+                         key=lambda tokens: sum(len(self._postings[token]) for token, _ in tokens))
+        if not matches:
+            return []
+        scores = {}
+        for token, factor in matches[0]:
+            for isbn, weight in self._postings[token].items():
+                scores[isbn] = scores.get(isbn, 0) + weight * factor
+        for tokens in matches[1:]:
+            if not scores:
+                break
+            next_scores = {}
+            for isbn, score in scores.items():
+                extra = 0
+                for token, factor in tokens:
+                    extra += self._postings[token].get(isbn, 0) * factor
+                if extra:
+                    next_scores[isbn] = score + extra
+            scores = next_scores
+        return heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def _matching_tokens(self, word: str) -> List[Tuple[str, int]]:
+        """
+        Find the indexed tokens a query word is a prefix of.
+
+        Args:
+            word (str): The query word.
+
+        Returns:
+            List[Tuple[str, int]]: Matching tokens with their score factor; an exact
+            match counts double.
+        """
+        tokens = []
+        position = bisect_left(self._tokens, word)
+        while position < len(self._tokens) and self._tokens[position].startswith(word):
+            token = self._tokens[position]
+            tokens.append((token, 2 if token == word else 1))
+            position += 1
+        return tokens
+
+    def save(self, filepath: str, signature: Optional[list] = None) -> None:
+        """
+        Write the index to a JSON file, replacing any change log.
+
+        Args:
+            filepath (str): Path of the index file.
+            signature (Optional[list], optional): Signature of the catalog the index was built from.
+        """
+        temporary_path = f"{filepath}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as file:
+            json.dump({"signature": signature, "postings": self._postings}, file, separators=(",", ":"))
+        # The old log is removed first: an old index without its log is only stale,
+        # while a new index with the old log would count those books twice
+        if os.path.exists(f"{filepath}.log"):
+            os.remove(f"{filepath}.log")
+        os.replace(temporary_path, filepath)
+
+    def save_changes(self, filepath: str, books: List[Tuple[str, str, str]], signature: Optional[list] = None,
+                     max_log_ratio: float = 0.1) -> None:
+        """
+        Record books added since the index file was written in its change log.
+
+        This costs as much as the change rather than the whole index. Once the log
+        grows past max_log_ratio of the index file the index is saved in full instead.
+
+        Args:
+            filepath (str): Path of the index file.
+            books (List[Tuple[str, str, str]]): (isbn, title, author) of every added book.
+            signature (Optional[list], optional): Signature of the catalog including these books.
+            max_log_ratio (float, optional): Largest log size relative to the index file. Defaults to 0.1.
+        """
+        log_path = f"{filepath}.log"
+        try:
+            index_size = os.path.getsize(filepath)
+        except OSError:
+            return self.save(filepath, signature)
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        if log_size > max_log_ratio * index_size:
+            return self.save(filepath, signature)
+        with open(log_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({"books": books, "signature": signature}, separators=(",", ":")) + "\n")
+
+    @classmethod
+    def load(cls, filepath: str, signature: Optional[list] = None) -> Optional["SearchIndex"]:
+        """
+        Read an index written by save and save_changes, if it was built from the same catalog.
+
+        Args:
+            filepath (str): Path of the index file.
+            signature (Optional[list], optional): Signature of the current catalog.
+
+        Returns:
+            Optional[SearchIndex]: The index, or None if it is missing, unreadable or stale.
+        """
+        if signature is None:
+            return None
+        try:
+            with open(filepath, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            changes = []
+            if os.path.exists(f"{filepath}.log"):
+                with open(f"{filepath}.log", 'r', encoding='utf-8') as file:
+                    changes = [json.loads(line) for line in file]
+        except (OSError, ValueError):
+            return None
+        saved_signature = changes[-1]["signature"] if changes else data.get("signature")
+        if saved_signature != list(signature):
+            return None
+        index = cls()
+        index._tokens = None
+        index._postings = data["postings"]
+        for change in changes:
+            for isbn, title, author in change["books"]:
+                index.add(isbn, title, author)
+        index._tokens = sorted(index._postings)
+        return index
@@ -0,0 +1,46 @@
+from .search import SearchIndex, tokenize
+
+
+def make_index():
+    index = SearchIndex()
+    index.add("1", "The Art of Computer Programming", "Donald Knuth")
+    index.add("2", "Programming Pearls", "Jon Bentley")
+    index.add("3", "Art History", "Ernst Gombrich")
+    return index
+
+def test_tokenize():
+    assert tokenize("Hello, World! 2nd") == ["hello", "world", "2nd"]
+
+def test_search_prefix_and_ranking():
+    index = make_index()
+    assert [isbn for isbn, _ in index.search("program")] == ["1", "2"]
+    assert [isbn for isbn, _ in index.search("art")] == ["1", "3"]
+    assert [isbn for isbn, _ in index.search("art prog")] == ["1"]
+    assert index.search("missing") == []
+
+def test_build_matches_incremental_add():
+    built = SearchIndex.build([
+        ("1", "The Art of Computer Programming", "Donald Knuth"),
+        ("2", "Programming Pearls", "Jon Bentley"),
+        ("3", "Art History", "Ernst Gombrich"),
+    ])
+    assert built.search("art") == make_index().search("art")
+
+def test_save_and_load(tmp_path):
+    path = str(tmp_path / "index.json")
+    make_index().save(path, [1, 2, 3])
+    assert SearchIndex.load(path, (1, 2, 3)).search("knuth") == [("1", 2)]
+    assert SearchIndex.load(path, (1, 2, 4)) is None
+
+def test_save_changes_is_replayed_on_load(tmp_path):
+    path = str(tmp_path / "index.json")
+    index = SearchIndex.build([("1", "Moby Dick", "Melville")])
+    index.save(path, [1])
+    index.add("2", "Moby Two", "Someone")
+    index.save_changes(path, [("2", "Moby Two", "Someone")], [2])
+    assert SearchIndex.load(path, [1]) is None
+    loaded = SearchIndex.load(path, [2])
+    assert [isbn for isbn, _ in loaded.search("moby")] == [isbn for isbn, _ in index.search("moby")]
+    index.save(path, [3])
+    assert not (tmp_path / "index.json.log").exists()
+    assert len(SearchIndex.load(path, [3]).search("moby")) == 2
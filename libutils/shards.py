@@ -0,0 +1,177 @@
+"""Module for splitting books.csv and users.csv into shards that load in parallel."""
+
+import csv
+import json
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from .snapshot import read_snapshot, write_snapshot
+
+class ShardLayout:
+    """
+    How books and users are split into shard files.
+
+    A record goes to the shard picked by a CRC-32 of its key, which unlike hash() is
+    the same in every process. Books are keyed by ISBN, or with by="group" by the
+    ISBN's prefix and registration group (978-0, 978-1, ...), so that the books of
+    one language area share a shard. Users are always keyed by UserID.
+
+    The layout is kept in shards.json in the database folder, so that every process
+    using the folder agrees on it.
+    """
+
+    BY = ("hash", "group")
+    MANIFEST = "shards.json"
+
+    def __init__(self, count: int, by: str = "hash") -> None:
+        """
+        Initialize the ShardLayout.
+
+        Args:
+            count (int): Number of shards per dataset, at least 2.
+            by (str, optional): Either "hash" or "group". Defaults to "hash".
+        """
+        if count < 2:
+            raise ValueError("A sharded layout needs at least 2 shards")
+        if by not in self.BY:
+            raise ValueError(f"Unknown shard key '{by}'")
+        self.count = count
+        self.by = by
+
+    def __eq__(self, other: object) -> bool:
+        """Return whether two layouts put every record in the same file."""
+        return isinstance(other, ShardLayout) and (self.count, self.by) == (other.count, other.by)
+
+    def paths(self, filepath: str) -> List[str]:
+        """
+        Return the shard files of a dataset.
+
+        Args:
+            filepath (str): Path naming the dataset, such as database/books.csv.
+
+        Returns:
+            List[str]: One path per shard, such as database/books-hash-003-of-008.csv.
+        """
+        root, extension = os.path.splitext(filepath)
+        return [f"{root}-{self.by}-{index:03d}-of-{self.count:03d}{extension}" for index in range(self.count)]
+
+    def shard_of(self, key: str, value: str) -> int:
+        """
+        Return the shard owning a record.
+
+        Args:
+            key (str): Name of the unique key field ("isbn" or "UserID").
+            value (str): Value of the key.
+
+        Returns:
+            int: Index of the shard.
+        """
+        if key == "isbn" and self.by == "group":
+            value = "-".join(value.split("-", 2)[:2])
+        return zlib.crc32(value.encode("utf-8")) % self.count
+
+    def save(self, database_folder: str) -> None:
+        """Write the layout to the manifest of a database folder."""
+        filepath = os.path.join(database_folder, self.MANIFEST)
+        temporary = f"{filepath}.{os.getpid()}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump({"shards": self.count, "by": self.by}, file)
+        os.replace(temporary, filepath)
+
+# The layout of each database folder, read from its manifest on first use
+_layouts: Dict[str, Optional[ShardLayout]] = {}
+_layouts_lock = threading.Lock()
+
+def shard_layout_for(database_folder: str) -> Optional[ShardLayout]:
+    """
+    Return the shard layout of a database folder.
+
+    Args:
+        database_folder (str): The database folder.
+
+    Returns:
+        Optional[ShardLayout]: The layout, or None if books and users are kept in one
+        file each.
+    """
+    key = os.path.abspath(database_folder)
+    with _layouts_lock:
+        if key not in _layouts:
+            try:
+                with open(os.path.join(key, ShardLayout.MANIFEST), "r", encoding="utf-8") as file:
+                    manifest = json.load(file)
+                _layouts[key] = ShardLayout(manifest["shards"], manifest["by"])
+            except FileNotFoundError:
+                _layouts[key] = None
+        return _layouts[key]
+
+def set_shard_layout(database_folder: str, layout: Optional[ShardLayout]) -> None:
+    """
+    Change the shard layout of a database folder, writing or removing its manifest.
+
+    Args:
+        database_folder (str): The database folder.
+        layout (Optional[ShardLayout]): The new layout, or None for one file per dataset.
+    """
+    key = os.path.abspath(database_folder)
+    with _layouts_lock:
+        if layout is not None:
+            layout.save(key)
+        elif os.path.exists(os.path.join(key, ShardLayout.MANIFEST)):
+            os.remove(os.path.join(key, ShardLayout.MANIFEST))
+        _layouts[key] = layout
+
+def parse_shard(filepath: str, signature: Tuple[int, int, int], snapshot_min_rows: int,
+                as_columns: bool = False) -> Union[List[Dict[str, str]], Tuple[List[str], List[List[str]]]]:
+    """
+    Parse one shard, from its snapshot if it has an up to date one.
+
+    Shards with at least snapshot_min_rows rows get a snapshot for the next start.
+
+    Args:
+        filepath (str): Path of the shard.
+        signature (Tuple[int, int, int]): The shard's (mtime_ns, size, inode).
+        snapshot_min_rows (int): Smallest shard that is saved as a snapshot.
+        as_columns (bool, optional): Return the field names and one list of values per
+            field, which is much cheaper to send from a worker process than one dict
+            per row. Defaults to False.
+
+    Returns:
+        Union[List[Dict[str, str]], Tuple[List[str], List[List[str]]]]: The rows, or the columns.
+    """
+    snapshot = read_snapshot(f"{filepath}.snapshot", signature)
+    if snapshot is not None:
+        return snapshot if as_columns else _rows(*snapshot)
+    with open(filepath, "r", newline="") as file:
+        reader = csv.DictReader(file)
+        rows = list(reader)
+        fieldnames = reader.fieldnames or []
+    if len(rows) >= snapshot_min_rows:
+        write_snapshot(f"{filepath}.snapshot", signature, fieldnames, rows)
+    return (fieldnames, [[row.get(name) for row in rows] for name in fieldnames]) if as_columns else rows
+
+def parse_shards(shards: List[Tuple[str, Tuple[int, int, int]]], snapshot_min_rows: int,
+                 workers: int) -> List[List[Dict[str, str]]]:
+    """
+    Parse shards, on a pool of worker processes if there is more than one worker.
+
+    Args:
+        shards (List[Tuple[str, Tuple[int, int, int]]]): (path, signature) of each shard.
+        snapshot_min_rows (int): Smallest shard that is saved as a snapshot, see parse_shard.
+        workers (int): Largest number of worker processes to start.
+
+    Returns:
+        List[List[Dict[str, str]]]: The rows of each shard, in order.
+    """
+    workers = min(workers, len(shards))
+    if workers <= 1:
+        return [parse_shard(filepath, signature, snapshot_min_rows) for filepath, signature in shards]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parsed = pool.map(parse_shard, *zip(*shards), [snapshot_min_rows] * len(shards), [True] * len(shards))
+        return [_rows(fieldnames, columns) for fieldnames, columns in parsed]
+
+def _rows(fieldnames: List[str], columns: List[List[str]]) -> List[Dict[str, str]]:
+    """Build the rows of a shard from its columns."""
+    return [dict(zip(fieldnames, values)) for values in zip(*columns)]
@@ -0,0 +1,105 @@
+"""Module for saving parsed CSV files in a compact binary form that loads in one read."""
+
+import os
+import struct
+import sys
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Magic, byte order, then the CSV file's mtime_ns, size and inode, the number of rows
+# and the number of columns
+_HEADER = struct.Struct("<8s1sqqqqI")
+_MAGIC = b"LMSSNAP1"
+_BYTE_ORDER = b"L" if sys.byteorder == "little" else b"B"
+# Per column: name length, encoding, then the lengths of its two parts
+_COLUMN = struct.Struct("<IBQQ")
+_PLAIN, _TABLE = 0, 1
+_SEPARATOR = "\x00"
+
+def write_snapshot(filepath: str, signature: Tuple[int, int, int], fieldnames: List[str],
+                   rows: List[Dict[str, str]]) -> bool:
+    """
+    Save rows parsed from a CSV file as a columnar snapshot.
+
+    Each column is stored as one UTF-8 string. Columns with few distinct values, such
+    as author or AvailableInLibrary, are stored as a table of the distinct strings and
+    an array of indexes into it.
+
+    Args:
+        filepath (str): Path of the snapshot file.
+        signature (Tuple[int, int, int]): Signature of the CSV file the rows came from.
+        fieldnames (List[str]): The CSV file's field names.
+        rows (List[Dict[str, str]]): The parsed rows.
+
+    Returns:
+        bool: True if the snapshot was written, False if a value cannot be stored or
+        the file cannot be written.
+    """
+    parts = [_HEADER.pack(_MAGIC, _BYTE_ORDER, *signature, len(rows), len(fieldnames))]
+    for name in fieldnames:
+        values = [row.get(name) for row in rows]
+        if None in values:
+            # Short rows have no value to store for some fields
+            return False
+        table = list(dict.fromkeys(values))
+        if len(table) * 2 <= len(values):
+            positions = {value: position for position, value in enumerate(table)}
+            encoding, strings = _TABLE, table
+            indexes = array("I", [positions[value] for value in values]).tobytes()
+        else:
+            encoding, strings, indexes = _PLAIN, values, b""
+        blob = _SEPARATOR.join(strings)
+        if blob.count(_SEPARATOR) != max(len(strings) - 1, 0):
+            return False
+        blob = blob.encode("utf-8")
+        encoded_name = name.encode("utf-8")
+        parts += [_COLUMN.pack(len(encoded_name), encoding, len(blob), len(indexes)), encoded_name, blob, indexes]
+    temporary = f"{filepath}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as file:
+            file.write(b"".join(parts))
+        os.replace(temporary, filepath)
+    except OSError:
+        # The snapshot only spares the next process a parse
+        return False
+    return True
+
+def read_snapshot(filepath: str, signature: Tuple[int, int, int]) -> Optional[Tuple[List[str], List[List[str]]]]:
+    """
+    Load a snapshot, if it was made from the CSV file as it is now.
+
+    Args:
+        filepath (str): Path of the snapshot file.
+        signature (Tuple[int, int, int]): Current signature of the CSV file.
+
+    Returns:
+        Optional[Tuple[List[str], List[List[str]]]]: The field names and one list of
+        values per field, or None if there is no snapshot of this version of the file.
+    """
+    try:
+        with open(filepath, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    if len(data) < _HEADER.size:
+        return None
+    magic, byte_order, mtime_ns, size, inode, count, columns = _HEADER.unpack_from(data)
+    if magic != _MAGIC or byte_order != _BYTE_ORDER or (mtime_ns, size, inode) != tuple(signature):
+        return None
+    view = memoryview(data)
+    position = _HEADER.size
+    fieldnames, values = [], []
+    for _ in range(columns):
+        name_length, encoding, blob_length, indexes_length = _COLUMN.unpack_from(data, position)
+        position += _COLUMN.size
+        fieldnames.append(bytes(view[position:position + name_length]).decode("utf-8"))
+        position += name_length
+        strings = str(view[position:position + blob_length], "utf-8").split(_SEPARATOR) if count else []
+        position += blob_length
+        if encoding == _TABLE:
+            indexes = array("I")
+            indexes.frombytes(view[position:position + indexes_length])
+            strings = [strings[index] for index in indexes]
+        position += indexes_length
+        values.append(strings)
+    return fieldnames, values
@@ -0,0 +1,38 @@
+import os
+
+from .inventory import count_copies
+from .snapshot import read_snapshot, write_snapshot
+from .storage import Storage, parse_cache
+
+ROWS = [{"title": f"Title {index}", "author": "Author", "isbn": str(index), "AvailableInLibrary": "Yes"}
+        for index in range(10)]
+FIELDNAMES = ["title", "author", "isbn", "AvailableInLibrary"]
+
+def test_snapshot_round_trip(tmp_path):
+    filepath = str(tmp_path / "books.csv.snapshot")
+    assert write_snapshot(filepath, (1, 2, 3), FIELDNAMES, ROWS)
+    fieldnames, columns = read_snapshot(filepath, (1, 2, 3))
+    assert fieldnames == FIELDNAMES
+    assert [dict(zip(fieldnames, values)) for values in zip(*columns)] == ROWS
+    assert read_snapshot(filepath, (1, 2, 4)) is None
+    assert write_snapshot(filepath, (1, 2, 3), FIELDNAMES, [])
+    assert read_snapshot(filepath, (1, 2, 3)) == (FIELDNAMES, [[], [], [], []])
+
+def test_snapshot_refuses_unstorable_values(tmp_path):
+    filepath = str(tmp_path / "books.csv.snapshot")
+    assert not write_snapshot(filepath, (1, 2, 3), FIELDNAMES, [dict(ROWS[0], title="a\x00b")])
+    assert not write_snapshot(filepath, (1, 2, 3), FIELDNAMES, [{"title": "T"}])
+    assert not os.path.exists(filepath)
+
+def test_storage_loads_from_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(Storage, "SNAPSHOT_MIN_ROWS", 5)
+    storage = Storage(database_folder=str(tmp_path))
+    storage.append_records(storage.books_filepath, ROWS, FIELDNAMES)
+    parse_cache.clear()
+    rows = storage.load_data(storage.books_filepath)
+    assert os.path.exists(storage.books_filepath + ".snapshot")
+    parse_cache.clear()
+    # Books written before copies were counted are loaded as one copy each
+    assert storage.load_data(storage.books_filepath) == rows == [count_copies(dict(row)) for row in ROWS]
+    storage.append_records(storage.books_filepath, [dict(ROWS[0], isbn="new")], FIELDNAMES)
+    assert len(storage.load_data(storage.books_filepath)) == 11
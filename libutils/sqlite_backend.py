@@ -0,0 +1,382 @@
+"""Module for storing library data in a SQLite database."""
+
+import sqlite3
+import threading
+from typing import Iterator, List, Dict, Optional, Tuple
+from .holds import HoldQueues
+from .inventory import count_copies, lend_copies
+
+class SQLiteBackend:
+    """A storage backend that keeps books and users in indexed SQLite tables."""
+
+    # Columns of each table, in the same order as the CSV files
+    TABLES = {
+        "books": ["title", "author", "isbn", "AvailableInLibrary", "timestamp", "copies", "available", "lent"],
+        "users": ["Name", "UserID", "BookInHand", "timestamp"],
+        "loans": ["UserID", "isbn", "timestamp", "due", "copy"],
+        "holds": ["UserID", "isbn", "timestamp", "status"],
+    }
+    # Primary key of each table; loans are unique by isbn and UserID, and holds are
+    # kept in queue order by rowid
+    KEYS = {"books": "isbn", "users": "UserID"}
+
+    def __init__(self, filepath: str) -> None:
+        """
+        Initialize the SQLiteBackend.
+
+        Args:
+            filepath (str): Path to the SQLite database file.
+        """
+        self.filepath = filepath
+        self._connection = None
+        self._lock = threading.RLock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Open the database on first use and create the tables if needed."""
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.filepath, check_same_thread=False, isolation_level=None)
+            with self._transaction(self._connection):
+                for table in self.TABLES:
+                    self._create_table(self._connection, table)
+                self._connection.execute("CREATE UNIQUE INDEX IF NOT EXISTS loans_isbn_user ON loans (isbn, UserID)")
+                self._connection.execute("CREATE INDEX IF NOT EXISTS holds_isbn ON holds (isbn)")
+        return self._connection
+
+    def _create_table(self, connection: sqlite3.Connection, table: str) -> None:
+        """
+        Create a table, or bring one made by an older release up to date.
+
+        Missing columns are added; books from before copies were counted become a
+        single copy each, and the loans table loses its primary key on isbn so that
+        copies of a book can be lent to several users.
+        """
+        columns, key = self.TABLES[table], self.KEYS.get(table)
+        column_defs = ", ".join(f"{column} TEXT PRIMARY KEY" if column == key else f"{column} TEXT" for column in columns)
+        existing = {row[1]: row[5] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if not existing:
+            connection.execute(f"CREATE TABLE {table} ({column_defs})")
+            return
+        for column in columns:
+            if column not in existing:
+                connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
+        if table == "books" and "copies" not in existing:
+            connection.execute(
+                "UPDATE books SET copies = '1', lent = CASE AvailableInLibrary WHEN 'No' THEN '1' ELSE '' END, "
+                "available = CASE AvailableInLibrary WHEN 'No' THEN '0' ELSE '1' END"
+            )
+        if table == "loans" and existing.get("isbn"):
+            names = ", ".join(columns)
+            connection.execute("ALTER TABLE loans RENAME TO loans_old")
+            connection.execute(f"CREATE TABLE loans ({column_defs})")
+            connection.execute(f"INSERT INTO loans ({names}) SELECT {names} FROM loans_old ORDER BY rowid")
+            connection.execute("DROP TABLE loans_old")
+
+    def data_version(self) -> int:
+        """Return a number that changes whenever another connection commits to the database."""
+        with self._lock:
+            return self._connect().execute("PRAGMA data_version").fetchone()[0]
+
+    def has_rows(self, table: str) -> bool:
+        """
+        Check whether a table contains any rows.
+
+        Args:
+            table (str): Name of the table.
+
+        Returns:
+            bool: True if the table is not empty, False otherwise.
+        """
+        with self._lock:
+            return self._connect().execute(f"SELECT 1 FROM {table} LIMIT 1").fetchone() is not None
+
+    def load_table(self, table: str) -> List[Dict[str, str]]:
+        """
+        Load every row of a table.
+
+        Args:
+            table (str): Name of the table.
+
+        Returns:
+            List[Dict[str, str]]: The rows in insertion order.
+        """
+        columns = self.TABLES[table]
+        with self._lock:
+            rows = self._connect().execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid").fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def iter_table(self, table: str, after_rowid: int = 0, batch_size: int = 500) -> Iterator[Tuple[Dict[str, str], int]]:
+        """
+        Stream the rows of a table in rowid order, batch_size rows per query.
+
+        Args:
+            table (str): Name of the table.
+            after_rowid (int, optional): Only rows after this rowid are returned. Defaults to 0.
+            batch_size (int, optional): Number of rows fetched per query. Defaults to 500.
+
+        Yields:
+            Tuple[Dict[str, str], int]: A row and its rowid.
+        """
+        columns = self.TABLES[table]
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    f"SELECT rowid, {', '.join(columns)} FROM {table} WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (after_rowid, batch_size),
+                ).fetchall()
+            for row in rows:
+                after_rowid = row[0]
+                yield dict(zip(columns, row[1:])), after_rowid
+            if len(rows) < batch_size:
+                return
+
+    def find(self, table: str, key: str) -> Optional[Dict[str, str]]:
+        """
+        Look up one row by primary key.
+
+        Args:
+            table (str): Name of the table.
+            key (str): Value of the table's primary key.
+
+        Returns:
+            Optional[Dict[str, str]]: The row, or None if the key does not exist.
+        """
+        columns = self.TABLES[table]
+        with self._lock:
+            row = self._connect().execute(
+                f"SELECT {', '.join(columns)} FROM {table} WHERE {self.KEYS[table]} = ?", (key,)
+            ).fetchone()
+        return dict(zip(columns, row)) if row else None
+
+    def insert(self, table: str, records: List[Dict[str, str]]) -> int:
+        """
+        Insert records whose primary key is not already present.
+
+        Args:
+            table (str): Name of the table.
+            records (List[Dict[str, str]]): Records to insert.
+
+        Returns:
+            int: Number of records inserted.
+        """
+        columns = self.TABLES[table]
+        placeholders = ", ".join("?" for _ in columns)
+        if table == "books":
+            records = [count_copies(dict(record)) for record in records]
+        with self._lock:
+            connection = self._connect()
+            before = connection.total_changes
+            with self._transaction(connection):
+                connection.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    [tuple(record.get(column) for column in columns) for record in records],
+                )
+            return connection.total_changes - before
+
+    def replace_all(self, table: str, records: List[Dict[str, str]]) -> None:
+        """
+        Replace the contents of a table.
+
+        Args:
+            table (str): Name of the table.
+            records (List[Dict[str, str]]): The new contents.
+        """
+        columns = self.TABLES[table]
+        placeholders = ", ".join("?" for _ in columns)
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                connection.execute(f"DELETE FROM {table}")
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({placeholders})",
+                    [tuple(record.get(column) for column in columns) for record in records],
+                )
+
+    def record_checkout(self, user_id: str, isbn: str, timestamp: Optional[str] = None, due: Optional[str] = None,
+                        copy: Optional[int] = None) -> None:
+        """
+        Mark a copy of a book as lent and add it to the user's books in one transaction.
+
+        Args:
+            user_id (str): The UserID of the user.
+            isbn (str): The ISBN of the book.
+            timestamp (Optional[str], optional): When the book was checked out.
+            due (Optional[str], optional): When the book is due back.
+            copy (Optional[int], optional): ID of the copy lent. Defaults to copy 1.
+
+        Raises:
+            ValueError: If the copy is already lent or the user does not exist.
+        """
+        self.record_checkouts([(user_id, isbn, copy)], timestamp, due)
+
+    def record_checkouts(self, checkouts: List[Tuple[str, str, Optional[int]]], timestamp: Optional[str] = None,
+                         due: Optional[str] = None) -> None:
+        """
+        Record several checkouts in one transaction; if any of them fails none is applied.
+
+        Args:
+            checkouts (List[Tuple[str, str, Optional[int]]]): (UserID, ISBN, copy ID) triples.
+            timestamp (Optional[str], optional): When the books were checked out.
+            due (Optional[str], optional): When the books are due back.
+
+        Raises:
+            ValueError: If a copy is already lent or a user does not exist.
+        """
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                for user_id, isbn, copy in checkouts:
+                    copy = copy or 1
+                    book = self._book_copies(connection, isbn)
+                    if book is None or str(copy) in book["lent"].split() or copy > int(book["copies"]):
+                        raise ValueError("This Book already checkedout.")
+                    self._update_copies(connection, lend_copies(book, {copy: True}))
+                    row = connection.execute("SELECT BookInHand FROM users WHERE UserID = ?", (user_id,)).fetchone()
+                    if row is None:
+                        raise ValueError("Enter valid userID or ISBN")
+                    in_hand = f"{row[0]}, {isbn}" if row[0] else isbn
+                    connection.execute("UPDATE users SET BookInHand = ? WHERE UserID = ?", (in_hand, user_id))
+                    connection.execute("INSERT OR REPLACE INTO loans (UserID, isbn, timestamp, due, copy) VALUES (?, ?, ?, ?, ?)",
+                                       (user_id, isbn, timestamp, due, str(copy)))
+                    # A book set aside for the user is theirs now
+                    connection.execute("DELETE FROM holds WHERE isbn = ? AND UserID = ? AND status = 'ready'",
+                                       (isbn, user_id))
+
+    def record_return(self, user_id: str, isbn: str, copy: Optional[int] = None) -> None:
+        """
+        Put a copy of a book back and take it from the user's books in one transaction.
+
+        Args:
+            user_id (str): The UserID of the user returning the book.
+            isbn (str): The ISBN of the book.
+            copy (Optional[int], optional): ID of the copy returned. Defaults to copy 1.
+
+        Raises:
+            ValueError: If the user does not hold the book.
+        """
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                in_hand = self._books_in_hand(connection, user_id, isbn)
+                in_hand.remove(isbn)
+                connection.execute("UPDATE users SET BookInHand = ? WHERE UserID = ?", (", ".join(in_hand), user_id))
+                book = self._book_copies(connection, isbn)
+                if book is not None:
+                    self._update_copies(connection, lend_copies(book, {copy or 1: False}))
+                connection.execute("DELETE FROM loans WHERE isbn = ? AND UserID = ?", (isbn, user_id))
+
+    def add_copies(self, isbn: str, copies: int) -> None:
+        """
+        Give a book copies numbered up to a given ID, on the shelf.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copies (int): ID of the last copy.
+        """
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                book = self._book_copies(connection, isbn)
+                if book is not None:
+                    self._update_copies(connection, lend_copies(book, {}, copies))
+
+    @staticmethod
+    def _book_copies(connection: sqlite3.Connection, isbn: str) -> Optional[Dict[str, str]]:
+        """Return the copy fields of a book, or None if there is no such book."""
+        row = connection.execute(
+            "SELECT isbn, AvailableInLibrary, copies, lent FROM books WHERE isbn = ?", (isbn,)
+        ).fetchone()
+        return count_copies(dict(zip(("isbn", "AvailableInLibrary", "copies", "lent"), row))) if row else None
+
+    @staticmethod
+    def _update_copies(connection: sqlite3.Connection, book: Dict[str, str]) -> None:
+        """Write the copy fields of a book."""
+        connection.execute(
+            "UPDATE books SET AvailableInLibrary = ?, copies = ?, available = ?, lent = ? WHERE isbn = ?",
+            (book["AvailableInLibrary"], book["copies"], book["available"], book["lent"], book["isbn"]),
+        )
+
+    def record_renewal(self, user_id: str, isbn: str, due: str) -> None:
+        """
+        Change the due date of a loan.
+
+        Args:
+            user_id (str): The UserID of the user holding the book.
+            isbn (str): The ISBN of the book.
+            due (str): The new due date.
+
+        Raises:
+            ValueError: If the user does not hold the book.
+        """
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                self._books_in_hand(connection, user_id, isbn)
+                # Loans from before due dates were kept have no row yet
+                connection.execute("INSERT OR IGNORE INTO loans (UserID, isbn) VALUES (?, ?)", (user_id, isbn))
+                connection.execute("UPDATE loans SET due = ? WHERE isbn = ? AND UserID = ?", (due, isbn, user_id))
+
+    def apply_hold_events(self, entries: List[Dict[str, str]]) -> None:
+        """
+        Apply changes to the hold queues in one transaction.
+
+        Only the queues of the books concerned are read and rewritten.
+
+        Args:
+            entries (List[Dict[str, str]]): Loan journal entries, as applied by HoldQueues.apply.
+        """
+        isbns = list(dict.fromkeys(entry["isbn"] for entry in entries))
+        columns = self.TABLES["holds"]
+        with self._lock:
+            connection = self._connect()
+            with self._transaction(connection):
+                rows = []
+                for isbn in isbns:
+                    rows += [dict(zip(columns, row)) for row in connection.execute(
+                        f"SELECT {', '.join(columns)} FROM holds WHERE isbn = ? ORDER BY rowid", (isbn,))]
+                queues = HoldQueues.from_rows(rows)
+                for entry in entries:
+                    queues.apply(entry)
+                connection.executemany("DELETE FROM holds WHERE isbn = ?", [(isbn,) for isbn in isbns])
+                connection.executemany(
+                    f"INSERT INTO holds ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                    [tuple(row[column] for column in columns) for row in queues.rows(isbns)],
+                )
+
+    @staticmethod
+    def _books_in_hand(connection: sqlite3.Connection, user_id: str, isbn: str) -> List[str]:
+        """
+        Return the ISBNs a user holds, checking that they include a given book.
+
+        Raises:
+            ValueError: If the user does not hold the book.
+        """
+        row = connection.execute("SELECT BookInHand FROM users WHERE UserID = ?", (user_id,)).fetchone()
+        in_hand = [value.strip() for value in (row[0] or "").split(",") if value.strip()] if row else []
+        if isbn not in in_hand:
+            raise ValueError("This Book is not checked out by this user.")
+        return in_hand
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def _transaction(self, connection: sqlite3.Connection):
+        """Return a context manager that wraps statements in BEGIN IMMEDIATE/COMMIT."""
+        return _Transaction(connection)
+
+class _Transaction:
+    """Context manager running a block of statements as one transaction."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+
+    def __enter__(self) -> sqlite3.Connection:
+        self._connection.execute("BEGIN IMMEDIATE")
+        return self._connection
+
+    def __exit__(self, exc_type, exc, traceback) -> bool:
+        self._connection.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
@@ -1,27 +1,272 @@
 """Module for managing storage of data in the library."""
 
 import csv
-from typing import List, Dict
+import io
+from collections import OrderedDict
+from typing import Callable, Iterable, Iterator, List, Dict, NamedTuple, Optional, Tuple
 from datetime import datetime
 import os
+import threading
+from .commit import fsync_paths, group_commit_for
+from .holds import HoldQueues
+from .inventory import count_copies, lend_copies
+from .locks import LockManager, lock_manager_for
+from .metrics import metrics
+from .offsets import offset_index_for
+from .shards import ShardLayout, parse_shards, set_shard_layout, shard_layout_for
+from .snapshot import read_snapshot, write_snapshot
+
+class JournalChanges(NamedTuple):
+    """The loan journal summed up, see Storage._journal_changes."""
+
+    # Whether each copy the journal mentions is on loan, by ISBN and copy ID
+    lent: Dict[str, Dict[int, bool]]
+    # Highest copy ID the journal adds, by ISBN
+    copies: Dict[str, int]
+    # Whether each (ISBN, UserID) pair the journal mentions is on loan
+    loans: Dict[Tuple[str, str], bool]
+
+class ParseCache:
+    """
+    Shared cache of parsed CSV files keyed by file path.
+
+    An entry is only reused while the file's mtime, size and inode are unchanged, so
+    a cache hit never touches the file contents. Entries are evicted least recently
+    used first once the total size of cached files exceeds the byte budget.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024) -> None:
+        """
+        Initialize the ParseCache.
+
+        Args:
+            max_bytes (int, optional): Byte budget, measured as the on-disk size of cached files. Defaults to 64 MiB.
+        """
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str, signature: Tuple[int, int, int]) -> Optional[List[Dict[str, str]]]:
+        """
+        Return the cached rows for a file if its signature still matches.
+
+        Args:
+            filepath (str): Absolute path of the file.
+            signature (Tuple[int, int, int]): The file's (mtime_ns, size, inode).
+
+        Returns:
+            Optional[List[Dict[str, str]]]: The cached rows, or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(filepath)
+            if entry is None or entry[0] != signature:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(filepath)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, filepath: str, signature: Tuple[int, int, int], rows: List[Dict[str, str]]) -> None:
+        """
+        Store the parsed rows of a file, evicting old entries to stay within budget.
+
+        Args:
+            filepath (str): Absolute path of the file.
+            signature (Tuple[int, int, int]): The file's (mtime_ns, size, inode).
+            rows (List[Dict[str, str]]): The parsed rows.
+        """
+        size = signature[1]
+        with self._lock:
+            self._discard(filepath)
+            if size > self.max_bytes:
+                return
+            while self._entries and self._total_bytes + size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+            self._entries[filepath] = (signature, rows)
+            self._total_bytes += size
+
+    def invalidate(self, filepath: str) -> None:
+        """
+        Drop the cached rows for a file.
+
+        Args:
+            filepath (str): Absolute path of the file.
+        """
+        with self._lock:
+            self._discard(filepath)
+
+    def clear(self) -> None:
+        """Drop every cached entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Return the cache counters.
+
+        Returns:
+            Dict[str, int]: Hits, misses, number of cached files and cached bytes.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes
+            }
+
+    def _discard(self, filepath: str) -> None:
+        """Remove an entry without taking the lock."""
+        entry = self._entries.pop(filepath, None)
+        if entry is not None:
+            self._total_bytes -= entry[0][1]
+
+# Cache shared by every Storage instance
+parse_cache = ParseCache()
+
+class JournalChangesCache:
+    """
+    Shared cache of loan journal sums keyed by journal path, see Storage._journal_changes.
+
+    Each entry holds the sum and the read_journal cursor it was read up to, so the next
+    sum only reads the entries appended since.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the JournalChangesCache."""
+        self._entries: Dict[str, Tuple[Tuple[int, int], JournalChanges]] = {}
+        # Bumped by invalidate, so sums read before it are not put back
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, filepath: str) -> Tuple[Optional[Tuple[int, int]], Optional[JournalChanges], int]:
+        """
+        Return the cached cursor and sum for a journal.
+
+        Args:
+            filepath (str): Absolute path of the journal.
+
+        Returns:
+            Tuple[Optional[Tuple[int, int]], Optional[JournalChanges], int]: The cursor and
+            the sum, (None, None) if nothing is cached, and the generation to put with.
+        """
+        with self._lock:
+            cursor, changes = self._entries.get(filepath, (None, None))
+            return cursor, changes, self._generations.get(filepath, 0)
+
+    def put(self, filepath: str, cursor: Optional[Tuple[int, int]], changes: JournalChanges,
+            generation: int) -> None:
+        """
+        Cache the sum of a journal read up to a cursor.
+
+        Args:
+            filepath (str): Absolute path of the journal.
+            cursor (Optional[Tuple[int, int]]): Cursor the sum was read up to; None drops the entry.
+            changes (JournalChanges): The sum.
+            generation (int): The generation get returned before the journal was read;
+                the sum is dropped if the journal was invalidated since.
+        """
+        with self._lock:
+            if generation != self._generations.get(filepath, 0):
+                return
+            if cursor is None:
+                self._entries.pop(filepath, None)
+            else:
+                self._entries[filepath] = (cursor, changes)
+
+    def invalidate(self, filepath: str) -> None:
+        """Drop the sum of a journal that was removed."""
+        with self._lock:
+            self._entries.pop(filepath, None)
+            self._generations[filepath] = self._generations.get(filepath, 0) + 1
+
+    def clear(self) -> None:
+        """Drop every cached sum."""
+        with self._lock:
+            self._entries.clear()
+
+# Journal sums shared by every Storage instance
+journal_changes_cache = JournalChangesCache()
 
 class Storage:
-    """A class to manage data storage for a library management system using CSV files."""
+    """
+    A class to manage data storage for a library management system.
 
-    def __init__(self, database_folder: str = "database") -> None:
+    Books and users are kept in CSV files by default. With backend="sqlite" they are
+    kept in indexed tables of database/library.db instead; the CSV paths are still used
+    to name the books and users datasets, and import_csv/export_csv move data between
+    the two formats.
+
+    The CSV files of books and users can also be split into shards with reshard. Each
+    record is then written to the shard owning its key, and the shards are parsed on a
+    pool of worker processes when loaded.
+
+    Appends to the CSV files and the loan journal go through the group_commit shared
+    by every Storage using the folder, which writes them in batches. Every read but
+    read_journal writes the buffered records first, so this process always reads its
+    own writes. Loan journal entries are written before the record_* call returns,
+    while the caller still holds the lock of the record, so other processes never
+    lend the same copy twice; only concurrent threads share their batch.
+    """
+
+    BACKENDS = ("csv", "sqlite")
+    # books.csv and users.csv with at least this many rows are also kept as binary
+    # snapshots, which load much faster than the CSV parses
+    SNAPSHOT_MIN_ROWS = 10000
+    # Fields of books.csv that checkouts and returns change, see count_copies
+    COPY_FIELDS = ["AvailableInLibrary", "copies", "available", "lent"]
+    # Sharded datasets smaller than this are parsed in this process, since starting
+    # the worker processes would cost more than it saves
+    PARALLEL_MIN_BYTES = 8 * 1024 * 1024
+    # Cursors of sharded datasets are the index of the shard times this plus a byte
+    # offset into the shard
+    SHARD_CURSOR_STRIDE = 1 << 40
+
+    def __init__(self, database_folder: str = "database", backend: str = "csv") -> None:
         """
         Initialize the Storage class.
 
         Args:
             database_folder (str, optional): The folder where database files will be stored. Defaults to "database".
+            backend (str, optional): Either "csv" or "sqlite". Defaults to "csv".
         """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown storage backend '{backend}'")
         self.database_folder = database_folder
+        self.backend = backend
         self.books_filepath = os.path.join(self.database_folder, "books.csv")
         self.users_filepath = os.path.join(self.database_folder, "users.csv")
+        self.journal_filepath = os.path.join(self.database_folder, "loans_journal.csv")
+        self.loans_filepath = os.path.join(self.database_folder, "loans.csv")
+        self.holds_filepath = os.path.join(self.database_folder, "holds.csv")
+        self.lock_filepath = os.path.join(self.database_folder, ".lock")
+
+        # The database folder is created on the first write, so merely constructing
+        # a Storage (or importing libutils) touches nothing on disk
+        self._folder_ready = False
+        # Bumped by every write of books or users through this Storage, see version()
+        self._writes = 0
+        # Most worker processes that parse the shards of a dataset at once
+        self.load_workers = os.cpu_count() or 1
+        self.group_commit = group_commit_for(self.database_folder)
+
+        self._sql = None
+        if backend == "sqlite":
+            from .sqlite_backend import SQLiteBackend
+            self._ensure_database_folder()
+            self._sql = SQLiteBackend(os.path.join(self.database_folder, "library.db"))
 
-        # Create the database folder if it doesn't exist
-        if not os.path.exists(self.database_folder):
-            os.makedirs(self.database_folder)
+    def _ensure_database_folder(self) -> None:
+        """Create the database folder if it doesn't exist."""
+        if not self._folder_ready:
+            os.makedirs(self.database_folder, exist_ok=True)
+            self._folder_ready = True
 
     def save_system_state(self, books: List[Dict[str, str]], users: List[Dict[str, str]]) -> None:
         """
@@ -49,69 +294,1254 @@ class Storage:
             unique_key (str): Unique key to check for duplicates.
             current_time (str): Current timestamp.
         """
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        existing_data = self.load_data(filepath)
-        if unique_key:
+        self._writes += 1
+        with metrics.span("storage.save_data") as span:
+            current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            table = self._table_for(filepath)
+            self._ensure_database_folder()
+            # SQLite enforces the unique key itself, so there is nothing to load
+            existing_data = self.load_data(filepath) if table is None else []
+            if unique_key:
             
-            existing_keys = set(record[unique_key] for record in existing_data)
-            new_records = []
+                existing_keys = set(record[unique_key] for record in existing_data)
+                new_records = []
 
-            for record in data:
-                if record[unique_key] not in existing_keys:
-                    # record = self._fill_empty_values(record,custom_value)
-                    if unique_key == "UserID":
-                        record['BookInHand'] = None
-                    else:
-                        record["AvailableInLibrary"] = "Yes"
+                for record in data:
+                    if record[unique_key] not in existing_keys:
+                        # record = self._fill_empty_values(record,custom_value)
+                        if unique_key == "UserID":
+                            record['BookInHand'] = None
+                        else:
+                            record["AvailableInLibrary"] = "Yes"
 
+                        record['timestamp'] = current_time
+                        new_records.append(record)
+                if new_records and table is not None:
+                    if not self._sql.insert(table, new_records):
+                        return None
+                    span.add(rows=len(new_records))
+                    print(f"\nUpdated {table} table Successfully ✅\n")
+                    return True
+                if new_records:
+                    self._append(filepath, new_records, fieldnames)
+                    span.add(rows=len(new_records))
+                    print(f"\nUpdated {filepath} Successfully ✅\n")
+                    return True
+            
+
+            elif table is not None:
+                for record in data:
                     record['timestamp'] = current_time
-                    new_records.append(record)
-            if new_records:
-                with open(filepath, mode, newline='') as file:
-                    writer = csv.DictWriter(file, fieldnames=fieldnames)
-                    if os.path.getsize(filepath) == 0:
-                        writer.writeheader()
-                    writer.writerows(new_records)
-                print(f"\nUpdated {filepath} Successfully ✅\n")
+                self._sql.replace_all(table, data)
+                span.add(rows=len(data))
                 return True
-            
 
-        else:
-            fieldnames = list(data[0].keys())
+            elif self._shards_of(filepath) is not None:
+                for record in data:
+                    record['timestamp'] = current_time
+                self._rewrite_shards(filepath, data, list(dict.fromkeys(key for record in data for key in record)))
+                span.add(rows=len(data))
+                return True
 
-            with open(filepath, mode, newline='') as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                writer.writeheader()
-                writer.writerows(data)
-            with open(filepath, mode, newline='') as file:
-                writer = csv.DictWriter(file, fieldnames=fieldnames)
-                if os.path.getsize(filepath) == 0:
+            else:
+                fieldnames = list(data[0].keys())
+                if mode != 'w':
+                    self._append(filepath, data, fieldnames)
+                    span.add(rows=len(data))
+                    return True
+                # One write, through a temporary file, with every record stamped
+                for record in data:
+                    record['timestamp'] = current_time
+                self._replace_file(filepath, data, list(dict.fromkeys([*fieldnames, 'timestamp'])))
+                span.add(rows=len(data), bytes_written=os.path.getsize(filepath))
+                return True
+
+    def append_records(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str]) -> int:
+        """
+        Append records that are already known to be new in a single write.
+
+        Unlike save_data this does not reload the file to look for duplicates, so the
+        caller is responsible for deduplicating against its own index.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            records (List[Dict[str, str]]): Records to append.
+            fieldnames (List[str]): Field names for the CSV file.
+
+        Returns:
+            int: Number of records written.
+        """
+        if not records:
+            return 0
+        self._writes += 1
+        with metrics.span("storage.append_records") as span:
+            table = self._table_for(filepath)
+            if table is not None:
+                written = self._sql.insert(table, records)
+                span.add(rows=written)
+                return written
+            self._append(filepath, records, fieldnames)
+            span.add(rows=len(records))
+            return len(records)
+
+    def _append(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str]) -> None:
+        """
+        Append records to a CSV file through the group commit, see _write_records.
+
+        Args:
+            filepath (str): Path to the CSV file, or naming the dataset if it is sharded.
+            records (List[Dict[str, str]]): Records to append.
+            fieldnames (List[str]): Field names for the CSV file.
+        """
+        self.group_commit.add(filepath, records, fieldnames,
+                              lambda rows: self._write_records(filepath, rows, fieldnames))
+
+    def _write_records(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str]) -> Dict[str, int]:
+        """
+        Append records to a CSV file, or to the shards owning them, with one write per file.
+
+        Args:
+            filepath (str): Path to the CSV file, or naming the dataset if it is sharded.
+            records (List[Dict[str, str]]): Records to append.
+            fieldnames (List[str]): Field names for the CSV files.
+
+        Returns:
+            Dict[str, int]: Number of bytes written to each file.
+        """
+        self._ensure_database_folder()
+        if self._shards_of(filepath) is not None:
+            owned = self._group_by_shard(filepath, records)
+        else:
+            if self._same_file(filepath, self.books_filepath):
+                # Rows with copy counts cannot go under the header of an older books.csv
+                self.migrate_copies()
+            owned = {filepath: records}
+        written = {}
+        for path, rows in owned.items():
+            with open(path, 'a', newline='') as file:
+                buffer = io.StringIO(newline='')
+                writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction='ignore')
+                start = file.tell()
+                if start == 0:
                     writer.writeheader()
-                    for record in data:
-                        record['timestamp'] = current_time
-                        writer.writerow(record)
-            return True
+                writer.writerows(rows)
+                file.write(buffer.getvalue())
+                written[path] = file.tell() - start
+            parse_cache.invalidate(os.path.abspath(path))
+        return written
+
+    def _rewrite_shards(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str]) -> None:
+        """
+        Replace every shard of a sharded dataset with the records it owns.
+
+        Args:
+            filepath (str): Path naming the dataset.
+            records (List[Dict[str, str]]): Every record of the dataset.
+            fieldnames (List[str]): Field names for the CSV files.
+        """
+        owned = self._group_by_shard(filepath, records)
+        for shard in self._shards_of(filepath):
+            if shard in owned or os.path.exists(shard):
+                self._replace_file(shard, owned.get(shard, []), fieldnames)
+
+    def _group_by_shard(self, filepath: str, records: List[Dict[str, str]],
+                        layout: Optional[ShardLayout] = None) -> Dict[str, List[Dict[str, str]]]:
+        """Return the records of a dataset by the path of the shard owning each, in the current layout by default."""
+        layout = layout or self.shard_layout
+        key = self._key_of(filepath)
+        shards = layout.paths(self.books_filepath if key == "isbn" else self.users_filepath)
+        owned: Dict[str, List[Dict[str, str]]] = {}
+        for record in records:
+            owned.setdefault(shards[layout.shard_of(key, record[key])], []).append(record)
+        return owned
+
+    def _replace_file(self, filepath: str, records: List[Dict[str, str]], fieldnames: List[str]) -> None:
+        """
+        Replace a CSV file through a temporary file, so readers see either version whole.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            records (List[Dict[str, str]]): The records; fields not in fieldnames are left out.
+            fieldnames (List[str]): Field names for the CSV file.
+        """
+        self._ensure_database_folder()
+        temporary = f"{filepath}.{os.getpid()}.tmp"
+        with open(temporary, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(records)
+        if self.group_commit.fsync:
+            fsync_paths([temporary])
+        os.replace(temporary, filepath)
+        if self.group_commit.fsync:
+            fsync_paths([os.path.dirname(os.path.abspath(filepath))])
+        parse_cache.invalidate(os.path.abspath(filepath))
 
     def load_data(self, filepath: str) -> List[Dict[str, str]]:
         """
         Load data from a CSV file.
 
+        Checkouts recorded in the loan journal since the last compaction are replayed
+        on top of books.csv and users.csv, so callers always see the current state.
+
         Args:
             filepath (str): Path to the CSV file.
 
         Returns:
             List[Dict[str, str]]: The loaded data.
         """
+        self.group_commit.flush()
+        with metrics.span("storage.load_data") as span:
+            table = self._table_for(filepath)
+            if table is not None:
+                data = self._sql.load_table(table)
+                span.add(rows=len(data))
+                return data
+            data = self._read_csv(filepath)
+            replay = self._journal_replayer(filepath) if data else None
+            if replay is not None:
+                for record in data:
+                    replay(record)
+            return data
+
+    def load_columns(self, filepath: str, fields: List[str]) -> Dict[str, List[str]]:
+        """
+        Load whole columns of a dataset, for scans of the full catalog.
+
+        No record is built, and on a cold start the columns are read straight from
+        the binary snapshot, so this is much cheaper than load_data on large catalogs.
+        Checkouts in the loan journal are replayed and copies counted as load_data does.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            fields (List[str]): Names of the fields to load.
+
+        Returns:
+            Dict[str, List[str]]: One list of values per field, in file order; fields
+            the dataset does not have are left out.
+        """
+        self.group_commit.flush()
+        with metrics.span("storage.load_columns") as span:
+            is_books = self._same_file(filepath, self.books_filepath)
+            key, replayed = ("isbn", self.COPY_FIELDS) if is_books else ("UserID", ["BookInHand"])
+            wanted = list(dict.fromkeys([*fields, key, *replayed]))
+            table = self._table_for(filepath)
+            if table is not None:
+                rows = self._sql.load_table(table)
+                columns = {name: [row[name] for row in rows] for name in wanted if name in self._sql.TABLES[table]}
+            else:
+                columns = self._read_columns(filepath, wanted)
+                if is_books and key in columns:
+                    self._count_copies_in_columns(columns)
+                replay = self._journal_replayer(filepath)
+                if replay is not None and key in columns and all(name in columns for name in replayed):
+                    changes = self._journal_changes()
+                    affected = set(changes.lent) | set(changes.copies) if is_books else {
+                        user_id for _, user_id in changes.loans}
+                    for position, value in enumerate(columns[key]):
+                        if value in affected:
+                            record = {key: value, **{name: columns[name][position] for name in replayed}}
+                            replay(record)
+                            for name in replayed:
+                                columns[name][position] = record[name]
+            span.add(rows=len(columns.get(key, ())))
+            return {name: columns[name] for name in fields if name in columns}
+
+    @staticmethod
+    def _count_copies_in_columns(columns: Dict[str, List[str]]) -> None:
+        """Fill in the copies, available and lent columns of books, see count_copies."""
+        count = len(columns["isbn"])
+        for name in ("copies", "available", "lent"):
+            columns.setdefault(name, [""] * count)
+        if "" not in columns["copies"] and "" not in columns["available"]:
+            return
+        availability = columns.get("AvailableInLibrary") or [""] * count
+        for position in range(count):
+            if not columns["copies"][position] or not columns["available"][position]:
+                record = count_copies({"AvailableInLibrary": availability[position], "copies": columns["copies"][position],
+                                       "lent": columns["lent"][position]})
+                for name in ("copies", "available", "lent"):
+                    columns[name][position] = record[name]
+
+    def _read_columns(self, filepath: str, fields: List[str]) -> Dict[str, List[str]]:
+        """
+        Read columns of a CSV file from the parse cache, its snapshot or the file itself.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            fields (List[str]): Names of the fields to read.
+
+        Returns:
+            Dict[str, List[str]]: Fresh lists of values for the fields the file has.
+        """
+        shards = self._shards_of(filepath)
+        if shards is not None:
+            parts = [rows for rows in self._load_shards(shards) if rows]
+            present = parts[0][0].keys() if parts else ()
+            return {name: [row[name] for rows in parts for row in rows] for name in fields if name in present}
+        signature = self.signature(filepath)
+        if signature is None:
+            return {}
+        rows = parse_cache.get(os.path.abspath(filepath), signature)
+        if rows is None and self._is_catalog(filepath):
+            snapshot = read_snapshot(f"{filepath}.snapshot", signature)
+            if snapshot is not None:
+                metrics.add("storage.load_columns", snapshot_loads=1)
+                return {name: values for name, values in zip(*snapshot) if name in fields}
+        if rows is None:
+            rows = self._read_csv(filepath)
+        present = rows[0].keys() if rows else ()
+        return {name: [row[name] for row in rows] for name in fields if name in present}
+
+    def iter_data(self, filepath: str, cursor: Optional[int] = None) -> Iterator[Tuple[Dict[str, str], int]]:
+        """
+        Stream the records of a dataset one at a time.
+
+        Only one record is held in memory at a time. Each record is yielded together
+        with a cursor (a byte offset into the CSV file, or a rowid for the SQLite
+        backend) that resumes the stream just after it. Sharded datasets are streamed
+        one shard after another, see SHARD_CURSOR_STRIDE.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            cursor (Optional[int], optional): Cursor returned with an earlier record. Defaults to the start.
+
+        Yields:
+            Tuple[Dict[str, str], int]: A record and the cursor following it.
+        """
+        self.group_commit.flush()
+        table = self._table_for(filepath)
+        if table is not None:
+            yield from self._sql.iter_table(table, cursor or 0)
+            return
+        replay = self._journal_replayer(filepath)
+        shards = self._shards_of(filepath)
+        if shards is None:
+            yield from self._iter_csv(filepath, cursor, replay)
+            return
+        first, offset = divmod(cursor or 0, self.SHARD_CURSOR_STRIDE)
+        for index in range(first, len(shards)):
+            for record, position in self._iter_csv(shards[index], offset if index == first else None, replay):
+                yield record, index * self.SHARD_CURSOR_STRIDE + position
+
+    def _iter_csv(self, filepath: str, cursor: Optional[int],
+                  replay: Optional[Callable[[Dict[str, str]], None]]) -> Iterator[Tuple[Dict[str, str], int]]:
+        """
+        Stream the records of one CSV file, see iter_data.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            cursor (Optional[int]): Byte offset to resume from, or None for the start.
+            replay (Optional[Callable[[Dict[str, str]], None]]): Applied to each record, see _journal_replayer.
+
+        Yields:
+            Tuple[Dict[str, str], int]: A record and the byte offset following it.
+        """
+        if not os.path.exists(filepath):
+            return
+        with open(filepath, 'rb') as file:
+            header = self._read_csv_row(file)
+            if not header:
+                return
+            if cursor:
+                file.seek(cursor)
+            while True:
+                values = self._read_csv_row(file)
+                if values is None:
+                    return
+                if not values:
+                    continue
+                record = dict(zip(header, values))
+                if replay is not None:
+                    replay(record)
+                yield record, file.tell()
+
+    @staticmethod
+    def _read_csv_row(file) -> Optional[List[str]]:
+        """
+        Read one CSV row from a binary file, following quoted fields across lines.
+
+        Args:
+            file: A file opened in binary mode.
+
+        Returns:
+            Optional[List[str]]: The row's values, or None at end of file.
+        """
+        text = b""
+        while True:
+            line = file.readline()
+            if not line:
+                if not text:
+                    return None
+                break
+            text += line
+            if text.count(b'"') % 2 == 0:
+                break
+        return next(csv.reader([text.decode('utf-8')]), [])
+
+    def _read_csv(self, filepath: str) -> List[Dict[str, str]]:
+        """
+        Read a CSV file through the shared parse cache.
+
+        Args:
+            filepath (str): Path to the CSV file.
+
+        Returns:
+            List[Dict[str, str]]: Copies of the rows stored in the file.
+        """
+        shards = self._shards_of(filepath)
+        if shards is not None:
+            return [dict(row) for rows in self._load_shards(shards) for row in rows]
         data = []
         if os.path.exists(filepath):
-            with open(filepath, 'r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    data.append(dict(row))
+            cache_key = os.path.abspath(filepath)
+            stat = os.stat(filepath)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            rows = parse_cache.get(cache_key, signature)
+            if rows is None:
+                rows = self._read_snapshot(filepath, signature)
+            if rows is None:
+                with open(filepath, 'r', newline='') as file:
+                    reader = csv.DictReader(file)
+                    rows = list(reader)
+                parse_cache.put(cache_key, signature, rows)
+                # Only cache misses read and parse anything
+                metrics.add("storage.load_data", rows=len(rows), bytes_read=stat.st_size)
+                if len(rows) >= self.SNAPSHOT_MIN_ROWS and self._is_catalog(filepath):
+                    write_snapshot(f"{filepath}.snapshot", signature, reader.fieldnames, rows)
+            # Callers modify the returned records, so hand out copies
+            data = [dict(row) for row in rows]
         # else:
         #     print("\n------------------------------------------------\n⚠️ No Users in the library, Please add users ⚠️\n------------------------------------------------")
         return data
     
+    def _load_shards(self, shards: List[str]) -> List[List[Dict[str, str]]]:
+        """
+        Read the shards of a dataset through the shared parse cache.
+
+        The shards that are not cached are parsed at the same time on up to
+        load_workers processes, see parse_shards, and then cached.
+
+        Args:
+            shards (List[str]): Paths of the shards.
+
+        Returns:
+            List[List[Dict[str, str]]]: The rows of each shard, shared with the cache.
+        """
+        parts, missing = [], []
+        for filepath in shards:
+            signature = self.signature(filepath)
+            rows = parse_cache.get(os.path.abspath(filepath), signature) if signature is not None else []
+            if rows is None:
+                missing.append((len(parts), filepath, signature))
+            parts.append(rows)
+        if missing:
+            size = sum(signature[1] for _, _, signature in missing)
+            workers = self.load_workers if size >= self.PARALLEL_MIN_BYTES else 1
+            parsed = parse_shards([(filepath, signature) for _, filepath, signature in missing],
+                                  self.SNAPSHOT_MIN_ROWS, workers)
+            for (position, filepath, signature), rows in zip(missing, parsed):
+                parse_cache.put(os.path.abspath(filepath), signature, rows)
+                parts[position] = rows
+            metrics.add("storage.load_data", rows=sum(len(parts[position]) for position, _, _ in missing),
+                        bytes_read=size, shards_parsed=len(missing))
+        return parts
+
+    def _read_snapshot(self, filepath: str, signature: Tuple[int, int, int]) -> Optional[List[Dict[str, str]]]:
+        """
+        Load a CSV file's rows from its binary snapshot and put them in the parse cache.
+
+        Args:
+            filepath (str): Path to the CSV file.
+            signature (Tuple[int, int, int]): The CSV file's current signature.
+
+        Returns:
+            Optional[List[Dict[str, str]]]: The rows, or None if there is no snapshot of
+            this version of the file.
+        """
+        if not self._is_catalog(filepath):
+            return None
+        snapshot = read_snapshot(f"{filepath}.snapshot", signature)
+        if snapshot is None:
+            return None
+        fieldnames, columns = snapshot
+        rows = [dict(zip(fieldnames, values)) for values in zip(*columns)]
+        parse_cache.put(os.path.abspath(filepath), signature, rows)
+        metrics.add("storage.load_data", rows=len(rows), snapshot_loads=1)
+        return rows
+
+    def _is_catalog(self, filepath: str) -> bool:
+        """Return whether a file is books.csv or users.csv, the files kept as snapshots."""
+        return self._same_file(filepath, self.books_filepath) or self._same_file(filepath, self.users_filepath)
+
+    def record_checkout(self, user_id: str, isbn: str, due: Optional[str] = None, copy: Optional[int] = None) -> None:
+        """
+        Append a checkout to the loan journal.
+
+        This is the only write a checkout performs; books.csv and users.csv are
+        updated later by compact_journal.
+
+        Args:
+            user_id (str): The UserID as stored in users.csv.
+            isbn (str): The ISBN of the book being checked out.
+            due (Optional[str], optional): When the book is due back.
+            copy (Optional[int], optional): ID of the copy lent. Defaults to copy 1.
+        """
+        self.record_checkouts([(user_id, isbn, copy)], due)
+
+    def record_checkouts(self, checkouts: List[Tuple[str, str, Optional[int]]], due: Optional[str] = None) -> None:
+        """
+        Append several checkouts to the loan journal in one write.
+
+        With the SQLite backend they are applied in one transaction instead.
+
+        Args:
+            checkouts (List[Tuple[str, str, Optional[int]]]): (UserID, ISBN, copy ID)
+                triples, UserIDs as stored in users.csv. A copy ID of None means copy 1.
+            due (Optional[str], optional): When the books are due back.
+        """
+        if not checkouts:
+            return
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with metrics.span("storage.record_checkouts") as span:
+            if self._sql is not None:
+                self._sql.record_checkouts(checkouts, timestamp, due)
+            else:
+                self._append_journal(
+                    {"op": "checkout", "UserID": user_id, "isbn": isbn, "timestamp": timestamp, "due": due,
+                     "copy": copy or 1}
+                    for user_id, isbn, copy in checkouts)
+            span.add(rows=len(checkouts))
+
+    def record_return(self, user_id: str, isbn: str, hold_events: List[Tuple[str, str, str]] = (),
+                      copy: Optional[int] = None) -> None:
+        """
+        Append the return of a book to the loan journal.
+
+        Args:
+            user_id (str): The UserID of the user returning the book, as stored in users.csv.
+            isbn (str): The ISBN of the book.
+            hold_events (List[Tuple[str, str, str]], optional): Hold events caused by the
+                return, such as setting the copy aside for the next in line, appended in
+                the same write. See record_hold_events.
+            copy (Optional[int], optional): ID of the copy returned. Defaults to copy 1.
+        """
+        with metrics.span("storage.record_return"):
+            if self._sql is not None:
+                self._sql.record_return(user_id, isbn, copy)
+                self.record_hold_events(hold_events)
+                return
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._append_journal([{"op": "return", "UserID": user_id, "isbn": isbn, "timestamp": timestamp, "due": None,
+                                   "copy": copy or 1},
+                                  *self._hold_entries(hold_events, timestamp)])
+
+    def record_copies(self, isbn: str, copies: List[int], hold_events: List[Tuple[str, str, str]] = ()) -> None:
+        """
+        Append new copies of a book to the loan journal.
+
+        Args:
+            isbn (str): The ISBN of the book.
+            copies (List[int]): IDs of the new copies, following the existing ones.
+            hold_events (List[Tuple[str, str, str]], optional): Hold events caused by the
+                new copies, appended in the same write. See record_hold_events.
+        """
+        if not copies:
+            return
+        with metrics.span("storage.record_copies") as span:
+            if self._sql is not None:
+                self._sql.add_copies(isbn, max(copies))
+                self.record_hold_events(hold_events)
+            else:
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                self._append_journal(
+                    [*({"op": "add_copy", "UserID": None, "isbn": isbn, "timestamp": timestamp, "due": None,
+                        "copy": copy} for copy in copies),
+                     *self._hold_entries(hold_events, timestamp)])
+            span.add(rows=len(copies))
+
+    def record_hold_events(self, events: List[Tuple[str, str, str]]) -> None:
+        """
+        Append changes to the hold queues to the loan journal in one write.
+
+        Args:
+            events (List[Tuple[str, str, str]]): (op, UserID, ISBN) triples, where op is
+                "hold", "cancel_hold" or "ready" as applied by HoldQueues.apply.
+        """
+        if not events:
+            return
+        with metrics.span("storage.record_hold_events") as span:
+            if self._sql is not None:
+                self._sql.apply_hold_events(self._hold_entries(events, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            else:
+                self._append_journal(self._hold_entries(events, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            span.add(rows=len(events))
+
+    @staticmethod
+    def _hold_entries(events: List[Tuple[str, str, str]], timestamp: str) -> List[Dict[str, str]]:
+        """Return hold events as loan journal entries."""
+        return [{"op": op, "UserID": user_id, "isbn": isbn, "timestamp": timestamp, "due": None}
+                for op, user_id, isbn in events]
+
+    def record_renewal(self, user_id: str, isbn: str, due: str) -> None:
+        """
+        Append the renewal of a loan to the loan journal.
+
+        Args:
+            user_id (str): The UserID of the user holding the book, as stored in users.csv.
+            isbn (str): The ISBN of the book.
+            due (str): The new due date.
+        """
+        with metrics.span("storage.record_renewal"):
+            if self._sql is not None:
+                self._sql.record_renewal(user_id, isbn, due)
+                return
+            self._append_journal([{"op": "renew", "UserID": user_id, "isbn": isbn,
+                                   "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "due": due}])
+
+    def _append_journal(self, entries: Iterable[Dict[str, str]]) -> None:
+        """
+        Append entries to the loan journal through the group commit, see _write_journal.
+
+        The entries are written before returning, whatever the batch size, since other
+        processes replay the journal once the caller releases the lock of the record.
+        Entries other threads add meanwhile are written in the same batch.
+
+        Args:
+            entries (Iterable[Dict[str, str]]): The entries.
+        """
+        self.group_commit.add(self.journal_filepath, list(entries), self._get_journal_fieldnames(), self._write_journal)
+        self.group_commit.flush([self.journal_filepath])
+
+    def _write_journal(self, entries: List[Dict[str, str]]) -> Dict[str, int]:
+        """
+        Append entries to the loan journal in one write.
+
+        Args:
+            entries (List[Dict[str, str]]): The entries.
+
+        Returns:
+            Dict[str, int]: Number of bytes written to the journal.
+        """
+        self._ensure_database_folder()
+        buffer = io.StringIO(newline='')
+        writer = csv.DictWriter(buffer, fieldnames=self._get_journal_fieldnames())
+        if not os.path.exists(self.journal_filepath) or os.path.getsize(self.journal_filepath) == 0:
+            # Concurrent writers may both add a header; replay skips the extra one
+            writer.writeheader()
+        writer.writerows(entries)
+        # A single O_APPEND write, so rows from concurrent processes never interleave
+        payload = buffer.getvalue().encode('utf-8')
+        fd = os.open(self.journal_filepath, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+        finally:
+            os.close(fd)
+        parse_cache.invalidate(os.path.abspath(self.journal_filepath))
+        return {self.journal_filepath: len(payload)}
+
+    def read_journal(self, cursor: Optional[Tuple[int, int]] = None) -> Tuple[List[Dict[str, str]], Optional[Tuple[int, int]]]:
+        """
+        Read the loan journal entries appended since a cursor.
+
+        Only complete lines are read, so an entry another process is still appending
+        is picked up by the next call instead of half-read.
+
+        Args:
+            cursor (Optional[Tuple[int, int]], optional): Cursor returned by an earlier call.
+                Defaults to the start; a journal recreated by compaction is also read
+                from the start.
+
+        Returns:
+            Tuple[List[Dict[str, str]], Optional[Tuple[int, int]]]: The entries, and the
+            cursor to continue from (None if there is no journal).
+        """
+        if self._sql is not None:
+            return [], None
+        entries, cursor, _ = self._read_journal_from(cursor)
+        return entries, cursor
+
+    def _read_journal_from(self, cursor: Optional[Tuple[int, int]]) -> Tuple[List[Dict[str, str]], Optional[Tuple[int, int]], int]:
+        """Read the loan journal like read_journal, also returning the offset read from, 0 if it was read from the start."""
+        try:
+            with open(self.journal_filepath, 'rb') as file:
+                stat = os.fstat(file.fileno())
+                offset = cursor[1] if cursor is not None and cursor[0] == stat.st_ino else 0
+                if offset > stat.st_size:
+                    offset = 0
+                file.seek(offset)
+                data = file.read()
+        except FileNotFoundError:
+            return [], None, 0
+        data = data[:data.rfind(b"\n") + 1]
+        reader = csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''), fieldnames=self._get_journal_fieldnames())
+        # Header rows, including extra ones from concurrent creators, are skipped
+        entries = [entry for entry in reader if entry["op"] != "op"]
+        return entries, (stat.st_ino, offset + len(data)), offset
+
+    def load_loans(self) -> List[Dict[str, str]]:
+        """
+        Load the current loans with their checkout times and due dates.
+
+        Loans recorded before due dates were kept are only listed in the users'
+        BookInHand, not here.
+
+        Returns:
+            List[Dict[str, str]]: One record (UserID, isbn, timestamp, due, copy) per copy on loan.
+        """
+        self.group_commit.flush()
+        if self._sql is not None:
+            return self._sql.load_table("loans")
+        loans = {(loan["isbn"], loan["UserID"]): loan for loan in self._read_csv(self.loans_filepath)}
+        for entry in self._read_csv(self.journal_filepath):
+            op, key = entry.get("op"), (entry.get("isbn"), entry.get("UserID"))
+            loan = loans.get(key)
+            if op == "checkout" and loan is None:
+                loans[key] = {field: entry.get(field) for field in self._get_loans_fieldnames()}
+            elif op == "return" and loan is not None:
+                del loans[key]
+            elif op == "renew" and loan is not None:
+                loan["due"] = entry.get("due")
+        return list(loans.values())
+
+    def load_holds(self, replay_journal: bool = True) -> List[Dict[str, str]]:
+        """
+        Load the hold queues.
+
+        Args:
+            replay_journal (bool, optional): Apply the hold events in the loan journal.
+                Without it the holds are those of the last compaction, for callers that
+                replay the journal themselves. Defaults to True.
+
+        Returns:
+            List[Dict[str, str]]: One record (UserID, isbn, timestamp, status) per hold,
+            each book's queue in order.
+        """
+        self.group_commit.flush()
+        if self._sql is not None:
+            return self._sql.load_table("holds")
+        rows = self._read_csv(self.holds_filepath)
+        if not replay_journal:
+            return rows
+        queues = HoldQueues.from_rows(rows)
+        for entry in self._read_csv(self.journal_filepath):
+            queues.apply(entry)
+        return queues.rows()
+
+    def compact_journal(self, min_ratio: float = 0.0) -> bool:
+        """
+        Fold the loan journal into loans.csv, books.csv and users.csv and remove it.
+
+        Replaying the journal again over its own result has no further effect, so a
+        crash between rewriting the snapshots and removing the journal loses nothing.
+        Of a sharded dataset only the shards owning a record the journal changed are
+        rewritten.
+
+        Args:
+            min_ratio (float, optional): Only compact once the journal is at least this
+                fraction of the size of the snapshots, so that a few loans do not cost a
+                rewrite of the whole catalog. Defaults to 0.0, always compact.
+
+        Returns:
+            bool: True if the journal was compacted, False otherwise.
+        """
+        if self._sql is not None:
+            return False
+        # No checkout may append to the journal while it is folded in and removed
+        with self.locks.exclusive(), self.group_commit.hold():
+            return self._compact_journal(min_ratio)
+
+    def _compact_journal(self, min_ratio: float = 0.0) -> bool:
+        """Compact the loan journal while holding every record lock, see compact_journal."""
+        if not self._read_csv(self.journal_filepath):
+            return False
+        if min_ratio and os.path.getsize(self.journal_filepath) < min_ratio * sum(
+                os.path.getsize(path) for filepath in (self.books_filepath, self.users_filepath)
+                for path in self._dataset_files(filepath)):
+            return False
+        self._replace_file(self.loans_filepath, self.load_loans(), self._get_loans_fieldnames())
+        self._replace_file(self.holds_filepath, self.load_holds(), self._get_holds_fieldnames())
+        self.migrate_copies()
+        for filepath in (self.books_filepath, self.users_filepath):
+            if self._shards_of(filepath) is not None:
+                self._compact_shards(filepath)
+                continue
+            data = self.load_data(filepath)
+            if data:
+                self.save_data(data = data, filepath = filepath, fieldnames = None, unique_key = None, mode = 'w')
+        os.remove(self.journal_filepath)
+        parse_cache.invalidate(os.path.abspath(self.journal_filepath))
+        # A journal recreated with the same inode must not extend the old sum
+        journal_changes_cache.invalidate(os.path.abspath(self.journal_filepath))
+        return True
+
+    def _compact_shards(self, filepath: str) -> None:
+        """
+        Rewrite the shards of a dataset that own a record the loan journal changed.
+
+        Args:
+            filepath (str): Path naming the sharded dataset.
+        """
+        replay = self._journal_replayer(filepath)
+        if replay is None:
+            return
+        changes = self._journal_changes()
+        key = self._key_of(filepath)
+        if key == "isbn":
+            changed = set(changes.lent) | set(changes.copies)
+        else:
+            changed = {user_id for _, user_id in changes.loans}
+        shards = self._shards_of(filepath)
+        for index in sorted({self.shard_layout.shard_of(key, value) for value in changed}):
+            data = self._read_csv(shards[index])
+            if data:
+                for record in data:
+                    replay(record)
+                self._replace_file(shards[index], data, list(data[0].keys()))
+
+    @property
+    def locks(self) -> LockManager:
+        """The lock manager shared by every Storage using this database folder."""
+        self._ensure_database_folder()
+        return lock_manager_for(self.lock_filepath)
+
+    def lock_key(self, key: str):
+        """
+        Return a context manager holding the lock for one record key across threads and processes.
+
+        Args:
+            key (str): The key to lock, such as an ISBN.
+        """
+        return self.locks.key(key)
+
+    def lock_all(self):
+        """Return a context manager holding every record lock, for batch operations."""
+        return self.locks.exclusive()
+
+    def _journal_replayer(self, filepath: str) -> Optional[Callable[[Dict[str, str]], None]]:
+        """
+        Build a function that applies the journalled checkouts and returns to one record in place.
+
+        Books also get their copies counted, see count_copies.
+
+        Args:
+            filepath (str): Path of the dataset the records come from.
+
+        Returns:
+            Optional[Callable[[Dict[str, str]], None]]: The replay function, or None if
+            there is nothing to replay for this dataset.
+        """
+        is_books = self._same_file(filepath, self.books_filepath)
+        if not is_books and not self._same_file(filepath, self.users_filepath):
+            return None
+        changes = self._journal_changes()
+
+        if is_books:
+            def replay_book(record: Dict[str, str]) -> None:
+                isbn = record.get("isbn")
+                if isbn in changes.lent or isbn in changes.copies:
+                    lend_copies(record, changes.lent.get(isbn, {}), changes.copies.get(isbn, 0))
+                elif not record.get("copies") or not record.get("available"):
+                    count_copies(record)
+            return replay_book
+
+        if not changes.loans:
+            return None
+        held: Dict[str, Dict[str, bool]] = {}
+        for (isbn, user_id), on_loan in changes.loans.items():
+            held.setdefault(user_id, {})[isbn] = on_loan
+
+        def replay_user(record: Dict[str, str]) -> None:
+            changed = held.get(record.get("UserID"))
+            if not changed:
+                return
+            in_hand = [value.strip() for value in (record.get("BookInHand") or "").split(",") if value.strip()]
+            # Books the journal took back are no longer in hand
+            in_hand = [isbn for isbn in in_hand if changed.get(isbn, True)]
+            for isbn, on_loan in changed.items():
+                if on_loan and isbn not in in_hand:
+                    in_hand.append(isbn)
+            record["BookInHand"] = ", ".join(in_hand)
+        return replay_user
+
+    def _journal_changes(self) -> JournalChanges:
+        """
+        Sum up the loan journal.
+
+        Every change is recorded as the state it leads to rather than as a difference,
+        so the result can be applied twice. The sum is kept in journal_changes_cache
+        with the cursor it was read up to, and only the entries appended since are
+        read, so looking up one record does not cost a pass over the journal.
+
+        Returns:
+            JournalChanges: The copies lent and added, and the loans made or ended. It
+            is shared, so callers must not change it.
+        """
+        key = os.path.abspath(self.journal_filepath)
+        cursor, changes, generation = journal_changes_cache.get(key)
+        entries, cursor, offset = self._read_journal_from(cursor)
+        if cursor is None or offset == 0 or changes is None:
+            # No journal yet, or a new one since compaction
+            changes = JournalChanges({}, {}, {})
+        elif entries:
+            # Copied, since callers may still be reading the previous sum
+            changes = JournalChanges({isbn: dict(lent) for isbn, lent in changes.lent.items()},
+                                     dict(changes.copies), dict(changes.loans))
+        self._sum_journal(entries, changes)
+        journal_changes_cache.put(key, cursor, changes, generation)
+        return changes
+
+    @staticmethod
+    def _sum_journal(entries: Iterable[Dict[str, str]], changes: JournalChanges) -> None:
+        """
+        Add loan journal entries to a sum of the journal in place, see _journal_changes.
+
+        Args:
+            entries (Iterable[Dict[str, str]]): The entries, in journal order.
+            changes (JournalChanges): The sum of the entries before them.
+        """
+        for entry in entries:
+            op, isbn, user_id = entry.get("op"), entry.get("isbn"), entry.get("UserID")
+            if op not in ("add_copy", "checkout", "return"):
+                # Renewals, holds, and extra headers from concurrent creators
+                continue
+            # Journals written before copies were counted lent the only copy
+            copy = int(entry.get("copy") or 1)
+            if op == "add_copy":
+                changes.copies[isbn] = max(changes.copies.get(isbn, 0), copy)
+            elif op == "checkout":
+                changes.loans[(isbn, user_id)] = True
+                changes.lent.setdefault(isbn, {})[copy] = True
+            elif op == "return" and changes.loans.get((isbn, user_id), True):
+                changes.loans[(isbn, user_id)] = False
+                changes.lent.setdefault(isbn, {})[copy] = False
+
+    def migrate_copies(self) -> bool:
+        """
+        Rewrite books.csv with copy counts if it was written before copies were counted.
+
+        Every book becomes a single copy, lent if it was not available. New rows can
+        then be appended with the copy fields.
+
+        Returns:
+            bool: True if books.csv was rewritten.
+        """
+        self.group_commit.flush()
+        # Shards are always written with the copy fields
+        if self._sql is not None or self._shards_of(self.books_filepath) is not None \
+                or not os.path.exists(self.books_filepath):
+            return False
+        with open(self.books_filepath, 'r', newline='') as file:
+            header = next(csv.reader(file), [])
+        if not header or "copies" in header:
+            return False
+        data = self.load_data(self.books_filepath)
+        self._replace_file(self.books_filepath, data, list(dict.fromkeys([*header, *self._get_books_fieldnames()])))
+        return True
+
+    def reshard(self, shards: int, by: str = "hash") -> Dict[str, int]:
+        """
+        Split books.csv and users.csv into shards, or merge the shards back into one file each.
+
+        The loan journal is compacted first. The new files are written before the
+        layout is switched and the old files removed, so an interrupted reshard leaves
+        the old layout intact. Processes already using the folder keep the layout they
+        started with, so reshard while the library is not running.
+
+        Args:
+            shards (int): Number of shards per dataset; 1 for one file each.
+            by (str, optional): "hash" to shard books by a hash of the ISBN, or "group"
+                by the ISBN's registration group, see ShardLayout. Defaults to "hash".
+
+        Returns:
+            Dict[str, int]: Number of books and users written.
+        """
+        if self._sql is not None:
+            raise ValueError("Only the csv backend can be sharded")
+        layout = ShardLayout(shards, by) if shards != 1 else None
+        datasets = {"books": (self.books_filepath, self._get_books_fieldnames()),
+                    "users": (self.users_filepath, self._get_users_fieldnames())}
+        counts = {}
+        with self.locks.exclusive(), self.group_commit.hold():
+            self._compact_journal()
+            if layout == self.shard_layout:
+                return {name: len(self.load_data(filepath)) for name, (filepath, _) in datasets.items()}
+            old_files = [path for filepath, _ in datasets.values() for path in self._dataset_files(filepath)]
+            data = {name: self.load_data(filepath) for name, (filepath, _) in datasets.items()}
+            for name, (filepath, fieldnames) in datasets.items():
+                records = data[name]
+                counts[name] = len(records)
+                if not records:
+                    continue
+                fieldnames = list(dict.fromkeys([*records[0].keys(), *fieldnames]))
+                if layout is None:
+                    self._replace_file(filepath, records, fieldnames)
+                    continue
+                owned = self._group_by_shard(filepath, records, layout)
+                for path in layout.paths(filepath):
+                    self._replace_file(path, owned.get(path, []), fieldnames)
+            set_shard_layout(self.database_folder, layout)
+            new_files = {os.path.abspath(path) for filepath, _ in datasets.values() for path in self._dataset_files(filepath)}
+            for path in old_files:
+                if os.path.abspath(path) in new_files:
+                    continue
+                for leftover in (path, f"{path}.snapshot", f"{path}.isbn.offsets", f"{path}.UserID.offsets"):
+                    if os.path.exists(leftover):
+                        os.remove(leftover)
+                parse_cache.invalidate(os.path.abspath(path))
+        return counts
+
+    def find_record(self, filepath: str, unique_key: str, value: str) -> Optional[Dict[str, str]]:
+        """
+        Look up a single record by its unique key.
+
+        With the SQLite backend this is an indexed point query. CSV files are looked up
+        through an OffsetIndex, which reads only the matching row, of the owning shard
+        if the dataset is sharded.
+
+        Args:
+            filepath (str): Path to the CSV file naming the dataset.
+            unique_key (str): Name of the unique key field ("isbn" or "UserID").
+            value (str): Value of the key to look up.
+
+        Returns:
+            Optional[Dict[str, str]]: The record, or None if it does not exist.
+        """
+        self.group_commit.flush()
+        with metrics.span("storage.find_record") as span:
+            table = self._table_for(filepath)
+            if table is not None:
+                return self._sql.find(table, value)
+            shards = self._shards_of(filepath)
+            # Only the shard owning the key can hold the record; the journal is replayed
+            # for the whole dataset
+            shard = shards[self.shard_layout.shard_of(unique_key, value)] if shards is not None else filepath
+            record = offset_index_for(shard, unique_key).find(value)
+            if record is not None:
+                span.add(rows=1)
+                replay = self._journal_replayer(filepath)
+                if replay is not None:
+                    replay(record)
+            return record
+
+    def import_csv(self) -> Dict[str, int]:
+        """
+        Copy books.csv, users.csv, loans.csv and holds.csv from the database folder into the SQLite tables.
+
+        Returns:
+            Dict[str, int]: Number of books, users, loans and holds imported.
+        """
+        if self._sql is None:
+            raise ValueError("import_csv requires the sqlite backend")
+        return {
+            "books": self._sql.insert("books", [count_copies(book) for book in self._read_csv(self.books_filepath)]),
+            "users": self._sql.insert("users", self._read_csv(self.users_filepath)),
+            "loans": self._sql.insert("loans", self._read_csv(self.loans_filepath)),
+            "holds": self._sql.insert("holds", self._read_csv(self.holds_filepath))
+        }
+
+    def export_csv(self) -> None:
+        """Write the SQLite tables to books.csv, users.csv, loans.csv and holds.csv in the database folder."""
+        if self._sql is None:
+            raise ValueError("export_csv requires the sqlite backend")
+        for table, filepath in (("books", self.books_filepath), ("users", self.users_filepath),
+                                ("loans", self.loans_filepath), ("holds", self.holds_filepath)):
+            with open(filepath, 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=self._sql.TABLES[table])
+                writer.writeheader()
+                writer.writerows(self._sql.load_table(table))
+            parse_cache.invalidate(os.path.abspath(filepath))
+
+    def _table_for(self, filepath: str) -> Optional[str]:
+        """Return the SQLite table holding a dataset, or None if it is kept in CSV."""
+        if self._sql is None:
+            return None
+        if self._same_file(filepath, self.books_filepath):
+            return "books"
+        if self._same_file(filepath, self.users_filepath):
+            return "users"
+        return None
+
+    def _same_file(self, first: str, second: str) -> bool:
+        """Check whether two paths name the same file."""
+        return os.path.abspath(first) == os.path.abspath(second)
+
+    @property
+    def shard_layout(self) -> Optional[ShardLayout]:
+        """The shard layout of the database folder, or None if books and users are kept in one file each."""
+        return shard_layout_for(self.database_folder)
+
+    def _shards_of(self, filepath: str) -> Optional[List[str]]:
+        """Return the shard files of the books or users dataset, or None if it is kept in one file."""
+        layout = self.shard_layout
+        if layout is None or not self._is_catalog(filepath):
+            return None
+        return layout.paths(self.books_filepath if self._same_file(filepath, self.books_filepath) else self.users_filepath)
+
+    def _key_of(self, filepath: str) -> str:
+        """Return the unique key field of the books or users dataset."""
+        return "isbn" if self._same_file(filepath, self.books_filepath) else "UserID"
+
+    def _dataset_files(self, filepath: str) -> List[str]:
+        """Return the files holding a CSV dataset that exist."""
+        return [path for path in self._shards_of(filepath) or [filepath] if os.path.exists(path)]
+
+    def signature(self, filepath: str) -> Optional[Tuple[int, int, int]]:
+        """
+        Return a value that changes whenever a dataset is modified.
+
+        Args:
+            filepath (str): Path to the CSV file naming the dataset.
+
+        Returns:
+            Optional[Tuple[int, int, int]]: (mtime_ns, size, inode) of the file holding the
+            dataset, or None if it does not exist. For a sharded dataset these are the
+            latest mtime, the total size and the sum of the inodes of its shards.
+        """
+        if self._table_for(filepath) is not None:
+            filepath = self._sql.filepath
+        shards = self._shards_of(filepath)
+        if shards is not None:
+            signatures = [signature for signature in map(self.signature, shards) if signature is not None]
+            if not signatures:
+                return None
+            return (max(signature[0] for signature in signatures), sum(signature[1] for signature in signatures),
+                    sum(signature[2] for signature in signatures))
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+    def version(self) -> tuple:
+        """
+        Return a value that changes whenever books or users are changed.
+
+        Loans recorded through this Storage do not change it; they are read back with
+        read_journal. Other writers are noticed through the files' signatures, or
+        through SQLite's data_version with the SQLite backend.
+
+        Returns:
+            tuple: A value to compare with an earlier one.
+        """
+        if self._sql is not None:
+            return (self._sql.data_version(), self._writes)
+        # Books and users this process added are part of the version once written
+        self.group_commit.flush([self.books_filepath, self.users_filepath])
+        return (self.signature(self.books_filepath), self.signature(self.users_filepath), self._writes)
+
+    def append_cursor(self, filepath: str) -> Optional[Tuple[Optional[Tuple[int, int]], ...]]:
+        """
+        Return a cursor at the end of a dataset, to read the records appended after it with read_appended.
+
+        Args:
+            filepath (str): Path to the CSV file naming the dataset.
+
+        Returns:
+            Optional[Tuple[Optional[Tuple[int, int]], ...]]: The inode and end of the last
+            complete row of each file of the dataset (None for files that do not exist
+            yet), or None with the SQLite backend.
+        """
+        if self._table_for(filepath) is not None:
+            return None
+        self.group_commit.flush([filepath])
+        cursor = []
+        for path in self._shards_of(filepath) or [filepath]:
+            try:
+                with open(path, 'rb') as file:
+                    stat = os.fstat(file.fileno())
+                    cursor.append((stat.st_ino, self._end_of_rows(file, stat.st_size)))
+            except FileNotFoundError:
+                cursor.append(None)
+        return tuple(cursor)
+
+    def read_appended(self, filepath: str, cursor: Optional[Tuple[Optional[Tuple[int, int]], ...]]
+                      ) -> Tuple[Optional[List[Dict[str, str]]], Optional[Tuple[Optional[Tuple[int, int]], ...]]]:
+        """
+        Read the records appended to a dataset since a cursor.
+
+        Only complete rows are read, as with read_journal. Records are returned as
+        stored, without the loan journal replayed into them.
+
+        Args:
+            filepath (str): Path to the CSV file naming the dataset.
+            cursor (Optional[Tuple[Optional[Tuple[int, int]], ...]]): Cursor returned by
+                append_cursor or an earlier call.
+
+        Returns:
+            Tuple[Optional[List[Dict[str, str]]], Optional[Tuple[Optional[Tuple[int, int]], ...]]]:
+            The records and the cursor to continue from. Both are None if the dataset was
+            rewritten or resharded since the cursor, or is kept in SQLite; the caller
+            then reloads it and takes a new append_cursor.
+        """
+        paths = self._shards_of(filepath) or [filepath]
+        if cursor is None or self._table_for(filepath) is not None or len(cursor) != len(paths):
+            return None, None
+        self.group_commit.flush([filepath])
+        records: List[Dict[str, str]] = []
+        positions = []
+        for path, position in zip(paths, cursor):
+            try:
+                with open(path, 'rb') as file:
+                    stat = os.fstat(file.fileno())
+                    if position is not None and (stat.st_ino != position[0] or stat.st_size < position[1]):
+                        return None, None
+                    header = self._read_csv_row(file)
+                    start = max(position[1] if position is not None else 0, file.tell())
+                    end = self._end_of_rows(file, stat.st_size)
+                    if header and end > start:
+                        file.seek(start)
+                        data = file.read(end - start).decode('utf-8')
+                        records.extend(row for row in csv.DictReader(io.StringIO(data, newline=''), fieldnames=header)
+                                       if any(row.values()))
+                    positions.append((stat.st_ino, max(start, end) if header else 0))
+            except FileNotFoundError:
+                if position is not None:
+                    return None, None
+                positions.append(None)
+        return records, tuple(positions)
+
+    @staticmethod
+    def _end_of_rows(file, size: int) -> int:
+        """Return the offset just after the last line break in the first size bytes of a binary file."""
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+        return 0
+
+    def flush(self) -> int:
+        """
+        Write the appends buffered by the group commit now.
+
+        Returns:
+            int: Number of records written.
+        """
+        return self.group_commit.flush()
+
+    def commit_stats(self) -> Dict[str, float]:
+        """
+        Return the counters of the group commit shared by this database folder.
+
+        Returns:
+            Dict[str, float]: Batches written, records in them, writes they coalesced,
+            total and longest seconds spent writing a batch, and records still buffered.
+        """
+        return self.group_commit.stats()
+
+    def cache_stats(self) -> Dict[str, int]:
+        """
+        Return the hit and miss counters of the shared parse cache.
+
+        Returns:
+            Dict[str, int]: Hits, misses, number of cached files and cached bytes.
+        """
+        return parse_cache.stats()
+
     def _fill_empty_values(self, record: Dict[str, str], custom_value: str) -> Dict[str, str]:
         """
         Fill empty values in a record with custom value.
@@ -127,26 +1557,44 @@ class Storage:
 
     def _get_books_fieldnames(self) -> List[str]:
         """Get the field names for the books CSV file."""
-        return ["title", "author", "isbn", "AvailableInLibrary", "timestamp"]
+        return ["title", "author", "isbn", "AvailableInLibrary", "timestamp", *self.COPY_FIELDS[1:]]
 
     def _get_users_fieldnames(self) -> List[str]:
         """Get the field names for the users CSV file."""
         return ["Name", "UserID", "BookInHand", "timestamp"]
 
+    def _get_loans_fieldnames(self) -> List[str]:
+        """Return the field names of loans.csv."""
+        return ["UserID", "isbn", "timestamp", "due", "copy"]
+
+    def _get_holds_fieldnames(self) -> List[str]:
+        """Return the field names of holds.csv."""
+        return ["UserID", "isbn", "timestamp", "status"]
+
+    def _get_journal_fieldnames(self) -> List[str]:
+        """Get the field names for the loan journal CSV file."""
+        return ["op", "UserID", "isbn", "timestamp", "due", "copy"]
+
     def books_exist(self) -> bool:
         """
-        Check if the books.csv file exists in the database folder.
+        Check if the books.csv file, or one of its shards, exists in the database folder.
 
         Returns:
             bool: True if the file exists, False otherwise.
         """
-        return os.path.isfile(self.books_filepath)
+        if self._sql is not None:
+            return self._sql.has_rows("books")
+        self.group_commit.flush()
+        return bool(self._dataset_files(self.books_filepath))
     
     def users_exist(self) -> bool:
         """
-        Check if the users.csv file exists in the database folder.
+        Check if the users.csv file, or one of its shards, exists in the database folder.
 
         Returns:
             bool: True if the file exists, False otherwise.
         """
-        return os.path.isfile(self.users_filepath)
+        if self._sql is not None:
+            return self._sql.has_rows("users")
+        self.group_commit.flush()
+        return bool(self._dataset_files(self.users_filepath))
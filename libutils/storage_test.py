@@ -0,0 +1,242 @@
+import os
+
+import pytest
+
+from .storage import ParseCache, Storage, parse_cache
+
+
+@pytest.fixture
+def storage(tmp_path):
+    parse_cache.clear()
+    return Storage(database_folder=str(tmp_path))
+
+def write_books(storage, rows):
+    storage.save_data(rows, storage.books_filepath, storage._get_books_fieldnames(), "isbn")
+
+def test_load_data_uses_cache(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    first = storage.load_data(storage.books_filepath)
+    second = storage.load_data(storage.books_filepath)
+    assert first == second
+    assert storage.cache_stats()["hits"] >= 1
+
+def test_load_data_returns_copies(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    storage.load_data(storage.books_filepath)[0]["title"] = "Changed"
+    assert storage.load_data(storage.books_filepath)[0]["title"] == "T"
+
+def test_load_data_sees_file_changes(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    storage.load_data(storage.books_filepath)
+    write_books(storage, [{"title": "U", "author": "B", "isbn": "978-1-786330-89-5"}])
+    assert len(storage.load_data(storage.books_filepath)) == 2
+
+def test_database_folder_is_created_on_first_write(tmp_path):
+    folder = tmp_path / "database"
+    storage = Storage(database_folder=str(folder))
+    assert storage.load_data(storage.books_filepath) == []
+    assert not folder.exists()
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    assert folder.exists()
+
+def test_parse_cache_evicts_least_recently_used():
+    cache = ParseCache(max_bytes=10)
+    cache.put("a", (1, 6, 1), [{"k": "a"}])
+    cache.put("b", (1, 4, 2), [{"k": "b"}])
+    cache.get("a", (1, 6, 1))
+    cache.put("c", (1, 4, 3), [{"k": "c"}])
+    assert cache.get("b", (1, 4, 2)) is None
+    assert cache.get("a", (1, 6, 1)) == [{"k": "a"}]
+    assert cache.stats()["bytes"] == 10
+
+def write_users(storage, rows):
+    storage.save_data(rows, storage.users_filepath, storage._get_users_fieldnames(), "UserID")
+
+def test_checkout_is_replayed_from_journal(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    books_size = os.path.getsize(storage.books_filepath)
+    storage.record_checkout("1", "978-0-123456-78-6")
+    assert os.path.getsize(storage.books_filepath) == books_size
+    assert storage.load_data(storage.books_filepath)[0]["AvailableInLibrary"] == "No"
+    assert storage.load_data(storage.users_filepath)[0]["BookInHand"] == "978-0-123456-78-6"
+
+def test_compact_journal(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    storage.record_checkout("1", "978-0-123456-78-6")
+    assert storage.compact_journal()
+    assert not os.path.exists(storage.journal_filepath)
+    assert storage.load_data(storage.books_filepath)[0]["AvailableInLibrary"] == "No"
+    assert storage.load_data(storage.users_filepath)[0]["BookInHand"] == "978-0-123456-78-6"
+    assert not storage.compact_journal()
+
+def test_compact_journal_waits_for_min_ratio(storage):
+    write_books(storage, [{"title": f"T{i}", "author": "A", "isbn": f"isbn-{i}"} for i in range(100)])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    storage.record_checkout("1", "isbn-0")
+    assert not storage.compact_journal(min_ratio=0.5)
+    assert os.path.exists(storage.journal_filepath)
+    assert storage.compact_journal(min_ratio=0.01)
+
+def test_find_record_reads_one_row(storage):
+    write_books(storage, [{"title": "T, \"quoted\"", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    parse_cache.clear()
+    assert storage.find_record(storage.books_filepath, "isbn", "978-0-123456-78-6")["title"] == 'T, "quoted"'
+    assert storage.find_record(storage.books_filepath, "isbn", "978-1-786330-89-5") is None
+    assert os.path.exists(storage.books_filepath + ".isbn.offsets")
+    assert storage.cache_stats()["entries"] == 0
+    write_books(storage, [{"title": "U", "author": "B", "isbn": "978-1-786330-89-5"}])
+    assert storage.find_record(storage.books_filepath, "isbn", "978-1-786330-89-5")["title"] == "U"
+    storage.record_checkout("1", "978-1-786330-89-5")
+    assert storage.find_record(storage.users_filepath, "UserID", "1")["BookInHand"] == "978-1-786330-89-5"
+    assert storage.compact_journal()
+    assert storage.find_record(storage.books_filepath, "isbn", "978-1-786330-89-5")["AvailableInLibrary"] == "No"
+
+def test_load_columns(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"},
+                          {"title": "U", "author": "B", "isbn": "978-1-786330-89-5"}])
+    storage.record_checkout("1", "978-1-786330-89-5")
+    assert storage.load_columns(storage.books_filepath, ["isbn", "AvailableInLibrary", "missing"]) == {
+        "isbn": ["978-0-123456-78-6", "978-1-786330-89-5"], "AvailableInLibrary": ["Yes", "No"]}
+    assert storage.load_columns(storage.users_filepath, ["UserID"]) == {}
+
+@pytest.fixture
+def sqlite_storage(tmp_path):
+    storage = Storage(database_folder=str(tmp_path), backend="sqlite")
+    yield storage
+    storage._sql.close()
+
+def test_sqlite_backend_round_trip(sqlite_storage):
+    assert not sqlite_storage.books_exist()
+    write_books(sqlite_storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_books(sqlite_storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_users(sqlite_storage, [{"Name": "N", "UserID": "1"}])
+    assert sqlite_storage.books_exist()
+    assert not os.path.exists(sqlite_storage.books_filepath)
+    assert len(sqlite_storage.load_data(sqlite_storage.books_filepath)) == 1
+    assert sqlite_storage.find_record(sqlite_storage.users_filepath, "UserID", "1")["Name"] == "N"
+
+def test_sqlite_checkout_is_one_transaction(sqlite_storage):
+    write_books(sqlite_storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    with pytest.raises(ValueError):
+        sqlite_storage.record_checkout("1", "978-0-123456-78-6")
+    book = sqlite_storage.find_record(sqlite_storage.books_filepath, "isbn", "978-0-123456-78-6")
+    assert book["AvailableInLibrary"] == "Yes"
+    write_users(sqlite_storage, [{"Name": "N", "UserID": "1"}])
+    sqlite_storage.record_checkout("1", "978-0-123456-78-6")
+    assert sqlite_storage.find_record(sqlite_storage.users_filepath, "UserID", "1")["BookInHand"] == "978-0-123456-78-6"
+
+def test_sqlite_import_and_export_csv(storage, tmp_path):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    sqlite_storage = Storage(database_folder=str(tmp_path), backend="sqlite")
+    assert sqlite_storage.import_csv() == {"books": 1, "users": 0, "loans": 0, "holds": 0}
+    os.remove(sqlite_storage.books_filepath)
+    sqlite_storage.export_csv()
+    assert storage.load_data(storage.books_filepath)[0]["isbn"] == "978-0-123456-78-6"
+    sqlite_storage._sql.close()
+
+def test_find_record_reads_only_new_journal_entries(storage, monkeypatch):
+    isbns = ["978-0-123456-78-6", "978-1-786330-89-5"]
+    write_books(storage, [{"title": "T", "author": "A", "isbn": isbn} for isbn in isbns])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    for _ in range(500):
+        storage.record_checkout("1", isbns[0])
+        storage.record_return("1", isbns[0])
+    storage.record_checkout("1", isbns[1])
+    assert storage.find_record(storage.books_filepath, "isbn", isbns[0])["AvailableInLibrary"] == "Yes"
+    read = []
+    read_journal_from = storage._read_journal_from
+    monkeypatch.setattr(storage, "_read_journal_from",
+                        lambda cursor: read.append(read_journal_from(cursor)) or read[-1])
+    assert storage.find_record(storage.books_filepath, "isbn", isbns[1])["AvailableInLibrary"] == "No"
+    storage.record_return("1", isbns[1])
+    assert storage.find_record(storage.users_filepath, "UserID", "1")["BookInHand"] == ""
+    assert [len(entries) for entries, _, _ in read] == [0, 1]
+    # A journal recreated by compaction is summed from the start
+    assert storage.compact_journal()
+    storage.record_checkout("1", isbns[0])
+    assert storage.find_record(storage.books_filepath, "isbn", isbns[1])["AvailableInLibrary"] == "Yes"
+    assert storage.find_record(storage.users_filepath, "UserID", "1")["BookInHand"] == isbns[0]
+
+def test_find_record_in_shard_replays_journal(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    write_users(storage, [{"Name": "N", "UserID": "1"}])
+    storage.reshard(2)
+    storage.record_checkout("1", "978-0-123456-78-6")
+    assert storage.load_data(storage.books_filepath)[0]["AvailableInLibrary"] == "No"
+    assert storage.find_record(storage.books_filepath, "isbn", "978-0-123456-78-6")["AvailableInLibrary"] == "No"
+    assert storage.find_record(storage.users_filepath, "UserID", "1")["BookInHand"] == "978-0-123456-78-6"
+
+def test_reshard(storage):
+    isbns = [f"978-{group}-123456-78-{check}" for group in range(3) for check in range(4)]
+    write_books(storage, [{"title": f"T{index}", "author": "A", "isbn": isbn} for index, isbn in enumerate(isbns)])
+    write_users(storage, [{"Name": "N", "UserID": "1"}, {"Name": "M", "UserID": "2"}])
+    storage.record_checkout("1", isbns[0])
+    books = storage.load_data(storage.books_filepath)
+    assert storage.reshard(4) == {"books": 12, "users": 2}
+    assert not os.path.exists(storage.books_filepath) and not os.path.exists(storage.journal_filepath)
+    shards = storage.shard_layout.paths(storage.books_filepath)
+    assert all(os.path.exists(shard) for shard in shards)
+    assert sorted(storage.load_data(storage.books_filepath), key=lambda book: book["isbn"]) == sorted(
+        books, key=lambda book: book["isbn"])
+    assert storage.find_record(storage.books_filepath, "isbn", isbns[0])["AvailableInLibrary"] == "No"
+    # A streamed dataset resumes from a cursor in any shard
+    records = list(storage.iter_data(storage.books_filepath))
+    assert [record for record, _ in storage.iter_data(storage.books_filepath, records[5][1])] == [
+        record for record, _ in records[6:]]
+    # Writes only touch the shard owning the key
+    sizes = [os.path.getsize(shard) for shard in shards]
+    write_books(storage, [{"title": "U", "author": "B", "isbn": "978-1-786330-89-5"}])
+    storage.record_checkout("2", "978-1-786330-89-5")
+    assert storage.compact_journal()
+    owner = storage.shard_layout.shard_of("isbn", "978-1-786330-89-5")
+    assert [os.path.getsize(shard) != size for shard, size in zip(shards, sizes)] == [
+        index == owner for index in range(4)]
+    assert storage.find_record(storage.users_filepath, "UserID", "2")["BookInHand"] == "978-1-786330-89-5"
+    # Grouped by registration group, and back to one file
+    assert storage.reshard(3, by="group")["books"] == 13
+    assert not any(os.path.exists(shard) for shard in shards)
+    groups = [{book["isbn"][:5] for book in storage.load_data(shard)}
+              for shard in storage.shard_layout.paths(storage.books_filepath)]
+    assert sum(len(group) for group in groups) == 3
+    assert storage.reshard(1)["books"] == 13
+    assert storage.shard_layout is None and len(storage.load_data(storage.books_filepath)) == 13
+
+def test_shards_load_in_parallel(storage):
+    write_books(storage, [{"title": f"T{index}", "author": "A", "isbn": f"isbn-{index}"} for index in range(100)])
+    storage.reshard(4)
+    parse_cache.clear()
+    storage.PARALLEL_MIN_BYTES = 0
+    storage.load_workers = 2
+    assert sorted(book["isbn"] for book in storage.load_data(storage.books_filepath)) == sorted(
+        f"isbn-{index}" for index in range(100))
+    assert storage.load_columns(storage.books_filepath, ["isbn"])["isbn"] == [
+        book["isbn"] for book in storage.load_data(storage.books_filepath)]
+
+def test_group_commit_batches_appends(storage):
+    storage.group_commit.configure(max_records=100, fsync=True)
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    assert storage.group_commit.pending() == 1
+    # Reads write what is buffered first
+    assert storage.load_data(storage.books_filepath)[0]["AvailableInLibrary"] == "Yes"
+    stats = storage.commit_stats()
+    assert (stats["batches"], stats["records"], stats["writes"], stats["pending"]) == (1, 1, 1, 0)
+
+def test_group_commit_writes_journal_at_once(storage):
+    storage.group_commit.configure(max_records=100, max_delay=60)
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    storage.record_checkout("1", "978-0-123456-78-6")
+    # Other processes replay the journal as soon as the ISBN is unlocked
+    assert len(Storage(storage.database_folder).read_journal()[0]) == 1
+    storage.record_return("1", "978-0-123456-78-6")
+    assert len(storage.read_journal()[0]) == 2
+    assert storage.group_commit.pending() == 1
+
+def test_save_data_rewrites_in_one_write(storage):
+    write_books(storage, [{"title": "T", "author": "A", "isbn": "978-0-123456-78-6"}])
+    data = storage.load_data(storage.books_filepath)
+    data[0]["title"] = "U"
+    storage.save_data(data, storage.books_filepath, None, None, mode='w')
+    assert [book["title"] for book in storage.load_data(storage.books_filepath)] == ["U"]
@@ -1,24 +1,30 @@
 """Module for managing users in the library."""
 
+import threading
+from datetime import datetime
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+from .metrics import metrics
 from .storage import Storage
 
 class User:
     """Class representing a user in the library."""
 
+    __slots__ = ("name", "user_id")
+
     def __init__(self, name: str, user_id: str):
         """
         Initialize a User object.
 
+        Uniqueness of the user ID is checked by UserDatabase, which keeps one shared
+        set of known IDs instead of a copy per user.
+
         Args:
             name (str): The name of the user.
             user_id (str): The ID of the user.
         """
         self.name = None
         self.user_id = None
-        self._storage = Storage()
-        self.users_path = self._storage.users_filepath
-        existing_users = self._storage.load_data(self.users_path)
-        self.existing_ids = [user["UserID"] for user in existing_users]
         
         self.validate_and_set_user_info(name, user_id)
 
@@ -35,9 +41,6 @@ class User:
                 raise ValueError("User information is incomplete")
             if not isinstance(name, str) or not isinstance(user_id, str):
                 raise TypeError("Name and User ID must be strings")
-            # Assuming self.existing_ids is a list or set containing existing user IDs
-            if user_id in self.existing_ids:
-                raise ValueError(f"User ID '{user_id}' already exists in the database")
         except ValueError as ve:
             print("\n❌ Error:", ve," ❌")
         except TypeError as te:
@@ -60,9 +63,49 @@ class UserDatabase:
         """Initialize the UserDatabase."""
         self._users = []
         self._storage = Storage()
+        self._user_ids = None
+        # Guards _users, the users not yet written to storage, against autosave
+        self._pending_lock = threading.Lock()
+        # Held while the set of IDs is built, so callers during a warm-up wait for it
+        self._ids_lock = threading.Lock()
+
+    def warm_up(self) -> int:
+        """
+        Build the set of known user IDs now instead of on first use.
+
+        Returns:
+            int: Number of users.
+        """
+        return len(self._ids())
+
+    def _ids(self) -> set:
+        """
+        Return the set of known user IDs, building it from storage on first use.
+
+        IDs are stored as integers so that "0123" and "123" are the same user.
+
+        Returns:
+            set: IDs of stored users and users added in this session.
+        """
+        if self._user_ids is None:
+            with self._ids_lock:
+                if self._user_ids is None:
+                    user_ids = set()
+                    if self._storage.users_exist():
+                        for loaded_user in self._storage.load_data(self._storage.users_filepath):
+                            try:
+                                user_ids.add(int(loaded_user["UserID"]))
+                            except (KeyError, TypeError, ValueError):
+                                continue
+                    for user in self._users:
+                        if user.user_id is not None:
+                            user_ids.add(int(user.user_id))
+                    self._user_ids = user_ids
+        return self._user_ids
     
-    def print_users(self, users):
-        print("\n-------------------------\nList of users registered in Library 📗:\n-------------------------")
+    def print_users(self, users, header: bool = True):
+        if header:
+            print("\n-------------------------\nList of users registered in Library 📗:\n-------------------------")
         for _, user_info in enumerate(users, start=1):
             print(f"UserID: {user_info['UserID']}\nName: {user_info['Name']}\nBooksInHand: {user_info['BookInHand']}\n-------------------------")
 
@@ -75,16 +118,7 @@ class UserDatabase:
             user_id (str): The ID of the user.
         """
         try:
-            if not name:
-                raise ValueError("Name cannot be empty")
-            if not user_id:
-                raise ValueError("User ID cannot be empty")
-            if self._users and str(user_id) in [entry['UserID'] for entry in self.get_users()]:
-                raise ValueError("UserID already exists in database.")
-            if self._users and int(user_id) in [int(entry['UserID']) for entry in self.get_users()]:
-                raise ValueError("UserID already exists in database.")
-            if self._storage.users_exist and int(user_id) in [int(entry['UserID']) for entry in self.get_users()]:
-                raise ValueError("UserID already exists in database.")
+            self.create_user(name, user_id)
         except ValueError as e:
             if str(e).strip() == "UserID already exists in database.":
                     print(f"\n❌ Error: {e} ❌")
@@ -93,10 +127,54 @@ class UserDatabase:
             else:
                 print(f"\n❌ Error: {e} ❌")
         else:
-            user = User(name, user_id)
-            self._users.append(user)
             print("User successfully ✅.")   
 
+    def create_user(self, name: str, user_id: str) -> User:
+        """
+        Add a user to the database without printing anything.
+
+        Args:
+            name (str): The name of the user.
+            user_id (str): The ID of the user.
+
+        Returns:
+            User: The new user.
+
+        Raises:
+            ValueError: If the information is incomplete, the ID is not a number or it already exists.
+        """
+        with metrics.span("add_user"):
+            if not name:
+                raise ValueError("Name cannot be empty")
+            if not user_id:
+                raise ValueError("User ID cannot be empty")
+            if not name.strip() or not user_id.strip():
+                raise ValueError("User information is incomplete")
+            if int(user_id) in self._ids():
+                raise ValueError("UserID already exists in database.")
+            user = User(name, user_id)
+            with self._pending_lock:
+                self._users.append(user)
+            self._ids().add(int(user_id))
+            return user
+
+    def flush(self) -> int:
+        """
+        Write the users added since the last save to storage in one append.
+
+        Returns:
+            int: Number of users written.
+        """
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._pending_lock:
+            records = [{"Name": user.name, "UserID": user.user_id, "BookInHand": None, "timestamp": timestamp}
+                       for user in self._users]
+            written = self._storage.append_records(
+                self._storage.users_filepath, records, self._storage._get_users_fieldnames()
+            )
+            self._users = []
+        return written
+
     def get_users(self) -> list:
         """
         Retrieve all users from the database.
@@ -120,5 +198,79 @@ class UserDatabase:
         
         return user_data
 
-# Global instance of UserDatabase
-user_database = UserDatabase()
+    def iter_users(self, offset: int = 0) -> Iterator[Dict[str, str]]:
+        """
+        Stream the users in the database, stored users first.
+
+        Args:
+            offset (int, optional): Number of users to skip. Defaults to 0.
+
+        Yields:
+            Dict[str, str]: One user record at a time.
+        """
+        for record, _ in islice(self._iter_users_from(None), offset, None):
+            yield record
+
+    def page_users(self, page_size: int = 20, offset: int = 0, cursor: Optional[tuple] = None) -> Tuple[List[Dict[str, str]], Optional[tuple]]:
+        """
+        Return one page of users.
+
+        Args:
+            page_size (int, optional): Maximum number of users on the page. Defaults to 20.
+            offset (int, optional): Number of users to skip after the cursor. Defaults to 0.
+            cursor (Optional[tuple], optional): Cursor returned with the previous page. Defaults to the start.
+
+        Returns:
+            Tuple[List[Dict[str, str]], Optional[tuple]]: The users on the page and the cursor
+            of the next page, or None if this is the last page.
+        """
+        page, next_cursor = [], None
+        for record, position in islice(self._iter_users_from(cursor), offset, None):
+            if len(page) == page_size:
+                return page, next_cursor
+            page.append(record)
+            next_cursor = position
+        return page, None
+
+    def _iter_users_from(self, cursor: Optional[tuple]) -> Iterator[Tuple[Dict[str, str], tuple]]:
+        """
+        Stream stored users and then users added in this session, with resume cursors.
+
+        Args:
+            cursor (Optional[tuple]): (storage cursor, session index) to resume from, or None.
+
+        Yields:
+            Tuple[Dict[str, str], tuple]: A user record and the cursor following it.
+        """
+        storage_cursor, memory_index = cursor or (None, 0)
+        if memory_index == 0 and self._storage.users_exist():
+            for loaded_user, position in self._storage.iter_data(self._storage.users_filepath, storage_cursor):
+                yield loaded_user, (position, 0)
+        for index in range(memory_index, len(self._users)):
+            user = self._users[index]
+            yield {"Name": user.name, "UserID": user.user_id, "BookInHand": None}, (None, index + 1)
+
+# Global instance of UserDatabase, created on first use so that importing the module
+# does no I/O
+_user_database = None
+_user_database_lock = threading.Lock()
+
+def get_user_database() -> UserDatabase:
+    """
+    Return the global UserDatabase, creating it on first use.
+
+    Returns:
+        UserDatabase: The shared instance.
+    """
+    global _user_database
+    if _user_database is None:
+        with _user_database_lock:
+            if _user_database is None:
+                _user_database = UserDatabase()
+    return _user_database
+
+def __getattr__(name: str):
+    """Keep `user_database` importable by name while creating it lazily."""
+    if name == "user_database":
+        return get_user_database()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
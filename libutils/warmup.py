@@ -0,0 +1,143 @@
+"""Module for loading the library's datasets in the background at startup."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+from .metrics import metrics
+
+class Progress(NamedTuple):
+    """How far the loading of one dataset has got, see WarmUp.progress."""
+
+    # "waiting", "loading", "ready" or "failed"
+    state: str
+    # Number of records loaded, once ready
+    records: int = 0
+    # Seconds the loading took, once ready or failed
+    seconds: float = 0.0
+    error: Optional[str] = None
+
+class WarmUp:
+    """
+    Load and index datasets at the same time on a thread pool.
+
+    Each dataset is loaded by a function that builds its index the way the first
+    operation needing it would, such as BookDatabase.warm_up. Those builds hold a
+    lock, so an operation that needs a dataset still loading waits for that dataset
+    alone, and the menu can be shown before the warm-up finishes.
+    """
+
+    def __init__(self) -> None:
+        """Initialize a WarmUp with no datasets."""
+        self._loaders: Dict[str, Callable[[], int]] = {}
+        self._after: Dict[str, List[str]] = {}
+        self._progress: Dict[str, Progress] = {}
+        self._done: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def add(self, name: str, loader: Callable[[], int], after: Iterable[str] = ()) -> "WarmUp":
+        """
+        Add a dataset to load.
+
+        Args:
+            name (str): Name of the dataset, such as "books".
+            loader (Callable[[], int]): Loads and indexes the dataset, returning the number of records.
+            after (Iterable[str], optional): Datasets to wait for first, such as those
+                the loader reads again, so they are parsed once. Defaults to none.
+
+        Returns:
+            WarmUp: This WarmUp.
+        """
+        self._loaders[name] = loader
+        self._after[name] = list(after)
+        self._progress[name] = Progress("waiting")
+        self._done[name] = threading.Event()
+        return self
+
+    def start(self) -> "WarmUp":
+        """
+        Start loading every dataset, one thread each.
+
+        Returns:
+            WarmUp: This WarmUp.
+        """
+        if self._executor is None and self._loaders:
+            self._executor = ThreadPoolExecutor(max_workers=len(self._loaders), thread_name_prefix="library-warm-up")
+            for name in self._loaders:
+                self._executor.submit(self._load, name)
+            # The threads exit once every dataset is loaded
+            self._executor.shutdown(wait=False)
+        return self
+
+    def wait(self, name: Optional[str] = None, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until a dataset, or every dataset, is loaded or has failed.
+
+        Args:
+            name (Optional[str], optional): The dataset. Defaults to every dataset.
+            timeout (Optional[float], optional): Most seconds to wait. Defaults to no limit.
+
+        Returns:
+            bool: True if the datasets are done, False on timeout.
+        """
+        if name is not None:
+            return self._done[name].wait(timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for done in self._done.values():
+            if not done.wait(None if deadline is None else max(deadline - time.monotonic(), 0)):
+                return False
+        return True
+
+    def done(self) -> bool:
+        """Return whether every dataset is loaded or has failed."""
+        return all(done.is_set() for done in self._done.values())
+
+    def progress(self) -> Dict[str, Progress]:
+        """
+        Return how far the loading of each dataset has got.
+
+        Returns:
+            Dict[str, Progress]: Progress by dataset name.
+        """
+        with self._lock:
+            return dict(self._progress)
+
+    def summary(self) -> str:
+        """
+        Describe the progress of every dataset in one line.
+
+        Returns:
+            str: For example "books ✅ 1200 in 0.4 s, users ⏳ loading".
+        """
+        parts = []
+        for name, progress in self.progress().items():
+            if progress.state == "ready":
+                parts.append(f"{name} ✅ {progress.records} in {progress.seconds:.1f} s")
+            elif progress.state == "failed":
+                parts.append(f"{name} ❌ {progress.error}")
+            else:
+                parts.append(f"{name} ⏳ {progress.state}")
+        return ", ".join(parts)
+
+    def _load(self, name: str) -> None:
+        """Load one dataset once the datasets it comes after are done."""
+        for other in self._after[name]:
+            self._done[other].wait()
+        self._set(name, Progress("loading"))
+        started = time.perf_counter()
+        try:
+            with metrics.span(f"warm_up.{name}"):
+                records = self._loaders[name]()
+        except Exception as e:
+            # Nothing was cached, so the first operation needing the dataset loads it again
+            self._set(name, Progress("failed", seconds=time.perf_counter() - started, error=str(e)))
+        else:
+            self._set(name, Progress("ready", records, time.perf_counter() - started))
+        finally:
+            self._done[name].set()
+
+    def _set(self, name: str, progress: Progress) -> None:
+        """Record the progress of a dataset."""
+        with self._lock:
+            self._progress[name] = progress
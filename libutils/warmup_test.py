@@ -0,0 +1,48 @@
+import threading
+
+from .warmup import WarmUp
+
+
+def test_datasets_load_after_their_dependencies():
+    order = []
+    release = threading.Event()
+
+    def books():
+        release.wait(5)
+        order.append("books")
+        return 3
+
+    warm_up = WarmUp() \
+        .add("books", books) \
+        .add("users", lambda: order.append("users") or 2) \
+        .add("loans", lambda: order.append("loans") or 1, after=["books", "users"]) \
+        .start()
+    assert warm_up.wait("users", timeout=5)
+    assert not warm_up.done()
+    assert warm_up.progress()["loans"].state == "waiting"
+    assert "books ⏳" in warm_up.summary()
+    release.set()
+    assert warm_up.wait(timeout=5)
+    assert order.index("loans") > order.index("books")
+    progress = warm_up.progress()
+    assert [progress[name].records for name in ("books", "users", "loans")] == [3, 2, 1]
+    assert all(p.state == "ready" for p in progress.values())
+
+def test_failed_dataset_is_reported():
+    def broken():
+        raise OSError("disk on fire")
+
+    warm_up = WarmUp().add("books", broken).add("search", lambda: 0, after=["books"]).start()
+    assert warm_up.wait(timeout=5)
+    assert warm_up.progress()["books"].state == "failed"
+    assert warm_up.progress()["books"].error == "disk on fire"
+    assert warm_up.progress()["search"].state == "ready"
+    assert "books ❌ disk on fire" in warm_up.summary()
+
+def test_wait_times_out():
+    release = threading.Event()
+    warm_up = WarmUp().add("books", lambda: release.wait(5) and 0).start()
+    assert not warm_up.wait("books", timeout=0.01)
+    assert not warm_up.wait(timeout=0.01)
+    release.set()
+    assert warm_up.wait(timeout=5)
@@ -6,15 +6,26 @@ Project: library management system
 from book_management import BookManagement
 from user_management import UserManagement
 from checkout_management import CheckoutManagement
+from libutils.isbn import normalize_isbn
+from libutils.loans import TIME_FORMAT
+from libutils.metrics import format_metrics, metrics
 from libutils.storage import Storage
-import re
+from libutils.warmup import WarmUp
+import argparse
+import json
+import threading
+from datetime import datetime
+
+# Number of records shown per page when listing books and users
+PAGE_SIZE = 20
+
+# Fold the loan journal into the CSV snapshots on exit once it reaches this
+# fraction of their size; until then it is cheaper to replay it on load
+JOURNAL_COMPACT_RATIO = 0.1
 
 def format_isbn(isbn):
-    # Remove non-digit characters
-    digits = re.sub(r'\D', '', isbn)
-    if len(digits) != 13:
-        return None
-    return f"{digits[0:3]}-{digits[3]}-{digits[4:10]}-{digits[10:12]}-{digits[12]}"
+    # Hyphenate the ISBN, or return None if it is not a valid ISBN-13
+    return normalize_isbn(isbn)
 
 
 
@@ -33,6 +44,9 @@ class LibraryManagementSystem:
         self.user_manager = UserManagement()
         self.checkout_manager = CheckoutManagement()
         self.storage = Storage()
+        self._autosave_stop = threading.Event()
+        self._autosave_thread = None
+        self._warm_up = None
 
     def display_main_menu(self) -> str:
         """
@@ -47,7 +61,13 @@ class LibraryManagementSystem:
         print("3. 🆕 Add User")
         print("4. 📜 List Users")
         print("5. ✅ Checkout Book")
-        print("6. ⛔ Exit")
+        print("6. ↩️ Return Book")
+        print("7. 🔁 Renew Book")
+        print("8. 🔎 Search Books")
+        print("9. 📊 Show Stats")
+        print("10. ⛔ Exit")
+        if self._warm_up is not None and not self._warm_up.done():
+            print(f"⏳ Loading: {self._warm_up.summary()}")
         return input("Enter choice: ")
     
   
@@ -55,34 +75,59 @@ class LibraryManagementSystem:
     
 
 
-    def add_book(self, title: str, author: str, isbn: str) -> None:
+    def add_book(self, title: str, author: str, isbn: str, copies: str = "1") -> None:
         """
         Adds a book to the library.
 
+        If the library already has the book, offers to add the copies to it instead.
+
         Args:
             title (str): The title of the book.
             author (str): The author of the book.
             isbn (str): The ISBN of the book.
+            copies (str, optional): Number of copies. Defaults to "1".
         """
         formatted_isbn = format_isbn(isbn)
         if not formatted_isbn:
             print("\n❌ Error: Invalid ISBN ❌")
-            print("Valid ISBN example: 978-0-123456-78-9")
+            print("Valid ISBN example: 978-0-123456-78-6")
+            return
+        copies = str(copies).strip() or "1"
+        if not copies.isdigit() or int(copies) < 1:
+            print("\n❌ Error: Number of copies must be at least 1 ❌")
             return
 
         try:
-            self.book_manager.add_book(title, author, formatted_isbn)
+            self.book_manager.add_book(title, author, formatted_isbn, int(copies))
         except ValueError as e:
             if str(e).strip() == "Invalid ISBN":
                 print(f"\n❌ Error: {e} ❌")
-                print("Valid ISBN example: 978-0-123456-78-9")
+                print("Valid ISBN example: 978-0-123456-78-6")
             elif str(e).strip() == "Book with the same ISBN already exists.":
                 print(f"\n❌ Error: {e} ❌")
-                print(self.list_books())
+                if input(f"Add {int(copies)} more copies of it? (y/n): ").strip().lower() == 'y':
+                    self.book_manager.flush_books()
+                    total = self.checkout_manager.add_copies(formatted_isbn, int(copies))
+                    print(f"\nThe library now has {total} copies of {formatted_isbn} ✅.")
             else:
                 print(f"\n❌ Error: {e} ❌")
 
 
+    def import_books(self, filepath: str, chunk_size: int = 10000) -> None:
+        """
+        Imports books in bulk from a CSV or JSON Lines file.
+
+        Args:
+            filepath (str): Path to the file to import.
+            chunk_size (int, optional): Number of rows validated per batch. Defaults to 10000.
+        """
+        try:
+            report = self.book_manager.import_books(filepath, chunk_size)
+        except (OSError, ValueError) as e:
+            print(f"\n❌ Error: {e} ❌")
+            return
+        print(f"\nImported {report['accepted']} books ✅, rejected {report['rejected']} ({report['duplicates']} duplicates).")
+
     def checkout_book(self) -> None:
         """
         Handles the checkout process for a book.
@@ -96,15 +141,62 @@ class LibraryManagementSystem:
         except ValueError as e:
             print(f"\n❌ Error: {e} ❌")
 
+    def return_book(self) -> None:
+        """Handles the return of a book."""
+        self.checkout_manager.return_book()
+
+    def renew_book(self) -> None:
+        """Handles the renewal of a loan."""
+        self.checkout_manager.renew_book()
+
+    def send_overdue_notices(self, now: datetime = None) -> int:
+        """
+        Print a notice for every overdue loan, as the nightly batch does.
+
+        Args:
+            now (datetime, optional): The time to check against. Defaults to now.
+
+        Returns:
+            int: Number of notices printed.
+        """
+        now = now or datetime.now()
+        loans = self.checkout_manager.overdue_loans(now)
+        for loan in loans:
+            days = (now - datetime.strptime(loan.due, TIME_FORMAT)).days
+            name = self.checkout_manager.user_name(loan.user_id)
+            print(f"Notice to {name} (userID: {loan.user_id}): {loan.isbn} was due {loan.due}, {days} days overdue.")
+        print(f"\n{len(loans)} overdue notices.")
+        return len(loans)
+
     def list_books(self) -> None:
-        """Lists all the books in the library."""
-        books = self.book_manager.list_books()
-        if books:
-            print("\n-------------------------\nList of books in Library:\n-------------------------")
-            for index, book in enumerate(books, start=1):
-                print(f"Book {index}:\nTitle: {book['title']}\nAuthor: {book['author']}\nISBN: {book['isbn']}\nAvailableInLibrary: {book['AvailableInLibrary']}\n-------------------------")
-        else:
+        """Lists the books in the library one page at a time."""
+        books, cursor = self.book_manager.page_books(PAGE_SIZE)
+        if not books:
             print("\n------------------------------------------------\n⚠️ No Books in the library, Please add books ⚠️\n------------------------------------------------")
+            return
+        print("\n-------------------------\nList of books in Library:\n-------------------------")
+        index = 0
+        while True:
+            for index, book in enumerate(books, start=index + 1):
+                print(f"Book {index}:\nTitle: {book['title']}\nAuthor: {book['author']}\nISBN: {book['isbn']}\nAvailableInLibrary: {book['AvailableInLibrary']}\nCopies: {book.get('available', '0')} of {book.get('copies', '1')} on the shelf\n-------------------------")
+            if cursor is None or not self.next_page():
+                break
+            books, cursor = self.book_manager.page_books(PAGE_SIZE, cursor)
+
+    def search_books(self, query: str) -> None:
+        """
+        Searches the books in the library by title and author.
+
+        Args:
+            query (str): The words to search for.
+        """
+        books = self.book_manager.search_books(query, PAGE_SIZE)
+        if not books:
+            print(f"\n⚠️ No books match '{query}' ⚠️")
+            return
+        print(f"\n-------------------------\nBooks matching '{query}':\n-------------------------")
+        for index, book in enumerate(books, start=1):
+            print(f"Book {index}:\nTitle: {book['title']}\nAuthor: {book['author']}\nISBN: {book['isbn']}\nAvailableInLibrary: {book['AvailableInLibrary']}\nCopies: {book.get('available', '0')} of {book.get('copies', '1')} on the shelf\n-------------------------")
 
     def add_user(self, name: str, user_id: str) -> None:
         """
@@ -118,20 +210,54 @@ class LibraryManagementSystem:
         
 
     def list_users(self) -> None:
-        """Lists all the users registered in the library."""
-        users = self.user_manager.list_users()
-        if users:
-            self.user_manager.print_users_database(users)
-        else:
+        """Lists the users registered in the library one page at a time."""
+        users, cursor = self.user_manager.page_users(PAGE_SIZE)
+        if not users:
             print("\n------------------------------------------------\n⚠️ No Users in the library, Please add users ⚠️\n------------------------------------------------")
+            return
+        self.user_manager.print_users_database(users)
+        while cursor is not None and self.next_page():
+            users, cursor = self.user_manager.page_users(PAGE_SIZE, cursor)
+            self.user_manager.print_users_database(users, header=False)
+
+    def next_page(self) -> bool:
+        """
+        Ask whether to show the next page of a listing.
+
+        Returns:
+            bool: True to continue, False to return to the menu.
+        """
+        return input("Press Enter for the next page or q to return to the menu: ").strip().lower() != 'q'
 
 
-    def run(self) -> None:
-        """Main function to run the library management system."""
+    def show_stats(self) -> None:
+        """Print the time spent per operation and the storage I/O counters."""
+        if not metrics.enabled:
+            print("\n⚠️ Stats are off, start with --metrics or LIBRARY_METRICS=1 to record them ⚠️")
+            return
+        print(f"\n{format_metrics(metrics.snapshot())}")
+        cache = self.storage.cache_stats()
+        print(f"\nParse cache: {cache['hits']} hits, {cache['misses']} misses, {cache['bytes']} bytes")
+        commit = self.storage.commit_stats()
+        if commit["batches"]:
+            print(f"Group commit: {commit['records']} records from {commit['writes']} writes in "
+                  f"{commit['batches']} batches, {commit['seconds'] / commit['batches'] * 1000:.2f} ms per batch "
+                  f"(longest {commit['max_seconds'] * 1000:.2f} ms), {commit['pending']} pending")
+
+    def run(self, autosave_interval: float = 0) -> None:
+        """
+        Main function to run the library management system.
+
+        Args:
+            autosave_interval (float, optional): Seconds between autosaves; 0 saves only on exit.
+        """
+        self.warm_up()
+        if autosave_interval > 0:
+            self.start_autosave(autosave_interval)
         while True:
             choice = self.display_main_menu()
             if choice == '1':
-                self.add_book(*(input(f"Enter {field}: ") for field in ["title", "author", "isbn"]))
+                self.add_book(*(input(f"Enter {field}: ") for field in ["title", "author", "isbn", "number of copies"]))
             elif choice == '2':
                 self.list_books()
             elif choice == '3':
@@ -141,12 +267,184 @@ class LibraryManagementSystem:
             elif choice == '5':
                 self.checkout_book()
             elif choice == '6':
+                self.return_book()
+            elif choice == '7':
+                self.renew_book()
+            elif choice == '8':
+                self.search_books(input("Enter title or author: "))
+            elif choice == '9':
+                self.show_stats()
+            elif choice == '10':
                 print("\n-------------------------\n🚧 Application Closed 🚧\n-------------------------")
                 break
             else:
                 print("\n--------------------------------------\n⚠️ Invalid choice, please try again ⚠️\n--------------------------------------")
-        lib_data, users_data = self.book_manager.list_books(), self.user_manager.list_users()
-        self.storage.save_system_state(books=lib_data, users=users_data)
+        self.shutdown()
+
+    def warm_up(self) -> WarmUp:
+        """
+        Start loading books, users and loans in the background, so the menu can be
+        shown at once.
+
+        Books and users are read at the same time. Loans are replayed once both are
+        loaded, since they are checked against them, and the search index is built
+        once the books are. A menu choice that needs a dataset still loading waits for
+        that dataset only.
+
+        Returns:
+            WarmUp: The warm-up, to follow its progress.
+        """
+        if self._warm_up is None:
+            self._warm_up = WarmUp() \
+                .add("books", self.book_manager.warm_up) \
+                .add("users", self.user_manager.warm_up) \
+                .add("loans", self.checkout_manager.warm_up, after=["books", "users"]) \
+                .add("search", self.book_manager.warm_up_search, after=["books"]) \
+                .start()
+        return self._warm_up
+
+    def save(self) -> None:
+        """
+        Write the books and users added since the last save.
+
+        Loans are already in the loan journal, so only new records are written and
+        the cost does not grow with the size of the library. Writes still buffered
+        by the group commit are written too.
+        """
+        self.book_manager.flush_books()
+        self.user_manager.flush_users()
+        self.storage.flush()
+
+    def start_autosave(self, interval: float) -> None:
+        """
+        Save changes every interval seconds on a background thread, without blocking the menu.
+
+        Args:
+            interval (float): Seconds between saves.
+        """
+        def autosave():
+            while not self._autosave_stop.wait(interval):
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"\n❌ Error: Autosave failed: {e} ❌")
+
+        self._autosave_stop.clear()
+        self._autosave_thread = threading.Thread(target=autosave, name="autosave", daemon=True)
+        self._autosave_thread.start()
+
+    def stop_autosave(self) -> None:
+        """Stop the autosave thread, waiting for a save in progress to finish."""
+        if self._autosave_thread is not None:
+            self._autosave_stop.set()
+            self._autosave_thread.join()
+            self._autosave_thread = None
+
+    def shutdown(self) -> None:
+        """Persist the library state before the application closes."""
+        if self._warm_up is not None:
+            self._warm_up.wait()
+        self.stop_autosave()
+        self.save()
+        self.storage.compact_journal(min_ratio=JOURNAL_COMPACT_RATIO)
+        self.book_manager.save_search_index()
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """
+    Parse the command line.
+
+    Without a command the interactive menu is started.
+
+    Args:
+        argv (list, optional): Arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Library Management System")
+    parser.add_argument("--autosave", type=float, default=0, metavar="SECONDS",
+                        help="save new books and users every SECONDS while the menu runs")
+    parser.add_argument("--metrics", action="store_true", help="record time and I/O per operation")
+    parser.add_argument("--metrics-file", metavar="FILE", help="record metrics and write them to FILE as JSON on exit")
+    parser.add_argument("--profile", metavar="FILE", help="run under cProfile and write the profile to FILE")
+    add_commit_arguments(parser)
+    subparsers = parser.add_subparsers(dest="command")
+    import_parser = subparsers.add_parser("import-books", help="import books from a CSV or JSON Lines file")
+    import_parser.add_argument("filepath", help="file with title, author and isbn fields")
+    import_parser.add_argument("--chunk-size", type=int, default=10000, help="rows validated per batch")
+    overdue_parser = subparsers.add_parser("overdue", help="print a notice for every overdue loan")
+    overdue_parser.add_argument("--as-of", type=datetime.fromisoformat, metavar="DATE",
+                                help="check due dates against DATE instead of now, e.g. 2024-05-01")
+    stats_parser = subparsers.add_parser("stats", help="print metrics written with --metrics-file")
+    stats_parser.add_argument("filepath", help="JSON file written by --metrics-file")
+    shard_parser = subparsers.add_parser("shard", help="split books and users into shards that load in parallel")
+    shard_parser.add_argument("shards", type=int, help="number of shards per dataset, 1 to merge them back")
+    shard_parser.add_argument("--by", choices=["hash", "group"], default="hash",
+                              help="shard books by a hash of the ISBN or by its registration group")
+    return parser.parse_args(argv)
+
+def add_commit_arguments(parser: argparse.ArgumentParser) -> None:
+    """
+    Add the options of the group commit, see configure_group_commit.
+
+    Args:
+        parser (argparse.ArgumentParser): The parser to add them to.
+    """
+    parser.add_argument("--commit-size", type=int, default=1, metavar="RECORDS",
+                        help="buffer new books and users until RECORDS records are waiting (default 1, write at once)")
+    parser.add_argument("--commit-delay", type=float, default=0, metavar="SECONDS",
+                        help="write buffered records at most SECONDS after the first was buffered")
+    parser.add_argument("--fsync", action="store_true", help="fsync every batch of writes before going on")
+
+def configure_group_commit(args: argparse.Namespace) -> None:
+    """
+    Apply the group commit options to the database folder.
+
+    Args:
+        args (argparse.Namespace): Arguments parsed with the options of add_commit_arguments.
+    """
+    try:
+        Storage().group_commit.configure(max_records=args.commit_size, max_delay=args.commit_delay, fsync=args.fsync)
+    except ValueError as e:
+        raise SystemExit(f"\n❌ Error: {e} ❌")
+
+def run_command(args: argparse.Namespace) -> None:
+    """
+    Run the command given on the command line.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+    """
+    if args.command == "stats":
+        with open(args.filepath, 'r', encoding='utf-8') as file:
+            print(format_metrics(json.load(file)))
+    elif args.command == "import-books":
+        LibraryManagementSystem().import_books(args.filepath, args.chunk_size)
+    elif args.command == "overdue":
+        LibraryManagementSystem().send_overdue_notices(args.as_of)
+    elif args.command == "shard":
+        try:
+            counts = Storage().reshard(args.shards, args.by)
+        except ValueError as e:
+            print(f"\n❌ Error: {e} ❌")
+        else:
+            print(f"\n{counts['books']} books and {counts['users']} users in {args.shards} shard(s) ✅")
+    else:
+        LibraryManagementSystem().run(autosave_interval=args.autosave)
 
 if __name__ == "__main__":
-    LibraryManagementSystem().run()
+    args = parse_args()
+    if args.metrics or args.metrics_file:
+        metrics.enabled = True
+    configure_group_commit(args)
+    if args.profile:
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.runcall(run_command, args)
+        profile.dump_stats(args.profile)
+        pstats.Stats(profile).sort_stats("cumulative").print_stats(15)
+    else:
+        run_command(args)
+    if args.metrics_file:
+        metrics.dump(args.metrics_file)
@@ -0,0 +1,337 @@
+"""
+Serve the library to many local clients from one long-lived process.
+
+Clients connect over localhost TCP or a Unix socket and exchange JSON lines. Each
+request is an object with an "op" field and the operation's arguments, plus an
+optional "id" that is echoed back:
+
+    {"id": 1, "op": "search", "query": "ikigai"}
+    {"id": 1, "ok": true, "result": [...]}
+
+Operations: add_book, add_copies, copies, search, list, add_user, checkout,
+checkout_many, return, renew, overdue, hold, cancel_hold, hold_position and stats.
+
+Usage:
+    python service.py serve [--host HOST] [--port PORT | --socket PATH] [--metrics]
+    python service.py loadgen [--clients N] [--requests N] [--op OP]
+"""
+import argparse
+import asyncio
+import json
+import random
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from libutils.metrics import metrics
+from main import LibraryManagementSystem, add_commit_arguments, configure_group_commit, format_isbn
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8642
+
+class LibraryService:
+    """JSON-lines front end for LibraryManagementSystem."""
+
+    def __init__(self, system: LibraryManagementSystem = None) -> None:
+        """
+        Initialize the LibraryService.
+
+        Args:
+            system (LibraryManagementSystem, optional): The system to serve. Defaults to a new one.
+        """
+        self.system = system if system is not None else LibraryManagementSystem()
+        # Every operation runs on one thread: the event loop never blocks on disk,
+        # writes reach storage in request order and the in-memory indexes are never
+        # read while another request is changing them
+        self._storage_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-storage")
+        self._handlers = {
+            "add_book": self.add_book,
+            "add_copies": self.add_copies,
+            "copies": self.copies,
+            "search": self.search,
+            "list": self.list_records,
+            "add_user": self.add_user,
+            "checkout": self.checkout,
+            "checkout_many": self.checkout_many,
+            "return": self.return_book,
+            "renew": self.renew,
+            "overdue": self.overdue,
+            "hold": self.hold,
+            "cancel_hold": self.cancel_hold,
+            "hold_position": self.hold_position,
+            "stats": self.stats,
+        }
+
+    async def warm_up(self) -> None:
+        """
+        Start loading the catalog and its indexes in the background.
+
+        The service accepts connections at once; a request that needs a dataset still
+        loading waits for that dataset only.
+        """
+        self.system.warm_up()
+
+    async def handle(self, request: dict) -> dict:
+        """
+        Run one request.
+
+        Args:
+            request (dict): The decoded request.
+
+        Returns:
+            dict: The response, with "ok" and either "result" or "error".
+        """
+        response = {"id": request.get("id")}
+        handler = self._handlers.get(request.get("op"))
+        if handler is None:
+            response.update(ok=False, error=f"Unknown op '{request.get('op')}'")
+            return response
+        try:
+            response.update(ok=True, result=await handler(request))
+        except (KeyError, TypeError, ValueError) as e:
+            response.update(ok=False, error=str(e))
+        return response
+
+    async def add_book(self, request: dict) -> dict:
+        isbn = format_isbn(request["isbn"])
+        if not isbn:
+            raise ValueError("Invalid ISBN")
+        book = await self._in_storage_thread(
+            self._create_book, request["title"], request["author"], isbn, int(request.get("copies", 1))
+        )
+        return book.to_dict()
+
+    async def add_copies(self, request: dict) -> dict:
+        copies = await self._in_storage_thread(
+            self.system.checkout_manager.add_copies, str(request["isbn"]), int(request.get("count", 1))
+        )
+        return {"copies": copies}
+
+    async def copies(self, request: dict) -> dict:
+        available, copies = await self._in_storage_thread(self.system.checkout_manager.copies_of, str(request["isbn"]))
+        return {"available": available, "copies": copies}
+
+    async def search(self, request: dict) -> list:
+        return await self._in_storage_thread(
+            self.system.book_manager.search_books, request["query"], int(request.get("limit", 20))
+        )
+
+    async def list_records(self, request: dict) -> dict:
+        kind = request.get("kind", "books")
+        if kind not in ("books", "users"):
+            raise ValueError("kind must be 'books' or 'users'")
+        page = self.system.book_manager.page_books if kind == "books" else self.system.user_manager.page_users
+        cursor = request.get("cursor")
+        records, next_cursor = await self._in_storage_thread(
+            page, int(request.get("page_size", 20)), tuple(cursor) if cursor else None
+        )
+        return {"records": records, "cursor": next_cursor}
+
+    async def add_user(self, request: dict) -> dict:
+        user = await self._in_storage_thread(self._create_user, request["name"], str(request["user_id"]))
+        return {"Name": user.name, "UserID": user.user_id}
+
+    async def checkout(self, request: dict) -> dict:
+        result = await self._in_storage_thread(
+            self.system.checkout_manager.checkout_book, str(request["user_id"]), str(request["isbn"])
+        )
+        return result._asdict()
+
+    async def checkout_many(self, request: dict) -> list:
+        results = await self._in_storage_thread(
+            self.system.checkout_manager.checkout_many, [tuple(pair) for pair in request["checkouts"]]
+        )
+        return [result._asdict() for result in results]
+
+    async def return_book(self, request: dict) -> dict:
+        result = await self._in_storage_thread(
+            self.system.checkout_manager.return_book, str(request["user_id"]), str(request["isbn"])
+        )
+        return result._asdict()
+
+    async def renew(self, request: dict) -> dict:
+        result = await self._in_storage_thread(
+            self.system.checkout_manager.renew_book, str(request["user_id"]), str(request["isbn"])
+        )
+        return result._asdict()
+
+    async def overdue(self, request: dict) -> list:
+        now = datetime.fromisoformat(request["as_of"]) if request.get("as_of") else None
+        loans = await self._in_storage_thread(self.system.checkout_manager.overdue_loans, now)
+        return [{"UserID": loan.user_id, "isbn": loan.isbn, "due": loan.due} for loan in loans]
+
+    async def hold(self, request: dict) -> dict:
+        result = await self._in_storage_thread(
+            self.system.checkout_manager.place_hold, str(request["user_id"]), str(request["isbn"])
+        )
+        return result._asdict()
+
+    async def cancel_hold(self, request: dict) -> dict:
+        result = await self._in_storage_thread(
+            self.system.checkout_manager.cancel_hold, str(request["user_id"]), str(request["isbn"])
+        )
+        return result._asdict()
+
+    async def hold_position(self, request: dict) -> dict:
+        position = await self._in_storage_thread(
+            self.system.checkout_manager.hold_position, str(request["user_id"]), str(request["isbn"])
+        )
+        return {"position": position}
+
+    async def stats(self, _request: dict) -> dict:
+        return {"operations": metrics.snapshot(), "parse_cache": self.system.storage.cache_stats(),
+                "group_commit": self.system.storage.commit_stats()}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer the JSON-lines requests of one connected client until it disconnects."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {"id": None, "ok": False, "error": "Invalid JSON"}
+                else:
+                    response = await self.handle(request if isinstance(request, dict) else {})
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def shutdown(self) -> None:
+        """Persist the library state and stop the storage thread."""
+        await self._in_storage_thread(self.system.shutdown)
+        self._storage_executor.shutdown()
+
+    def _create_book(self, title: str, author: str, isbn: str, copies: int = 1):
+        """Add a book and write it to storage at once, so it can be checked out straight away."""
+        book = self.system.book_manager.create_book(title, author, isbn, copies)
+        self.system.book_manager.flush_books()
+        return book
+
+    def _create_user(self, name: str, user_id: str):
+        """Add a user and write it to storage at once, so it can check out books straight away."""
+        user = self.system.user_manager.create_user(name, user_id)
+        self.system.user_manager.flush_users()
+        return user
+
+    def _in_storage_thread(self, function, *args):
+        """Run a blocking storage call on the storage thread."""
+        return asyncio.get_running_loop().run_in_executor(self._storage_executor, function, *args)
+
+async def serve(host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: str = None) -> None:
+    """
+    Run the service until it receives SIGINT or SIGTERM, then save the library state.
+
+    Args:
+        host (str, optional): Address to listen on. Defaults to 127.0.0.1.
+        port (int, optional): TCP port to listen on. Defaults to 8642.
+        socket_path (str, optional): Listen on this Unix socket instead of TCP.
+    """
+    service = LibraryService()
+    await service.warm_up()
+    if socket_path:
+        server = await asyncio.start_unix_server(service.serve_client, path=socket_path)
+    else:
+        server = await asyncio.start_server(service.serve_client, host, port)
+    stopping = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal_number, stopping.set)
+        except NotImplementedError:  # Windows; Ctrl+C still ends the service
+            pass
+    print(f"Library service listening on {socket_path or f'{host}:{port}'}")
+    try:
+        async with server:
+            await stopping.wait()
+    finally:
+        await service.shutdown()
+
+async def load_generator(clients: int = 16, requests: int = 200, op: str = "search",
+                         host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, socket_path: str = None) -> dict:
+    """
+    Drive a running service with concurrent clients and measure its throughput.
+
+    Args:
+        clients (int, optional): Number of concurrent connections. Defaults to 16.
+        requests (int, optional): Requests sent by each client. Defaults to 200.
+        op (str, optional): Operation to send, "search" or "list". Defaults to "search".
+        host (str, optional): Address of the service. Defaults to 127.0.0.1.
+        port (int, optional): TCP port of the service. Defaults to 8642.
+        socket_path (str, optional): Connect to this Unix socket instead of TCP.
+
+    Returns:
+        dict: Requests sent, errors, requests per second and p50/p99 latency in milliseconds.
+    """
+    queries = ["a", "the", "library", "history", "art", "science", "python", "data"]
+    latencies, errors = [], 0
+
+    async def client() -> None:
+        nonlocal errors
+        if socket_path:
+            reader, writer = await asyncio.open_unix_connection(socket_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        for index in range(requests):
+            if op == "list":
+                request = {"id": index, "op": "list", "page_size": 20}
+            else:
+                request = {"id": index, "op": "search", "query": random.choice(queries)}
+            started = time.perf_counter()
+            writer.write(json.dumps(request).encode("utf-8") + b"\n")
+            await writer.drain()
+            response = json.loads(await reader.readline())
+            latencies.append(time.perf_counter() - started)
+            errors += not response.get("ok")
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Library Management System service")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("serve", "run the service"), ("loadgen", "measure a running service")):
+        subparser = subparsers.add_parser(name, help=help_text)
+        subparser.add_argument("--host", default=DEFAULT_HOST)
+        subparser.add_argument("--port", type=int, default=DEFAULT_PORT)
+        subparser.add_argument("--socket", dest="socket_path", help="Unix socket path to use instead of TCP")
+        if name == "serve":
+            subparser.add_argument("--metrics", action="store_true", help="record time and I/O per operation")
+            add_commit_arguments(subparser)
+        if name == "loadgen":
+            subparser.add_argument("--clients", type=int, default=16)
+            subparser.add_argument("--requests", type=int, default=200, help="requests per client")
+            subparser.add_argument("--op", choices=["search", "list"], default="search")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        metrics.enabled = metrics.enabled or args.metrics
+        configure_group_commit(args)
+        try:
+            asyncio.run(serve(args.host, args.port, args.socket_path))
+        except KeyboardInterrupt:
+            pass
+    else:
+        report = asyncio.run(load_generator(args.clients, args.requests, args.op,
+                                            args.host, args.port, args.socket_path))
+        print(f"{report['requests']} requests, {report['errors']} errors, "
+              f"{report['requests_per_second']:.0f} req/s, "
+              f"p50 {report['p50_ms']:.2f} ms, p99 {report['p99_ms']:.2f} ms")
+
+if __name__ == "__main__":
+    main()
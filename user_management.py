@@ -2,7 +2,7 @@
 Module for user management functionalities.
 """
 
-from libutils.user import user_database
+from libutils.user import get_user_database
 
 class UserManagement:
     """
@@ -17,10 +17,41 @@ class UserManagement:
             name (str): The name of the user.
             user_id (str): The ID of the user.
         """
-        user_database.add_user(name, user_id)
+        get_user_database().add_user(name, user_id)
     
-    def print_users_database(self,users):
-        return user_database.print_users(users)
+    def create_user(self, name: str, user_id: str):
+        """
+        Add a user to the system without printing anything.
+
+        Args:
+            name (str): The name of the user.
+            user_id (str): The ID of the user.
+
+        Returns:
+            User: The new user.
+        """
+        return get_user_database().create_user(name, user_id)
+
+    def flush_users(self) -> int:
+        """
+        Write the users added since the last save to storage.
+
+        Returns:
+            int: Number of users written.
+        """
+        return get_user_database().flush()
+    
+    def warm_up(self) -> int:
+        """
+        Load the user IDs now instead of on first use.
+
+        Returns:
+            int: Number of users.
+        """
+        return get_user_database().warm_up()
+
+    def print_users_database(self,users, header: bool = True):
+        return get_user_database().print_users(users, header)
 
     def list_users(self) -> list:
         """
@@ -29,4 +60,17 @@ class UserManagement:
         Returns:
             list: A list of dictionaries containing user information.
         """
-        return user_database.get_users()
+        return get_user_database().get_users()
+
+    def page_users(self, page_size: int = 20, cursor: tuple = None) -> tuple:
+        """
+        Get one page of users in the system.
+
+        Args:
+            page_size (int, optional): Maximum number of users on the page. Defaults to 20.
+            cursor (tuple, optional): Cursor returned with the previous page. Defaults to the start.
+
+        Returns:
+            tuple: The users on the page and the cursor of the next page, or None after the last page.
+        """
+        return get_user_database().page_users(page_size, cursor=cursor)